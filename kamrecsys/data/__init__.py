@@ -18,6 +18,7 @@ from six.moves import xrange
 import logging
 
 from .base import (
+    IdMap,
     ObjectUtilMixin,
     BaseData)
 from .event import (
@@ -26,6 +27,16 @@ from .event import (
 from .event_with_score import (
     ScoreUtilMixin,
     EventWithScoreData)
+from .storage import (
+    save_event_data,
+    open_event_data)
+from .sharded import (
+    ShardedEventData,
+    shard_event_data)
+from .shared import (
+    SharedEventData,
+    SharedEventDataHandle,
+    attach_event_data)
 
 # =============================================================================
 # Metadata variables
@@ -36,12 +47,20 @@ from .event_with_score import (
 # =============================================================================
 
 __all__ = [
+    'IdMap',
     'BaseData',
     'ObjectUtilMixin',
     'EventData',
     'EventUtilMixin',
     'EventWithScoreData',
-    'ScoreUtilMixin']
+    'ScoreUtilMixin',
+    'save_event_data',
+    'open_event_data',
+    'SharedEventData',
+    'SharedEventDataHandle',
+    'attach_event_data',
+    'ShardedEventData',
+    'shard_event_data']
 
 # =============================================================================
 # Constants
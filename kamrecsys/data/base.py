@@ -31,6 +31,10 @@ __all__ = []
 # Constants
 # =============================================================================
 
+# a dense lookup table is used for integer external ids, if the range of ids
+# is less than this ratio times the number of objects
+DENSE_ID_MAP_RATIO = 4
+
 # =============================================================================
 # Module variables
 # =============================================================================
@@ -40,6 +44,332 @@ __all__ = []
 # =============================================================================
 
 
+class IdMap(object):
+    """
+    Conversion map from external ids to internal ids
+
+    External ids of each object type are looked up by a dense table if they
+    are small integers; otherwise by binary searches over sorted runs of the
+    external ids.  These tables are generated lazily and regenerated whenever
+    an array of external ids is replaced.  If ids are appended, tables are
+    extended by :meth:`update` .  For compatibility, ``id_map[otype]``
+    returns a dictionary whose key is an external id and whose value is the
+    corresponding internal id.
+
+    Parameters
+    ----------
+    eid : array_like, shape=(n_otypes,), dtype=(array_like)
+        eid[i] is a vector of external ids of the i-th object type. this
+        array is referred, not copied.
+    base : optional, :class:`IdMap`
+        lookup tables of this map are reused for arrays of external ids
+        that are shared with `eid` (default=None)
+    """
+
+    def __init__(self, eid, base=None):
+        self.eid = eid
+
+        self._table = {}
+        self._dict = {}
+        self._owned = set()
+        if base is not None:
+            # shared tables are copied before modified by either map
+            self._table.update(base._table)
+            base._owned.clear()
+
+    def __getstate__(self):
+        # lookup tables are re-generated after unpickling
+        state = self.__dict__.copy()
+        state['_table'] = {}
+        state['_dict'] = {}
+        state['_owned'] = set()
+        return state
+
+    def __len__(self):
+        return len(self.eid)
+
+    def __getitem__(self, otype):
+        """
+        Dictionary from external ids to internal ids
+
+        Parameters
+        ----------
+        otype : int
+            object type
+
+        Returns
+        -------
+        iid : dict or None
+            map from external id to internal id. None if no objects are set.
+        """
+        eid = self.eid[otype]
+        if eid is None:
+            return None
+        cache = self._dict.get(otype)
+        if cache is None or cache[0] is not eid:
+            cache = (eid, {k: i for (i, k) in enumerate(eid)})
+            self._dict[otype] = cache
+
+        return cache[1]
+
+    def update(self, otype):
+        """
+        Update lookup tables after external ids are appended
+
+        External ids must be appended to the end of an array of the specified
+        type, and existing ids must not be changed.  Cached tables and a
+        cached dictionary are extended in time proportional to the number of
+        appended ids in an amortized sense.
+
+        Parameters
+        ----------
+        otype : int
+            object type
+        """
+        eid = self.eid[otype]
+        cache = self._table.pop(otype, None)
+        if cache is not None and eid is not None and cache[0] is not None:
+            table = self._extend_table(otype, cache[0], cache[1], eid)
+            if table is not None:
+                self._table[otype] = (eid, table)
+        cache = self._dict.pop(otype, None)
+        if cache is not None and eid is not None:
+            iid_dict = cache[1]
+            n_objects = len(iid_dict)
+            for i in xrange(n_objects, len(eid)):
+                iid_dict[eid[i]] = i
+            self._dict[otype] = (eid, iid_dict)
+
+    def _get_table(self, otype):
+        """
+        Returns a lookup table for the specified object type
+
+        Parameters
+        ----------
+        otype : int
+            object type
+
+        Returns
+        -------
+        table : tuple
+            a tuple of a lookup mode, and arrays used in the mode
+        """
+        eid = self.eid[otype]
+        cache = self._table.get(otype)
+        if cache is not None and cache[0] is eid:
+            return cache[1]
+
+        if eid is None or len(eid) == 0:
+            table = ('empty',)
+        elif np.asarray(eid).dtype.kind == 'O':
+            table = ('dict',)
+        else:
+            eid = np.asarray(eid)
+            n_objects = eid.shape[0]
+            is_dense = False
+            if eid.dtype.kind in 'iu':
+                lo, hi = int(eid.min()), int(eid.max())
+                is_dense = hi - lo < DENSE_ID_MAP_RATIO * n_objects
+            if is_dense:
+                index = np.full(hi - lo + 1, -1, dtype=int)
+                index[eid - lo] = np.arange(n_objects, dtype=int)
+                table = ('dense', lo, index, lo, hi)
+            else:
+                table = ('sorted', [self._sort_eid(eid)])
+        self._table[otype] = (self.eid[otype], table)
+        self._owned.add(otype)
+
+        return table
+
+    def _extend_table(self, otype, orig_eid, table, eid):
+        """
+        Extend a lookup table by appended external ids
+
+        Parameters
+        ----------
+        otype : int
+            object type
+        orig_eid : array, shape=(n_orig_objects,)
+            external ids for which a table was generated
+        table : tuple
+            a lookup table of `orig_eid`
+        eid : array, shape=(n_objects,)
+            external ids whose first elements are `orig_eid`
+
+        Returns
+        -------
+        table : tuple or None
+            a lookup table of `eid` .  None if a table has to be
+            re-generated.
+        """
+        n_orig_objects = len(orig_eid)
+        n_objects = len(eid)
+        if table[0] == 'dict':
+            return table
+        if table[0] == 'empty':
+            return None
+        new_eid = np.asarray(eid[n_orig_objects:])
+        if new_eid.dtype.kind != np.asarray(orig_eid).dtype.kind:
+            return None
+        if new_eid.shape[0] == 0:
+            return table
+        new_iid = np.arange(n_orig_objects, n_objects, dtype=int)
+
+        if table[0] == 'sorted':
+            return ('sorted', self._add_sorted_run(table[1], new_eid, new_iid))
+
+        # dense table is grown by doubling, and is copied before modified if
+        # it is shared with another map
+        offset, index, lo, hi = table[1:]
+        lo = min(lo, int(new_eid.min()))
+        hi = max(hi, int(new_eid.max()))
+        if hi - lo >= DENSE_ID_MAP_RATIO * n_objects:
+            return None
+        start = min(offset, lo)
+        end = max(offset + index.shape[0], hi + 1)
+        if start < offset or end > offset + index.shape[0]:
+            size = max(end - start, min(2 * index.shape[0],
+                                        DENSE_ID_MAP_RATIO * n_objects))
+            if start < offset:
+                start = end - size
+            orig_index = index
+            index = np.full(size, -1, dtype=int)
+            index[offset - start:offset - start + orig_index.shape[0]] = (
+                orig_index)
+            offset = start
+        elif otype not in self._owned:
+            index = index.copy()
+        self._owned.add(otype)
+        index[new_eid - offset] = new_iid
+
+        return ('dense', offset, index, lo, hi)
+
+    @staticmethod
+    def _add_sorted_run(runs, eid, iid):
+        """
+        Add a sorted run of external ids
+
+        Runs are merged so that the size of each run is more than twice of
+        the next one.  Hence, the number of runs is logarithmic, and each id
+        is merged a logarithmic number of times.
+
+        Parameters
+        ----------
+        runs : list of tuple
+            pairs of sorted external ids and their internal ids.  internal
+            ids are None if they are the positions of external ids.
+        eid : array, shape=(n_new_objects,)
+            external ids to add
+        iid : array, shape=(n_new_objects,), dtype=int
+            internal ids of `eid`
+
+        Returns
+        -------
+        runs : list of tuple
+            new runs.  input runs are not modified.
+        """
+        order = np.argsort(eid, kind='mergesort')
+        runs = list(runs) + [(eid[order], iid[order])]
+        while (len(runs) > 1 and
+               runs[-2][0].shape[0] <= 2 * runs[-1][0].shape[0]):
+            (eid0, iid0), (eid1, iid1) = runs[-2:]
+            if iid0 is None:
+                iid0 = np.arange(eid0.shape[0], dtype=int)
+            eid = np.concatenate((eid0, eid1))
+            order = np.argsort(eid, kind='mergesort')
+            runs[-2:] = [(eid[order], np.concatenate((iid0, iid1))[order])]
+
+        return runs
+
+    @staticmethod
+    def _sort_eid(eid):
+        """
+        Sort external ids for a binary search
+
+        Parameters
+        ----------
+        eid : array, shape=(n_objects,)
+            external ids
+
+        Returns
+        -------
+        sorted_eid : array, shape=(n_objects,)
+            sorted external ids
+        order : array, shape=(n_objects,), dtype=int or None
+            internal ids of sorted external ids. None if `eid` is already
+            sorted.
+        """
+        if np.all(eid[1:] > eid[:-1]):
+            return eid, None
+        order = np.argsort(eid, kind='mergesort')
+
+        return eid[order], order
+
+    def lookup(self, otype, eid, missing_value=-1):
+        """
+        Convert external ids to the corresponding internal ids
+
+        Parameters
+        ----------
+        otype : int
+            object type
+        eid : array_like
+            external ids
+        missing_value : optional, int
+            internal id assigned to unknown external ids (default=-1)
+
+        Returns
+        -------
+        iid : array, shape=eid.shape, dtype=int
+            the corresponding internal ids
+        """
+        table = self._get_table(otype)
+        eid = np.asarray(eid)
+        iid = np.full(eid.shape, missing_value, dtype=int)
+
+        if table[0] == 'empty':
+            return iid
+        elif table[0] == 'dict':
+            iid_dict = self[otype]
+            iid.flat[:] = [iid_dict.get(i, missing_value) for i in eid.flat]
+            return iid
+
+        # check the compatibility of external ids
+        orig_kind = np.asarray(self.eid[otype]).dtype.kind
+        if eid.dtype.kind == 'O':
+            iid_dict = self[otype]
+            iid.flat[:] = [iid_dict.get(i, missing_value) for i in eid.flat]
+            return iid
+        elif (orig_kind in 'US') != (eid.dtype.kind in 'US'):
+            return iid
+
+        if table[0] == 'dense':
+            offset, index = table[1], table[2]
+            if eid.dtype.kind in 'iu':
+                pos = eid.astype(int) - offset
+            elif eid.dtype.kind == 'f':
+                # ids that are not integers are mapped out of the table
+                pos = np.where(
+                    np.isfinite(eid) & (np.round(eid) == eid),
+                    eid, offset - 1).astype(int) - offset
+            else:
+                return iid
+            mask = (pos >= 0) & (pos < index.shape[0])
+            found = index[pos[mask]]
+            found[found < 0] = missing_value
+            iid[mask] = found
+        else:
+            for sorted_eid, order in table[1]:
+                pos = np.asarray(np.searchsorted(sorted_eid, eid))
+                pos[pos >= sorted_eid.shape[0]] = 0
+                mask = (sorted_eid[pos] == eid)
+                if order is not None:
+                    pos = order[pos]
+                iid[mask] = pos[mask]
+
+        return iid
+
+
 class ObjectUtilMixin(object):
     """
     Methods that are commonly used in data containers and recommenders for
@@ -102,24 +432,25 @@ class ObjectUtilMixin(object):
         ----------
         otype : int
             object type
-        eid : int
-            an external id
+        eid : int or array_like
+            an external id or an array of external ids
 
         Returns
         -------
-        iid : int
-            the corresponding internal id
+        iid : int or array, dtype=int
+            the corresponding internal id(s)
 
         Raises
         ------
         ValueError
             an external id is out of range
         """
-        try:
-            return self.iid[otype][eid]
-        except KeyError:
+        iid = self.iid.lookup(otype, eid)
+        if np.any(iid < 0):
             raise ValueError("Illegal external id")
 
+        return iid[()]
+
     @staticmethod
     def _gen_id(event):
         """
@@ -136,14 +467,13 @@ class ObjectUtilMixin(object):
             the number of unique objects
         eid : array, shape=(variable,)
             map from internal id to external id
-        iid : dict
-            map from external id to internal id
+        iid : array, shape=event.shape, dtype=int
+            internal ids of the objects in `event`
         """
 
-        eid = np.unique(event)
-        iid = {k: i for (i, k) in enumerate(eid)}
+        eid, iid = np.unique(event, return_inverse=True)
 
-        return len(eid), eid, iid
+        return len(eid), eid, iid.reshape(np.shape(event))
 
     @staticmethod
     def _gen_id_substitution_table(orig_obj, sub_index):
@@ -192,10 +522,10 @@ class BaseData(with_metaclass(ABCMeta, ObjectUtilMixin, object)):
     eid : array_like, shape=(n_otypes,), dtype=(array_like)
         id[i] is a vector of external ids. the j-th element of the array is the
         external id that corresponds to the object with internal id j.
-    iid : dictionary
-        id[i] is a dictionary for internal ids whose object type is i. the
-        value for the key 'j' contains the internal id of the object whose
-        external id is j.
+    iid : :class:`kamrecsys.data.IdMap`
+        conversion map to internal ids. id[i] is a dictionary for internal
+        ids whose object type is i. the value for the key 'j' contains the
+        internal id of the object whose external id is j.
     feature : array_like, shape=(n_otypes), dtype=array_like
         i-the element contains the array of features for i-th object types,
         whose shape is (n_object[i], variable). j-th row of the i-th array
@@ -223,7 +553,7 @@ class BaseData(with_metaclass(ABCMeta, ObjectUtilMixin, object)):
         self.n_otypes = n_otypes
         self.n_objects = np.zeros(self.n_otypes, dtype=int)
         self.eid = np.tile(None, self.n_otypes)
-        self.iid = np.tile(None, self.n_otypes)
+        self.iid = IdMap(self.eid)
         self.feature = np.tile(None, self.n_otypes)
 
     def set_feature(self, otype, eid, feature):
@@ -237,14 +567,25 @@ class BaseData(with_metaclass(ABCMeta, ObjectUtilMixin, object)):
         eid : array_like, shape=(n_objects,)
             external ids of the corresponding object features
         feature : array_like
-            array of object feature
+            array of object feature.  If this is a :class:`numpy.memmap`
+            whose leading rows are already aligned to internal ids, these
+            rows are referred without copying.  Trailing rows, such as those
+            of objects not appearing in events, are ignored.
         """
-        iid = self.iid[otype]
-        index = np.repeat(len(eid), len(iid))
-        for i, j in enumerate(eid):
-            if j in iid:
-                index[iid[j]] = i
-        self.feature[otype] = feature[index].copy()
+        n_objects = self.n_objects[otype]
+        iid = self.iid.lookup(otype, eid)
+        found = iid >= 0
+        index = np.repeat(len(eid), n_objects)
+        index[iid[found]] = np.arange(len(eid))[found]
+
+        if (isinstance(feature, np.memmap) and
+                feature.shape[0] >= n_objects and
+                np.array_equal(index, np.arange(n_objects))):
+            if feature.shape[0] > n_objects:
+                feature = feature[:n_objects]
+            self.feature[otype] = feature
+        else:
+            self.feature[otype] = feature[index].copy()
 
 
 # =============================================================================
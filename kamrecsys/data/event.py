@@ -22,7 +22,8 @@ from six import with_metaclass
 
 import numpy as np
 
-from . import BaseData
+from . import BaseData, IdMap
+from ..model_selection import leave_last_n_index, temporal_split_index
 
 # =============================================================================
 # Public symbols
@@ -101,19 +102,17 @@ class EventUtilMixin(with_metaclass(ABCMeta, object)):
         """
         if missing_values is None:
             missing_values = self.n_objects[self.event_otypes]
-        if ev.ndim == 1 and ev.shape[0] == self.s_event:
-            new_ev = np.array(
-                [self.iid[self.event_otypes[e]].get(ev[e], missing_values[e])
-                 for e in xrange(self.s_event)], dtype=int)
-        elif ev.ndim == 2 and ev.shape[1] == self.s_event:
-            new_ev = np.empty_like(ev, dtype=int)
-            for e in xrange(self.s_event):
-                iid = self.iid[self.event_otypes[e]]
-                new_ev[:, e] = [iid.get(i, missing_values[e])
-                                for i in ev[:, e]]
-        else:
+        missing_values = np.broadcast_to(missing_values, (self.s_event,))
+        if not ((ev.ndim == 1 and ev.shape[0] == self.s_event) or
+                (ev.ndim == 2 and ev.shape[1] == self.s_event)):
             raise TypeError('The shape of an input is illegal')
 
+        new_ev = np.empty(ev.shape, dtype=int)
+        for e in xrange(self.s_event):
+            new_ev[..., e] = self.iid.lookup(
+                self.event_otypes[e], ev[..., e],
+                missing_value=missing_values[e])
+
         return new_ev
 
     def _set_event_info(self, data):
@@ -150,6 +149,8 @@ class EventData(BaseData, EventUtilMixin):
     event_otypes : array_like, shape=(variable,), optional
         see attribute event_otypes. as default, a type of the i-th element of
         each event is the i-th object type.
+    index_dtype : optional, np.dtype
+        see attribute index_dtype (default=int)
 
     Attributes
     ----------
@@ -158,23 +159,27 @@ class EventData(BaseData, EventUtilMixin):
         event
     n_events : int
         the number of events
-    event : array_like, shape=(n_events, s_event), dtype=int
+    event : array_like, shape=(n_events, s_event), dtype=index_dtype
         each row is a vector of internal ids that indicates the target of
         rating event
     event_feature : array_like, shape=(n_events, variable), dtype=variable
         i-the row contains the feature assigned to the i-th event
+    index_dtype : np.dtype
+        integer dtype of internal ids in an event array.  A narrow type, such
+        as ``np.int32`` , reduces memory usage.
 
     Raises
     ------
     ValueError
-        if n_otypes < 1 or event_otypes is illegal.
+        if n_otypes < 1, event_otypes is illegal, or index_dtype is not an
+        integer type.
 
     See Also
     --------
     :ref:`glossary`
     """
 
-    def __init__(self, n_otypes=2, event_otypes=None):
+    def __init__(self, n_otypes=2, event_otypes=None, index_dtype=int):
         super(EventData, self).__init__(n_otypes=n_otypes)
 
         self.s_event = 0
@@ -183,6 +188,10 @@ class EventData(BaseData, EventUtilMixin):
         self.event = None
         self.event_feature = None
 
+        self.index_dtype = np.dtype(index_dtype)
+        if self.index_dtype.kind not in 'iu':
+            raise ValueError("index_dtype must be an integer type")
+
         if event_otypes is None:
             self.s_event = n_otypes
             self.event_otypes = np.arange(self.s_event, dtype=int)
@@ -205,14 +214,16 @@ class EventData(BaseData, EventUtilMixin):
         event_feature : optional, array_like, shape=(n_events, variable)
             feature of events
         """
+        self.__dict__.pop('_view', None)
+        self.__dict__.pop('_buffer', None)
+        event = np.asarray(event)
+        self.event = np.empty(event.shape, dtype=self.index_dtype)
         for otype in xrange(self.n_otypes):
-            self.n_objects[otype], self.eid[otype], self.iid[otype] = (
-                self._gen_id(event[:, self.event_otypes == otype]))
-
-        self.event = np.empty_like(event, dtype=int)
-        for e in xrange(self.s_event):
-            iid = self.iid[self.event_otypes[e]]
-            self.event[:, e] = [iid[i] for i in event[:, e]]
+            mask = self.event_otypes == otype
+            (self.n_objects[otype], self.eid[otype],
+             self.event[:, mask]) = self._gen_id(event[:, mask])
+        if np.any(self.n_objects - 1 > np.iinfo(self.index_dtype).max):
+            raise ValueError("index_dtype is too narrow to represent ids")
 
         self.n_events = self.event.shape[0]
         if event_feature is not None:
@@ -220,17 +231,486 @@ class EventData(BaseData, EventUtilMixin):
         else:
             self.event_feature = None
 
-    def filter_event(self, filter_cond):
+    def append_events(self, event, event_feature=None):
+        """
+        Append events to the current event data
+
+        Internal ids of known objects are kept unchanged, and new internal ids
+        are assigned to unseen objects in the order of their external ids.
+        Therefore, arrays of external ids may not be sorted after appending.
+        Arrays are stored in buffers whose capacities are doubled if needed,
+        and the cost is proportional to the number of new events in an
+        amortized sense.  Features of new objects are filled by zeros.
+
+        Parameters
+        ----------
+        event : array_like, shape=(n_new_events, s_event)
+            each row corresponds to an event represented by a vector of object
+            with external ids
+        event_feature : optional, array_like, shape=(n_new_events, variable)
+            feature of events.  It must be specified if and only if event
+            features are set in the current data.
+
+        Raises
+        ------
+        ValueError
+            if event features are inconsistent with the current data, or
+            index_dtype is too narrow to represent new ids
+        """
+
+        # set events if no events are stored
+        if self.__dict__.get('_view') is None and self.event is None:
+            self.set_event(event, event_feature)
+            return
+
+        event = np.atleast_2d(event)
+        if event.ndim != 2 or event.shape[1] != self.s_event:
+            raise ValueError('The shape of an input is illegal')
+        if (event_feature is None) != (self.event_feature is None):
+            raise ValueError("event_feature is inconsistent with current data")
+
+        # convert external ids to internal ids, and assign new ids
+        new_event = np.empty(event.shape, dtype=self.index_dtype)
+        for otype in xrange(self.n_otypes):
+            mask = self.event_otypes == otype
+            eid, inverse = np.unique(event[:, mask], return_inverse=True)
+            iid = self.iid.lookup(otype, eid, missing_value=-1)
+            is_new = iid < 0
+            n_new_objects = np.count_nonzero(is_new)
+            iid[is_new] = self.n_objects[otype] + np.arange(n_new_objects)
+            if self.n_objects[otype] + n_new_objects - 1 > np.iinfo(
+                    self.index_dtype).max:
+                raise ValueError("index_dtype is too narrow to represent ids")
+            new_event[:, mask] = iid[inverse].reshape(event[:, mask].shape)
+
+            # append new objects
+            if n_new_objects > 0:
+                if self.eid[otype] is None:
+                    self.eid[otype] = eid[is_new]
+                else:
+                    self.eid[otype] = self._append_rows(
+                        'eid' + str(otype), self.eid[otype], eid[is_new])
+                if self.feature[otype] is not None:
+                    self.feature[otype] = self._append_rows(
+                        'feature' + str(otype), self.feature[otype],
+                        np.zeros((n_new_objects,) +
+                                 self.feature[otype].shape[1:],
+                                 dtype=self.feature[otype].dtype))
+                self.n_objects[otype] += n_new_objects
+                self.iid.update(otype)
+
+        # append events
+        self.event = self._append_rows('event', self.event, new_event)
+        self.n_events = self.event.shape[0]
+        if event_feature is not None:
+            self.event_feature = self._append_rows(
+                'event_feature', self.event_feature,
+                np.asarray(event_feature))
+
+    def _append_rows(self, name, orig, rows):
+        """
+        Append rows to an array stored in a growable buffer
+
+        Parameters
+        ----------
+        name : str
+            name of a buffer
+        orig : array, shape=(n_rows, variable)
+            current array
+        rows : array, shape=(n_new_rows, variable)
+            rows to append
+
+        Returns
+        -------
+        array : array, shape=(n_rows + n_new_rows, variable)
+            a view of the buffer that contains appended rows
+        """
+        if '_buffer' not in self.__dict__:
+            self._buffer = {}
+        n_rows = orig.shape[0]
+        size = n_rows + rows.shape[0]
+        dtype = np.promote_types(orig.dtype, rows.dtype)
+        if orig.dtype.kind in 'iu' and rows.dtype.kind in 'iu':
+            dtype = orig.dtype
+
+        # buffer is re-allocated, if it does not contain the current array
+        buf, n_filled = self._buffer.get(name, (None, 0))
+        if (buf is None or orig.base is not buf or n_filled != n_rows or
+                buf.dtype != dtype or buf.shape[0] < size):
+            buf = np.empty(
+                (max(size, 2 * n_rows),) + orig.shape[1:], dtype=dtype)
+            buf[:n_rows] = orig
+        buf[n_rows:size] = rows
+        self._buffer[name] = (buf, size)
+
+        return buf[:size]
+
+    def _group_duplicates(self):
+        """
+        Group identical events
+
+        Returns
+        -------
+        order : array, shape=(n_events,), dtype=int
+            indexes of events sorted so that identical events are adjacent.
+            identical events are sorted in their original order.
+        starts : array, shape=(n_unique_events,), dtype=int
+            offsets of each group of identical events in `order`
+        """
+        order = np.lexsort(self.event.T[::-1])
+        sorted_event = self.event[order]
+        is_start = np.empty(self.n_events, dtype=bool)
+        is_start[:1] = True
+        np.any(sorted_event[1:] != sorted_event[:-1], axis=1,
+               out=is_start[1:])
+
+        return order, np.flatnonzero(is_start)
+
+    def _select_events(self, index):
+        """
+        Keep only specified events.  Objects are not changed.
+
+        Parameters
+        ----------
+        index : array, dtype=int
+            indexes of events to keep
+        """
+        self.event = self.event[index]
+        self.n_events = self.event.shape[0]
+        if self.event_feature is not None:
+            self.event_feature = self.event_feature[index]
+
+    def deduplicate(self, policy='last'):
+        """
+        Merge events consisting of the same objects
+
+        Events are merged in place, and the remaining events are kept in
+        their original order.  Objects and their ids are not changed.
+
+        Parameters
+        ----------
+        policy : {'last', 'first'}
+            the last or the first event is kept among identical events
+            (default='last')
+
+        Returns
+        -------
+        n_merged : int
+            the number of removed events
+
+        Raises
+        ------
+        ValueError
+            if an illegal policy is specified
+        """
+        if policy not in ('last', 'first'):
+            raise ValueError("Illegal policy: " + str(policy))
+        if self.event is None or self.n_events == 0:
+            return 0
+
+        order, starts = self._group_duplicates()
+        if policy == 'last':
+            index = order[np.r_[starts[1:], self.n_events] - 1]
+        else:
+            index = order[starts]
+        n_merged = self.n_events - starts.shape[0]
+        if n_merged > 0:
+            self._select_events(np.sort(index))
+
+        return n_merged
+
+    def get_event_index(self, otype):
+        """
+        Index of events containing each object in a CSR format
+
+        The indexes of events containing the object whose internal id is `i`
+        are ``indices[indptr[i]:indptr[i + 1]]`` .  If an object type appears
+        in several elements of an event, the event is indexed for each
+        element.  An index is generated at the first call, and cached until
+        an event array is replaced.
+
+        Parameters
+        ----------
+        otype : int
+            object type
+
+        Returns
+        -------
+        indptr : array, shape=(n_objects[otype] + 1,), dtype=int
+            offsets of each object in `indices`
+        indices : array, shape=(n_indexed_events,), dtype=int
+            indexes of events sorted by objects
+        """
+        cache = self.__dict__.get('_event_index')
+        if cache is None:
+            cache = self._event_index = {}
+        index = cache.get(otype)
+        if index is not None and index[0] is self.event:
+            return index[1], index[2]
+
+        mask = self.event_otypes == otype
+        keys = self.event[:, mask].ravel()
+        indices = np.argsort(keys, kind='mergesort') // np.count_nonzero(mask)
+        indptr = np.zeros(self.n_objects[otype] + 1, dtype=int)
+        np.cumsum(
+            np.bincount(keys, minlength=self.n_objects[otype]),
+            out=indptr[1:])
+        cache[otype] = (self.event, indptr, indices)
+
+        return indptr, indices
+
+    def events_of(self, otype, iid):
+        """
+        Indexes of events containing the specified object
+
+        Parameters
+        ----------
+        otype : int
+            object type
+        iid : int
+            internal id of an object
+
+        Returns
+        -------
+        index : array, shape=(n_object_events,), dtype=int
+            indexes of events
+        """
+        indptr, indices = self.get_event_index(otype)
+
+        return indices[indptr[iid]:indptr[iid + 1]]
+
+    def count_events(self, otype):
+        """
+        The number of events containing each object
+
+        Parameters
+        ----------
+        otype : int
+            object type
+
+        Returns
+        -------
+        n_object_events : array, shape=(n_objects[otype],), dtype=int
+            the numbers of events
+        """
+        indptr, indices = self.get_event_index(otype)
+
+        return np.diff(indptr)
+
+    def reduce_events(self, otype, values, func=np.add, initial=0):
+        """
+        Reduce values attached to events for each object
+
+        Parameters
+        ----------
+        otype : int
+            object type
+        values : array_like, shape=(n_events, variable)
+            values attached to events, such as scores
+        func : optional, np.ufunc
+            binary ufunc to reduce values (default=np.add)
+        initial : optional, scalar
+            value for objects that are contained in no events (default=0)
+
+        Returns
+        -------
+        reduced : array, shape=(n_objects[otype], variable)
+            reduced values of each object
+        """
+        indptr, indices = self.get_event_index(otype)
+        values = np.asarray(values)[indices]
+        reduced = np.full(
+            (self.n_objects[otype],) + values.shape[1:], initial,
+            dtype=values.dtype)
+        nonempty = indptr[1:] > indptr[:-1]
+        if values.shape[0] > 0:
+            reduced[nonempty] = func.reduceat(
+                values, indptr[:-1][nonempty], axis=0)
+
+        return reduced
+
+    def mean_events(self, otype, values, missing_value=0.0):
+        """
+        Means of values attached to events for each object
+
+        Parameters
+        ----------
+        otype : int
+            object type
+        values : array_like, shape=(n_events, variable)
+            values attached to events, such as scores
+        missing_value : optional, float
+            value for objects that are contained in no events (default=0.0)
+
+        Returns
+        -------
+        mean : array, shape=(n_objects[otype], variable), dtype=float
+            means of values of each object
+        """
+        total = self.reduce_events(
+            otype, np.asarray(values, dtype=float), func=np.add, initial=0.0)
+        count = self.count_events(otype).reshape(
+            (-1,) + (1,) * (total.ndim - 1))
+        mean = np.full(total.shape, missing_value, dtype=float)
+        np.divide(total, count, out=mean, where=(count > 0))
+
+        return mean
+
+    def get_event_feature_order(self, field='timestamp'):
+        """
+        Order of events sorted by the values of an event feature
+
+        An order is generated at the first call, and cached until an array of
+        event features is replaced.
+
+        Parameters
+        ----------
+        field : str or None
+            the name of a field of event features.  If None, the array of
+            event features itself is used.
+
+        Returns
+        -------
+        order : array, shape=(n_events,), dtype=int
+            indexes of events sorted by the values of the feature.  events
+            having the same value are sorted in their original order.
+        sorted_values : array, shape=(n_events,)
+            sorted values of the feature
+        """
+        if self.event_feature is None:
+            raise ValueError("event_feature is not set")
+
+        cache = self.__dict__.get('_event_feature_order')
+        if cache is None:
+            cache = self._event_feature_order = {}
+        index = cache.get(field)
+        if index is not None and index[0] is self.event_feature:
+            return index[1], index[2]
+
+        if field is None:
+            values = np.asarray(self.event_feature)
+        else:
+            values = np.asarray(self.event_feature[field])
+        order = np.argsort(values, kind='mergesort')
+        sorted_values = values[order]
+        cache[field] = (self.event_feature, order, sorted_values)
+
+        return order, sorted_values
+
+    def search_event_feature(self, low=None, high=None, field='timestamp'):
+        """
+        Events whose feature values are in a specified range
+
+        Events are searched by a binary search over the order generated by
+        :meth:`get_event_feature_order` .
+
+        Parameters
+        ----------
+        low : optional, scalar
+            events whose values are equal or larger than this are included.
+            If None, no lower bound.
+        high : optional, scalar
+            events whose values are smaller than this are included.  If None,
+            no upper bound.
+        field : str or None
+            the name of a field of event features (default='timestamp')
+
+        Returns
+        -------
+        index : array, dtype=int
+            indexes of events sorted by their feature values
+        """
+        order, sorted_values = self.get_event_feature_order(field)
+        start = 0 if low is None else np.searchsorted(
+            sorted_values, low, side='left')
+        end = self.n_events if high is None else np.searchsorted(
+            sorted_values, high, side='left')
+
+        return order[start:end]
+
+    def temporal_split(self, cutoff, field='timestamp', lazy=True):
+        """
+        Split events into the ones before and after a cutoff
+
+        Parameters
+        ----------
+        cutoff : scalar
+            events whose feature values are smaller than this are included in
+            training data, and the others are in test data.
+        field : str or None
+            the name of a field of event features (default='timestamp')
+        lazy : optional, bool
+            return lazily evaluated views if True (default=True).  see
+            :meth:`filter_event`
+
+        Returns
+        -------
+        train_data : :class:`kamrecsys.EventData`
+            data before the cutoff
+        test_data : :class:`kamrecsys.EventData`
+            data after the cutoff
+        """
+        train_index, test_index = temporal_split_index(self, cutoff, field)
+
+        return (self.filter_event(train_index, lazy=lazy),
+                self.filter_event(test_index, lazy=lazy))
+
+    def leave_last_n_split(self, n=1, field='timestamp', lazy=True):
+        """
+        Split events so that the last `n` events of each user are tested
+
+        Parameters
+        ----------
+        n : optional, int
+            the number of test events of each user (default=1)
+        field : str or None
+            the name of a field of event features (default='timestamp')
+        lazy : optional, bool
+            return lazily evaluated views if True (default=True).  see
+            :meth:`filter_event`
+
+        Returns
+        -------
+        train_data : :class:`kamrecsys.EventData`
+            data except for the last events of each user
+        test_data : :class:`kamrecsys.EventData`
+            the last events of each user
+        """
+        train_index, test_index = leave_last_n_index(self, n, field)
+
+        return (self.filter_event(train_index, lazy=lazy),
+                self.filter_event(test_index, lazy=lazy))
+
+    def filter_event(self, filter_cond, lazy=False, keep_objects=False):
         """
         Returns a copy of data whose events are filtered based on
         `filter_cond` .  Information about the objects that is not contained
-        in a filtered event set are eliminated as well.
+        in a filtered event set are eliminated as well, unless `keep_objects`
+        is True.
+
+        If `keep_objects` is True, all objects of this data are kept even if
+        they are not contained in filtered events.  Internal ids are not
+        changed, and arrays of external ids and features are shared with this
+        data.  Therefore, models trained from different folds have the same
+        object universe and the same shapes of parameters.
+
+        If `lazy` is True, a filtered view is returned.  A view holds only
+        indexes of the selected events and a reference to this data, and
+        event-related attributes, such as `event` , `eid` , or `score` , are
+        computed at the first time they are accessed.  Therefore, generating
+        many views, e.g., folds of cross validation, is cheap.  Views must
+        not be used after the original data is modified.
 
         Parameters
         ----------
-        filter_cond : array, dtype=bool, shape=(n_events,)
-            Boolean array that specifies whether each event should be included
-            in a new event array.
+        filter_cond : array, dtype=bool or int
+            Boolean array of shape=(n_events,) that specifies whether each
+            event should be included in a new event array, or an array of
+            indexes of events to be included.
+        lazy : optional, bool
+            return a lazily evaluated view if True (default=False)
+        keep_objects : optional, bool
+            keep all objects of this data if True (default=False)
 
         Returns
         -------
@@ -239,48 +719,117 @@ class EventData(BaseData, EventUtilMixin):
         """
 
         # check whether event info is available
-        if self.event is None:
+        if self.__dict__.get('_view') is None and self.event is None:
             return
 
-        # re-arrange filter
+        # convert filter to an array of event indexes
         filter_cond = np.asarray(filter_cond)
+        if filter_cond.dtype == bool:
+            index = np.flatnonzero(filter_cond)
+        else:
+            index = filter_cond.astype(int, copy=False)
+
+        # a view of a view refers the original data, unless objects
+        # eliminated in the view must be kept
+        parent = self
+        view = self.__dict__.get('_view')
+        if view is not None and (view[2] or not keep_objects):
+            parent, parent_index = view[0], view[1]
+            index = parent_index[index]
 
-        # copy data
+        # generate a view
         data = copy(self)
+        data.__dict__.pop('_buffer', None)
+        data.__dict__.pop('_event_index', None)
+        data.__dict__.pop('_event_feature_order', None)
+        for name in self._view_attrs:
+            data.__dict__.pop(name, None)
+        data._view = (parent, index, keep_objects)
+        data.n_events = index.shape[0]
+
+        # evaluate all attributes
+        if not lazy:
+            for name in self._view_attrs:
+                getattr(data, name)
+
+        return data
+
+    # attributes that are lazily evaluated in a filtered view
+    _view_attrs = ('event', 'n_objects', 'eid', 'iid', 'feature',
+                   'event_feature')
+
+    def __getattr__(self, name):
+        # called only when ordinary lookup fails
+        if (self.__dict__.get('_view') is None or
+                name not in self._view_attrs):
+            raise AttributeError(
+                "'{0}' object has no attribute '{1}'".format(
+                    type(self).__name__, name))
+
+        self._evaluate_view(name)
+        if all(k in self.__dict__ for k in self._view_attrs):
+            del self._view
+
+        return self.__dict__[name]
+
+    def _evaluate_view(self, name):
+        """
+        Compute an attribute of a filtered view
+
+        Parameters
+        ----------
+        name : str
+            the name of an attribute to compute
+        """
+        parent, index, keep_objects = self._view
+
+        # filter out event features
+        if name == 'event_feature':
+            if parent.event_feature is None:
+                self.event_feature = None
+            else:
+                self.event_feature = parent.event_feature[index]
+            return
 
         # generate a copy of filtered events
-        data.event = self.event[filter_cond, :].copy()
-        data.n_events = data.event.shape[0]
+        event = parent.event[index, :]
+
+        # share object info
+        if keep_objects:
+            self.event = event
+            self.n_objects = parent.n_objects.copy()
+            self.eid = parent.eid.copy()
+            self.iid = IdMap(self.eid, base=parent.iid)
+            self.feature = parent.feature.copy()
+            return
 
         # update object info and iid's in an event set
-        data.n_objects = self.n_objects.copy()
-        data.eid = self.eid.copy()
-        data.iid = self.iid.copy()
-        data.feature = self.feature.copy()
-        # data.event_otypes = self.event_otypes.copy()
-
-        for otype in xrange(data.n_otypes):
+        n_objects = parent.n_objects.copy()
+        eid = parent.eid.copy()
+        feature = parent.feature.copy()
+        for otype in xrange(parent.n_otypes):
+            mask = parent.event_otypes == otype
 
             # indexes of objects contained in a filtered event set
-            sub_index = np.unique(data.event[:, data.event_otypes == otype])
+            sub_index = np.flatnonzero(np.bincount(
+                event[:, mask].ravel(), minlength=parent.n_objects[otype]))
 
             # update iid's in an event set
-            table = self._gen_id_substitution_table(self.eid[otype], sub_index)
-            data.event[:, self.event_otypes == otype] = table[
-                data.event[:, self.event_otypes == otype]]
+            table = self._gen_id_substitution_table(
+                parent.eid[otype], sub_index)
+            event[:, mask] = table[event[:, mask]]
 
             # filter object info
-            data.eid[otype] = self.eid[otype][sub_index]
-            data.iid[otype] = {k: i for (i, k) in enumerate(data.eid[otype])}
-            data.n_objects[otype] = data.eid[otype].shape[0]
-            if self.feature[otype] is not None:
-                data.feature[otype] = self.feature[otype][sub_index]
-
-        # filter out event features
-        if self.event_feature is not None:
-            data.event_feature = self.event_feature[filter_cond]
-
-        return data
+            eid[otype] = parent.eid[otype][sub_index]
+            n_objects[otype] = eid[otype].shape[0]
+            if parent.feature[otype] is not None:
+                feature[otype] = parent.feature[otype][sub_index]
+
+        self.event = event
+        self.n_objects = n_objects
+        self.eid = eid
+        self.iid = IdMap(eid)
+        self.feature = feature
 
 
 # =============================================================================
@@ -19,6 +19,7 @@ import logging
 import numpy as np
 from abc import ABCMeta
 from six import with_metaclass
+from sklearn.utils import check_random_state
 
 from . import EventData
 from ..metrics import generate_score_bins
@@ -105,6 +106,10 @@ class EventWithScoreData(EventData, ScoreUtilMixin):
     event_otypes : array_like, shape=(variable,), optional
         see attribute event_otypes. as default, a type of the i-th element of
         each event is the i-th object type.
+    index_dtype : optional, np.dtype
+        see attribute index_dtype (default=int)
+    score_dtype : optional, np.dtype
+        see attribute score_dtype (default=None)
 
     Attributes
     ----------
@@ -114,19 +119,32 @@ class EventWithScoreData(EventData, ScoreUtilMixin):
         rating scores of each events.
     n_score_levels : int
         the number of score levels
+    score_dtype : np.dtype or None
+        numeric dtype of scores.  If None, the dtype of given scores is kept.
+        ``np.float32`` or, for integer scores, ``np.uint8`` reduce memory
+        usage.
 
     See Also
     --------
     :ref:`glossary`
     """
 
-    def __init__(self, n_otypes=2, event_otypes=None):
-        super(EventWithScoreData, self).__init__(n_otypes=n_otypes,
-                                                 event_otypes=event_otypes)
+    def __init__(
+            self, n_otypes=2, event_otypes=None, index_dtype=int,
+            score_dtype=None):
+        super(EventWithScoreData, self).__init__(
+            n_otypes=n_otypes, event_otypes=event_otypes,
+            index_dtype=index_dtype)
         self.score_domain = None
         self.score = None
         self.n_score_levels = None
 
+        self.score_dtype = None
+        if score_dtype is not None:
+            self.score_dtype = np.dtype(score_dtype)
+            if self.score_dtype.kind not in 'iuf':
+                raise ValueError("score_dtype must be a numeric type")
+
     def set_event(self, event, score, score_domain=None, event_feature=None):
         """
         Set event data from structured array.
@@ -147,7 +165,10 @@ class EventWithScoreData(EventData, ScoreUtilMixin):
 
         super(EventWithScoreData, self).set_event(event, event_feature)
 
-        self.score = np.array(score)
+        self.score = np.array(score, dtype=self.score_dtype)
+        if (self.score_dtype is not None and self.score_dtype.kind in 'iu' and
+                not np.array_equal(self.score, score)):
+            raise ValueError("scores cannot be represented by score_dtype")
         if score_domain is None:
             score_domain = [
                 np.min(self.score),
@@ -202,10 +223,198 @@ class EventWithScoreData(EventData, ScoreUtilMixin):
                 self.score_domain[0])
 
         self.score = np.where(self.score <= score_thresh, 0, 1)
+        if self.score_dtype is not None:
+            self.score = self.score.astype(self.score_dtype)
         self.score_domain = np.array([0, 1, 1])
         self.n_score_levels = 2
 
-    def filter_event(self, filter_cond):
+    def _select_events(self, index):
+        """
+        Keep only specified events.  Objects are not changed.
+
+        Parameters
+        ----------
+        index : array, dtype=int
+            indexes of events to keep
+        """
+        super(EventWithScoreData, self)._select_events(index)
+        self.score = self.score[index]
+
+    def deduplicate(self, policy='last'):
+        """
+        Merge events consisting of the same objects
+
+        Events are merged in place, and the remaining events are kept in
+        their original order.  Objects and their ids are not changed.
+
+        Parameters
+        ----------
+        policy : {'last', 'first', 'mean', 'max', 'count'}
+            how to merge identical events (default='last').  the last or the
+            first event is kept for 'last' or 'first'.  For the other
+            policies, the last event is kept and its score is replaced with
+            the mean or the maximum of scores, or the number of merged
+            events.  For 'count', the score domain is re-estimated.
+
+        Returns
+        -------
+        n_merged : int
+            the number of removed events
+
+        Raises
+        ------
+        ValueError
+            if an illegal policy is specified, or mean scores or counts
+            cannot be represented by score_dtype
+        """
+        if policy in ('last', 'first'):
+            return super(EventWithScoreData, self).deduplicate(policy)
+        if policy not in ('mean', 'max', 'count'):
+            raise ValueError("Illegal policy: " + str(policy))
+        if (policy == 'mean' and self.score_dtype is not None and
+                self.score_dtype.kind in 'iu'):
+            raise ValueError("mean scores cannot be represented by score_dtype")
+        if self.event is None or self.n_events == 0:
+            return 0
+
+        # merge scores of each group
+        order, starts = self._group_duplicates()
+        ends = np.r_[starts[1:], self.n_events]
+        if policy == 'mean':
+            score = (np.add.reduceat(self.score[order], starts) /
+                     (ends - starts))
+        elif policy == 'max':
+            score = np.maximum.reduceat(self.score[order], starts)
+        else:
+            score = ends - starts
+            if (self.score_dtype is not None and
+                    self.score_dtype.kind in 'iu' and
+                    np.max(score) > np.iinfo(self.score_dtype).max):
+                raise ValueError("counts cannot be represented by score_dtype")
+        if self.score_dtype is not None:
+            score = score.astype(self.score_dtype)
+
+        # keep the last events
+        index = order[ends - 1]
+        sort_index = np.argsort(index)
+        n_merged = self.n_events - starts.shape[0]
+        self._select_events(index[sort_index])
+        self.score = score[sort_index]
+        if policy == 'count':
+            self.score_domain = np.array([1, np.max(score), 1])
+            self.n_score_levels = int(np.max(score))
+
+        return n_merged
+
+    def append_events(self, event, score, event_feature=None):
+        """
+        Append events and their scores to the current event data
+
+        The domain of scores is not changed.  see
+        :meth:`kamrecsys.data.EventData.append_events`
+
+        Parameters
+        ----------
+        event : array_like, shape=(n_new_events, s_event)
+            each row corresponds to an event represented by a vector of object
+            with external ids
+        score : array_like, shape=(n_new_events,)
+            a set of rating scores
+        event_feature : optional, array_like, shape=(n_new_events, variable)
+            feature of events
+
+        Raises
+        ------
+        ValueError
+            if event features are inconsistent with the current data, or
+            given scores or ids cannot be represented by specified dtypes
+        """
+
+        # set events if no events are stored
+        if self.__dict__.get('_view') is None and self.event is None:
+            self.set_event(event, score, event_feature=event_feature)
+            return
+
+        score = np.atleast_1d(np.asarray(score))
+        if score.shape[0] != np.atleast_2d(event).shape[0]:
+            raise ValueError("the numbers of events and scores are different")
+        if self.score_dtype is not None:
+            new_score = score.astype(self.score_dtype)
+            if (self.score_dtype.kind in 'iu' and
+                    not np.array_equal(new_score, score)):
+                raise ValueError(
+                    "scores cannot be represented by score_dtype")
+            score = new_score
+
+        super(EventWithScoreData, self).append_events(
+            event, event_feature=event_feature)
+        self.score = self._append_rows('score', self.score, score)
+
+    def iter_minibatches(
+            self, batch_size=1000, shuffle=True, stratify=False,
+            random_state=None):
+        """
+        Generate minibatches of events and scores
+
+        Only an array of event indexes is permuted, and events of each
+        minibatch are read from storage in their original order.  Therefore,
+        memory-mapped data are not loaded as a whole.
+
+        Parameters
+        ----------
+        batch_size : optional, int
+            the number of events in each minibatch (default=1000).  the last
+            minibatch may be smaller.
+        shuffle : optional, bool
+            shuffle events if True (default=True)
+        stratify : optional, bool
+            if True, events of each user, i.e., the object of the first
+            element of events, are evenly spread over minibatches
+            (default=False).  This is effective only when `shuffle` is True.
+        random_state : RandomState or an int seed, optional
+            A random number generator instance (default=None)
+
+        Yields
+        ------
+        ev : array, shape=(batch_size, s_event)
+            events represented by internal ids
+        sc : array, shape=(batch_size,)
+            scores of events
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be >= 1")
+        n_events = self.n_events
+
+        if not shuffle:
+            for start in xrange(0, n_events, batch_size):
+                end = min(start + batch_size, n_events)
+                yield self.event[start:end], self.score[start:end]
+            return
+
+        rng = check_random_state(random_state)
+        if stratify:
+            # rank events randomly in each user, and sort events by
+            # their relative ranks with random offsets of each user
+            user = self.event[:, 0]
+            perm = rng.permutation(n_events)
+            order = perm[np.argsort(user[perm], kind='mergesort')]
+            counts = np.bincount(user, minlength=self.n_objects[
+                self.event_otypes[0]])
+            rank = np.empty(n_events, dtype=float)
+            rank[order] = (
+                np.arange(n_events) - np.repeat(np.cumsum(counts) - counts,
+                                                counts))
+            rank += rng.random_sample(counts.shape[0])[user]
+            rank /= counts[user]
+            index = np.argsort(rank, kind='mergesort')
+        else:
+            index = rng.permutation(n_events)
+
+        for start in xrange(0, n_events, batch_size):
+            batch = np.sort(index[start:start + batch_size])
+            yield self.event[batch], self.score[batch]
+
+    def filter_event(self, filter_cond, lazy=False, keep_objects=False):
         """
         Returns a copy of data whose events are filtered based on
         `filter_cond` .  Information about the objects that is not contained
@@ -213,28 +422,44 @@ class EventWithScoreData(EventData, ScoreUtilMixin):
 
         Parameters
         ----------
-        filter_cond : array, dtype=bool, shape=(n_events,)
-            Boolean array that specifies whether each event should be included
-            in a new event array.
+        filter_cond : array, dtype=bool or int
+            Boolean array of shape=(n_events,) that specifies whether each
+            event should be included in a new event array, or an array of
+            indexes of events to be included.
+        lazy : optional, bool
+            return a lazily evaluated view if True (default=False).  see
+            :meth:`kamrecsys.data.EventData.filter_event`
+        keep_objects : optional, bool
+            keep all objects of this data if True (default=False)
 
         Returns
         -------
         data : :class:`kamrecsys.EventDataWithScore`
             A copy of data whose events are filtered.
         """
+        return super(EventWithScoreData, self).filter_event(
+            filter_cond, lazy=lazy, keep_objects=keep_objects)
 
-        # check whether event info is available
-        if self.event is None:
-            return
+    # attributes that are lazily evaluated in a filtered view
+    _view_attrs = EventData._view_attrs + ('score',)
 
-        # filter out event related information
-        data = super(EventWithScoreData, self).filter_event(filter_cond)
-
-        # filter out event data
-        if self.score is not None:
-            data.score = self.score[filter_cond]
+    def _evaluate_view(self, name):
+        """
+        Compute an attribute of a filtered view
 
-        return data
+        Parameters
+        ----------
+        name : str
+            the name of an attribute to compute
+        """
+        if name == 'score':
+            parent, index = self._view[0], self._view[1]
+            if parent.score is None:
+                self.score = None
+            else:
+                self.score = parent.score[index]
+        else:
+            super(EventWithScoreData, self)._evaluate_view(name)
 
 
 # =============================================================================
@@ -0,0 +1,392 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Data Container: event data partitioned into user-disjoint shards
+
+Events are partitioned based on hash values of the external ids of users,
+i.e., the objects of the first element of events.  Each shard is stored in
+a storage directory of :func:`kamrecsys.data.save_event_data` , and has its
+own internal id space.  Internal ids in a shard are mapped to the global
+internal ids, which are shared by all shards.
+
+A sharded directory contains ``sharded.json`` , arrays of global external
+ids, ``eid0.npy`` , ``eid1.npy`` , ..., and sub-directories of shards,
+``shard0`` , ``shard1`` , ....  Each shard directory additionally contains
+maps from local to global internal ids, ``global_iid0.npy`` , ....
+"""
+
+from __future__ import (
+    print_function,
+    division,
+    absolute_import,
+    unicode_literals)
+from six.moves import xrange
+
+# =============================================================================
+# Imports
+# =============================================================================
+
+import json
+import logging
+import os
+import zlib
+
+import numpy as np
+
+from . import EventData
+from .storage import save_event_data, open_event_data
+
+# =============================================================================
+# Public symbols
+# =============================================================================
+
+__all__ = []
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+# version of the format of sharded directories
+SHARDED_FORMAT_VERSION = 1
+
+# name of the file storing information of shards
+SHARDED_INFO_FILE = 'sharded.json'
+
+# =============================================================================
+# Module variables
+# =============================================================================
+
+# =============================================================================
+# Classes
+# =============================================================================
+
+
+class ShardedEventData(object):
+    """
+    Event data partitioned into user-disjoint shards
+
+    Parameters
+    ----------
+    path : str
+        path to the sharded directory generated by
+        :func:`shard_event_data`
+    mmap_mode : {None, 'r', 'r+', 'c'}, default='r'
+        mode to open arrays. see :func:`kamrecsys.data.open_event_data`
+
+    Attributes
+    ----------
+    n_shards : int
+        the number of shards
+    n_otypes : int
+        the number of object types
+    n_objects : array_like, shape=(n_otypes), dtype=int
+        the numbers of objects in all shards
+    n_events : array_like, shape=(n_shards), dtype=int
+        the numbers of events in each shard
+    eid : array_like, shape=(n_otypes,), dtype=(array_like)
+        global external ids.  the j-th element of eid[i] is the external id
+        of the object whose global internal id is j.
+
+    Raises
+    ------
+    IOError
+        if a sharded directory is broken
+    """
+
+    def __init__(self, path, mmap_mode='r'):
+        self.path = path
+        self.mmap_mode = mmap_mode
+
+        info_file = os.path.join(path, SHARDED_INFO_FILE)
+        try:
+            with open(info_file, 'r') as f:
+                info = json.load(f)
+        except ValueError:
+            raise IOError("broken sharded info: " + info_file)
+        if info.get('version') != SHARDED_FORMAT_VERSION:
+            raise IOError("unsupported sharded version: " + info_file)
+
+        self.n_shards = info['n_shards']
+        self.n_otypes = info['n_otypes']
+        self.n_events = np.array(info['n_events'], dtype=int)
+        self.eid = np.tile(None, self.n_otypes)
+        for otype in xrange(self.n_otypes):
+            self.eid[otype] = np.load(
+                os.path.join(path, 'eid' + str(otype) + '.npy'),
+                mmap_mode=mmap_mode)
+        self.n_objects = np.array(
+            [self.eid[otype].shape[0] for otype in xrange(self.n_otypes)],
+            dtype=int)
+
+    def __len__(self):
+        return self.n_shards
+
+    def get_shard_path(self, shard):
+        """
+        Path to the storage directory of a shard
+
+        Parameters
+        ----------
+        shard : int
+            shard number
+
+        Returns
+        -------
+        path : str
+            path to the storage directory
+        """
+        return os.path.join(self.path, 'shard' + str(shard))
+
+    def get_shard(self, shard):
+        """
+        Open a shard
+
+        Parameters
+        ----------
+        shard : int
+            shard number
+
+        Returns
+        -------
+        data : :class:`kamrecsys.data.EventData`
+            data of a shard, whose internal ids are local to the shard
+        """
+        if shard < 0 or shard >= self.n_shards:
+            raise ValueError("Illegal shard number: " + str(shard))
+
+        return open_event_data(
+            self.get_shard_path(shard), mmap_mode=self.mmap_mode)
+
+    def iter_shards(self):
+        """
+        Generate shards
+
+        Yields
+        ------
+        shard : int
+            shard number
+        data : :class:`kamrecsys.data.EventData`
+            data of a shard
+        """
+        for shard in xrange(self.n_shards):
+            yield shard, self.get_shard(shard)
+
+    def get_global_iid(self, shard, otype):
+        """
+        Map from local internal ids in a shard to global internal ids
+
+        Parameters
+        ----------
+        shard : int
+            shard number
+        otype : int
+            object type
+
+        Returns
+        -------
+        global_iid : array, shape=(n_objects_in_shard,), dtype=int
+            the j-th element is the global internal id of the object whose
+            local internal id is j.
+        """
+        return np.load(
+            os.path.join(self.get_shard_path(shard),
+                         'global_iid' + str(otype) + '.npy'),
+            mmap_mode=self.mmap_mode)
+
+    def to_local_iid(self, shard, otype, global_iid):
+        """
+        Convert global internal ids to local internal ids in a shard
+
+        Parameters
+        ----------
+        shard : int
+            shard number
+        otype : int
+            object type
+        global_iid : array_like
+            global internal ids
+
+        Returns
+        -------
+        iid : array, dtype=int
+            local internal ids.  -1 if an object is not contained in a shard.
+        """
+        table = self.get_global_iid(shard, otype)
+        global_iid = np.asarray(global_iid)
+        if table.shape[0] == 0:
+            return np.full(global_iid.shape, -1, dtype=int)
+        order = np.argsort(table, kind='mergesort')
+        pos = np.asarray(np.searchsorted(table[order], global_iid))
+        pos[pos >= table.shape[0]] = 0
+
+        return np.where(table[order[pos]] == global_iid, order[pos], -1)
+
+
+# =============================================================================
+# Functions
+# =============================================================================
+
+
+def shard_of(eid, n_shards):
+    """
+    Shard numbers of users
+
+    External ids are hashed by multiplicative hashing if they are integers;
+    otherwise by CRC32 of their string representations.  Hence, shard
+    numbers do not depend on processes.
+
+    Parameters
+    ----------
+    eid : array_like
+        external ids of users
+    n_shards : int
+        the number of shards
+
+    Returns
+    -------
+    shard : array, dtype=int
+        shard numbers
+    """
+    eid = np.asarray(eid)
+    if eid.dtype.kind in 'iu':
+        key = eid.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        key >>= np.uint64(32)
+    else:
+        key = np.array(
+            [zlib.crc32(str(i).encode('utf-8')) & 0xffffffff
+             for i in eid.flat], dtype=np.uint64).reshape(eid.shape)
+
+    return (key % np.uint64(n_shards)).astype(int)
+
+
+def write_sharded_info(path, eid, shard_eid, n_events):
+    """
+    Write global information of shards
+
+    Each shard must be already stored in its shard directory.  Maps from
+    local to global internal ids are written to the shard directories.
+
+    Parameters
+    ----------
+    path : str
+        path to the sharded directory
+    eid : array_like, shape=(n_otypes,), dtype=(array_like)
+        sorted global external ids of each object type
+    shard_eid : list of array_like, shape=(n_otypes,), dtype=(array_like)
+        external ids of each shard, which are `eid` of shard data
+    n_events : array_like, shape=(n_shards,), dtype=int
+        the numbers of events in each shard
+    """
+    n_otypes = len(eid)
+    for otype in xrange(n_otypes):
+        np.save(os.path.join(path, 'eid' + str(otype) + '.npy'), eid[otype])
+    for shard, local_eid in enumerate(shard_eid):
+        for otype in xrange(n_otypes):
+            np.save(
+                os.path.join(path, 'shard' + str(shard),
+                             'global_iid' + str(otype) + '.npy'),
+                np.searchsorted(eid[otype], local_eid[otype]))
+
+    info = {
+        'version': SHARDED_FORMAT_VERSION,
+        'n_shards': len(shard_eid),
+        'n_otypes': n_otypes,
+        'n_events': [int(n) for n in n_events]}
+    with open(os.path.join(path, SHARDED_INFO_FILE), 'w') as f:
+        json.dump(info, f)
+
+
+def shard_event_data(data, path, n_shards):
+    """
+    Partition event data into user-disjoint shards
+
+    Parameters
+    ----------
+    data : :class:`kamrecsys.data.EventData`
+        data to partition
+    path : str
+        path to the sharded directory. it is created if not exists.
+    n_shards : int
+        the number of shards
+
+    Returns
+    -------
+    sharded_data : :class:`ShardedEventData`
+        partitioned data
+
+    Raises
+    ------
+    TypeError
+        if input data is not :class:`kamrecsys.data.EventData` class
+    ValueError
+        if n_shards < 1, or event information is not set
+    """
+    if not isinstance(data, EventData):
+        raise TypeError("input data must data.EventData class")
+    if n_shards < 1:
+        raise ValueError("n_shards must be >= 1")
+    if data.event is None:
+        raise ValueError("event information is not set")
+
+    # info file is removed first and written at last to mark the completion
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    info_file = os.path.join(path, SHARDED_INFO_FILE)
+    if os.path.exists(info_file):
+        os.remove(info_file)
+
+    # assign events to shards
+    user_shard = shard_of(data.eid[data.event_otypes[0]], n_shards)
+    event_shard = user_shard[data.event[:, 0]]
+
+    # store shards.  only external ids and the numbers of events are kept
+    # so that a single shard is held in memory at once.
+    shard_eid = []
+    n_events = []
+    for shard in xrange(n_shards):
+        shard_data = data.filter_event(event_shard == shard)
+        save_event_data(shard_data, os.path.join(path, 'shard' + str(shard)))
+        shard_eid.append(shard_data.eid)
+        n_events.append(shard_data.n_events)
+        del shard_data
+
+    # global external ids are sorted
+    eid = np.tile(None, data.n_otypes)
+    for otype in xrange(data.n_otypes):
+        eid[otype] = np.sort(data.eid[otype])
+    write_sharded_info(path, eid, shard_eid, n_events)
+
+    return ShardedEventData(path)
+
+
+# =============================================================================
+# Module initialization
+# =============================================================================
+
+# init logging system ---------------------------------------------------------
+logger = logging.getLogger('kamrecsys')
+if not logger.handlers:
+    logger.addHandler(logging.NullHandler())
+
+# =============================================================================
+# Test routine
+# =============================================================================
+
+
+def _test():
+    """ test function for this module
+    """
+
+    # perform doctest
+    import sys
+    import doctest
+
+    doctest.testmod()
+
+    sys.exit(0)
+
+
+# Check if this is call as command script -------------------------------------
+
+if __name__ == '__main__':
+    _test()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Data Container: event data shared among processes
+
+Arrays of event data are placed in shared memory blocks, and worker
+processes attach them without copying.  A picklable handle is passed to
+workers instead of data themselves.
+
+>>> with SharedEventData(data) as shared:  # doctest: +SKIP
+...     with ProcessPoolExecutor() as executor:
+...         executor.map(func, repeat(shared.handle, n_folds), folds)
+
+In a worker, ``attach_event_data(handle)`` returns read-only event data.
+"""
+
+from __future__ import (
+    print_function,
+    division,
+    absolute_import,
+    unicode_literals)
+from six.moves import xrange
+
+# =============================================================================
+# Imports
+# =============================================================================
+
+import logging
+
+import numpy as np
+
+from . import EventData
+from .storage import (
+    _get_storage_arrays, _gen_storage_info, _restore_event_data)
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+# =============================================================================
+# Public symbols
+# =============================================================================
+
+__all__ = []
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+# =============================================================================
+# Module variables
+# =============================================================================
+
+# =============================================================================
+# Classes
+# =============================================================================
+
+
+class SharedEventDataHandle(object):
+    """
+    Picklable handle to event data placed in shared memory
+
+    Parameters
+    ----------
+    info : dict
+        information of event data other than arrays
+    arrays : dict
+        a key is the name of an array, and a value is a tuple of the name of
+        a shared memory block, dtype, and shape of the array
+    """
+
+    def __init__(self, info, arrays):
+        self.info = info
+        self.arrays = arrays
+
+    def attach(self):
+        """
+        Attach event data in shared memory
+
+        Returns
+        -------
+        data : :class:`kamrecsys.data.EventData`
+            see :func:`attach_event_data`
+        """
+        return attach_event_data(self)
+
+
+class SharedEventData(object):
+    """
+    Owner of event data placed in shared memory
+
+    Arrays of given data are copied to shared memory blocks at construction.
+    The blocks are released by :meth:`close` , or at the end of a `with`
+    statement.  Workers must not access data after releasing.
+
+    Parameters
+    ----------
+    data : :class:`kamrecsys.data.EventData`
+        data to share
+
+    Attributes
+    ----------
+    handle : :class:`SharedEventDataHandle`
+        picklable handle passed to worker processes
+
+    Raises
+    ------
+    ImportError
+        if :mod:`multiprocessing.shared_memory` is not available
+    TypeError
+        if input data is not :class:`kamrecsys.data.EventData` class
+    ValueError
+        if event information is not set, or arrays containing objects are
+        included
+    """
+
+    def __init__(self, data):
+        if shared_memory is None:
+            raise ImportError("multiprocessing.shared_memory is required")
+        if not isinstance(data, EventData):
+            raise TypeError("input data must data.EventData class")
+        if data.event is None:
+            raise ValueError("event information is not set")
+
+        arrays = _get_storage_arrays(data)
+        if any(np.asarray(v).dtype.hasobject for v in arrays.values()):
+            raise ValueError("arrays of objects cannot be shared")
+
+        self._blocks = []
+        specs = {}
+        try:
+            for name, array in arrays.items():
+                array = np.asarray(array)
+                block = shared_memory.SharedMemory(
+                    create=True, size=max(array.nbytes, 1))
+                self._blocks.append(block)
+                shared_array = np.ndarray(
+                    array.shape, dtype=array.dtype, buffer=block.buf)
+                shared_array[...] = array
+                del shared_array
+                specs[name] = (block.name, array.dtype, array.shape)
+        except Exception:
+            self.close()
+            raise
+
+        self.handle = SharedEventDataHandle(_gen_storage_info(data), specs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Release shared memory blocks
+        """
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+# =============================================================================
+# Functions
+# =============================================================================
+
+
+def _open_block(name):
+    """
+    Open a shared memory block created by another process
+
+    The block is not tracked in this process if possible, because it is
+    released by its owner.  Otherwise, processes started by
+    :mod:`multiprocessing` share the tracker with their owner.
+
+    Parameters
+    ----------
+    name : str
+        the name of a shared memory block
+
+    Returns
+    -------
+    block : :class:`multiprocessing.shared_memory.SharedMemory`
+        opened block
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def attach_event_data(handle):
+    """
+    Attach event data in shared memory
+
+    Parameters
+    ----------
+    handle : :class:`SharedEventDataHandle`
+        handle of shared data
+
+    Returns
+    -------
+    data : :class:`kamrecsys.data.EventData`
+        data whose arrays refer shared memory blocks.  Arrays are read-only.
+        If score information is shared, an instance of
+        :class:`kamrecsys.data.EventWithScoreData` is returned.
+
+    Raises
+    ------
+    ImportError
+        if :mod:`multiprocessing.shared_memory` is not available
+    """
+    if shared_memory is None:
+        raise ImportError("multiprocessing.shared_memory is required")
+
+    blocks = []
+
+    def load_array(name):
+        block_name, dtype, shape = handle.arrays[name]
+        block = _open_block(block_name)
+        blocks.append(block)
+        array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        array.flags.writeable = False
+        return array
+
+    data = _restore_event_data(handle.info, load_array)
+    data._shared_memory = blocks
+
+    return data
+
+
+# =============================================================================
+# Module initialization
+# =============================================================================
+
+# init logging system ---------------------------------------------------------
+logger = logging.getLogger('kamrecsys')
+if not logger.handlers:
+    logger.addHandler(logging.NullHandler())
+
+# =============================================================================
+# Test routine
+# =============================================================================
+
+
+def _test():
+    """ test function for this module
+    """
+
+    # perform doctest
+    import sys
+    import doctest
+
+    doctest.testmod()
+
+    sys.exit(0)
+
+
+# Check if this is call as command script -------------------------------------
+
+if __name__ == '__main__':
+    _test()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Data Container: persistent storage of event data
+
+Event data are stored in a directory.  Each array is saved as a ``.npy``
+file, and the other information is saved in a ``info.json`` file.  Stored
+arrays can be memory-mapped, and several processes can share one physical
+copy of a data set.
+"""
+
+from __future__ import (
+    print_function,
+    division,
+    absolute_import,
+    unicode_literals)
+from six.moves import xrange
+
+# =============================================================================
+# Imports
+# =============================================================================
+
+import json
+import logging
+import os
+
+import numpy as np
+
+from . import EventData, EventWithScoreData
+
+# =============================================================================
+# Public symbols
+# =============================================================================
+
+__all__ = []
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+# version of the format of storage directories
+STORAGE_FORMAT_VERSION = 1
+
+# name of the file storing information other than arrays
+STORAGE_INFO_FILE = 'info.json'
+
+# =============================================================================
+# Module variables
+# =============================================================================
+
+# =============================================================================
+# Classes
+# =============================================================================
+
+# =============================================================================
+# Functions
+# =============================================================================
+
+
+def _get_storage_arrays(data):
+    """
+    Arrays to store
+
+    Parameters
+    ----------
+    data : :class:`kamrecsys.data.EventData`
+        data to store
+
+    Returns
+    -------
+    arrays : dict
+        arrays to store. a key is the name of an array file.
+    """
+    arrays = {'event': data.event}
+    for otype in xrange(data.n_otypes):
+        arrays['eid' + str(otype)] = data.eid[otype]
+        if data.feature[otype] is not None:
+            arrays['feature' + str(otype)] = data.feature[otype]
+    if data.event_feature is not None:
+        arrays['event_feature'] = data.event_feature
+    if isinstance(data, EventWithScoreData):
+        arrays['score'] = data.score
+
+    return arrays
+
+
+def _gen_storage_info(data):
+    """
+    Information of event data other than arrays
+
+    Parameters
+    ----------
+    data : :class:`kamrecsys.data.EventData`
+        data to store
+
+    Returns
+    -------
+    info : dict
+        information that can be serialized in a JSON format
+    """
+    info = {
+        'version': STORAGE_FORMAT_VERSION,
+        'class': type(data).__name__,
+        'n_otypes': int(data.n_otypes),
+        'event_otypes': [int(i) for i in data.event_otypes],
+        'arrays': sorted(_get_storage_arrays(data).keys())}
+    if isinstance(data, EventWithScoreData):
+        info['score_domain'] = np.asarray(data.score_domain).tolist()
+        info['n_score_levels'] = int(data.n_score_levels)
+
+    return info
+
+
+def _restore_event_data(info, load_array):
+    """
+    Restore event data from stored information and arrays
+
+    Parameters
+    ----------
+    info : dict
+        information generated by :func:`_gen_storage_info`
+    load_array : callable
+        function that returns a stored array given its name
+
+    Returns
+    -------
+    data : :class:`kamrecsys.data.EventData`
+        restored data
+    """
+    if info['class'] == EventWithScoreData.__name__:
+        data = EventWithScoreData(
+            n_otypes=info['n_otypes'], event_otypes=info['event_otypes'])
+    else:
+        data = EventData(
+            n_otypes=info['n_otypes'], event_otypes=info['event_otypes'])
+
+    # object information
+    for otype in xrange(data.n_otypes):
+        data.eid[otype] = load_array('eid' + str(otype))
+        data.n_objects[otype] = data.eid[otype].shape[0]
+        if 'feature' + str(otype) in info['arrays']:
+            data.feature[otype] = load_array('feature' + str(otype))
+
+    # event information
+    data.event = load_array('event')
+    data.n_events = data.event.shape[0]
+    data.index_dtype = data.event.dtype
+    if 'event_feature' in info['arrays']:
+        data.event_feature = load_array('event_feature')
+
+    # score information
+    if isinstance(data, EventWithScoreData):
+        data.score = load_array('score')
+        data.score_dtype = data.score.dtype
+        data.score_domain = np.asanyarray(info['score_domain'])
+        data.n_score_levels = info['n_score_levels']
+
+    return data
+
+
+def create_storage_array(path, name, dtype, shape):
+    """
+    Create an empty array file in a storage directory, and memory-map it
+
+    This is used for writing arrays too large to hold in memory.  After all
+    arrays are filled, :func:`write_storage_info` must be called.
+
+    Parameters
+    ----------
+    path : str
+        path to the storage directory. it is created if not exists.
+    name : str
+        name of an array, such as ``event``, ``score``, or ``eid0``
+    dtype : np.dtype
+        dtype of an array
+    shape : tuple
+        shape of an array
+
+    Returns
+    -------
+    array : np.memmap
+        writable array mapped to the file
+    """
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+    return np.lib.format.open_memmap(
+        os.path.join(path, name + '.npy'), mode='w+', dtype=dtype,
+        shape=shape)
+
+
+def write_storage_info(path, data):
+    """
+    Write information of event data to a storage directory
+
+    Arrays of `data` must be already stored in the directory.
+
+    Parameters
+    ----------
+    path : str
+        path to the storage directory
+    data : :class:`kamrecsys.data.EventData`
+        stored data
+    """
+    with open(os.path.join(path, STORAGE_INFO_FILE), 'w') as f:
+        json.dump(_gen_storage_info(data), f)
+
+
+def save_event_data(data, path):
+    """
+    Save event data to a storage directory
+
+    Parameters
+    ----------
+    data : :class:`kamrecsys.data.EventData`
+        data to save.  If this is an instance of
+        :class:`kamrecsys.data.EventWithScoreData` , score information is
+        saved as well.
+    path : str
+        path to the storage directory. it is created if not exists.
+
+    Raises
+    ------
+    TypeError
+        if input data is not :class:`kamrecsys.data.EventData` class
+    ValueError
+        if event information is not set, or arrays containing objects are
+        included
+    """
+    if not isinstance(data, EventData):
+        raise TypeError("input data must data.EventData class")
+    if data.event is None:
+        raise ValueError("event information is not set")
+
+    arrays = _get_storage_arrays(data)
+    if any(np.asarray(v).dtype.hasobject for v in arrays.values()):
+        raise ValueError("arrays of objects cannot be stored")
+
+    # info file is removed first and written at last to mark the completion
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    info_file = os.path.join(path, STORAGE_INFO_FILE)
+    if os.path.exists(info_file):
+        os.remove(info_file)
+    for k, v in arrays.items():
+        np.save(os.path.join(path, k + '.npy'), v)
+    write_storage_info(path, data)
+
+
+def open_event_data(path, mmap_mode='r'):
+    """
+    Open event data in a storage directory
+
+    Parameters
+    ----------
+    path : str
+        path to the storage directory
+    mmap_mode : {None, 'r', 'r+', 'c'}, default='r'
+        If not None, arrays are memory-mapped in a specified mode.  see
+        :func:`numpy.load` .  If None, arrays are loaded into memory.
+
+    Returns
+    -------
+    data : :class:`kamrecsys.data.EventData`
+        data whose arrays are instances of :class:`numpy.memmap` .  If score
+        information is stored, an instance of
+        :class:`kamrecsys.data.EventWithScoreData` is returned.
+
+    Raises
+    ------
+    IOError
+        if a storage directory is broken
+    """
+    info_file = os.path.join(path, STORAGE_INFO_FILE)
+    try:
+        with open(info_file, 'r') as f:
+            info = json.load(f)
+    except ValueError:
+        raise IOError("broken storage info: " + info_file)
+    if info.get('version') != STORAGE_FORMAT_VERSION:
+        raise IOError("unsupported storage version: " + info_file)
+
+    def load_array(name):
+        return np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode)
+
+    return _restore_event_data(info, load_array)
+
+
+# =============================================================================
+# Module initialization
+# =============================================================================
+
+# init logging system ---------------------------------------------------------
+logger = logging.getLogger('kamrecsys')
+if not logger.handlers:
+    logger.addHandler(logging.NullHandler())
+
+# =============================================================================
+# Test routine
+# =============================================================================
+
+
+def _test():
+    """ test function for this module
+    """
+
+    # perform doctest
+    import sys
+    import doctest
+
+    doctest.testmod()
+
+    sys.exit(0)
+
+
+# Check if this is call as command script -------------------------------------
+
+if __name__ == '__main__':
+    _test()
@@ -55,6 +55,56 @@ class TestBaseData(TestCase):
         with assert_raises(ValueError):
             data.to_eid(1, 100)
 
+    def test_set_feature(self):
+        import os
+        import shutil
+        import tempfile
+        from kamrecsys.data import EventData
+
+        data = EventData()
+        data.set_event([[1, 20], [3, 10], [5, 20]])
+
+        # features are aligned to internal ids
+        x = np.array(
+            [(5, 50.), (7, 70.), (1, 10.), (3, 30.)],
+            dtype=[('eid', int), ('feature', float)])
+        data.set_feature(0, x['eid'], x['feature'])
+        assert_array_equal(data.feature[0], [10., 30., 50.])
+
+        data.set_feature(1, [20, 10], np.array(['B', 'A']))
+        assert_array_equal(data.feature[1], ['A', 'B'])
+
+        # aligned memory-mapped features are not copied
+        tmpdir = tempfile.mkdtemp()
+        try:
+            feature = np.lib.format.open_memmap(
+                os.path.join(tmpdir, 'feature.npy'), mode='w+',
+                dtype=[('age', int)], shape=(3,))
+            feature['age'] = [10, 30, 50]
+            data.set_feature(0, [1, 3, 5], feature)
+            self.assertIs(data.feature[0], feature)
+            data.set_feature(0, [5, 3, 1], feature)
+            self.assertIsNot(data.feature[0], feature)
+            assert_array_equal(data.feature[0]['age'], [50, 30, 10])
+            del feature
+            data.feature[0] = None
+
+            # loader-shaped input having trailing rows of unseen objects
+            x = np.lib.format.open_memmap(
+                os.path.join(tmpdir, 'object.npy'), mode='w+',
+                dtype=[('eid', int), ('feature', [('age', int)])],
+                shape=(5,))
+            x['eid'] = [1, 3, 5, 7, 9]
+            x['feature']['age'] = [10, 30, 50, 70, 90]
+            data.set_feature(0, x['eid'], x['feature'])
+            self.assertIsInstance(data.feature[0], np.memmap)
+            self.assertTrue(np.shares_memory(data.feature[0], x))
+            assert_array_equal(data.feature[0]['age'], [10, 30, 50])
+            del x
+            data.feature[0] = None
+        finally:
+            shutil.rmtree(tmpdir)
+
     def test_gen_id_substitution_table(self):
         from kamrecsys.data import ObjectUtilMixin
 
@@ -71,6 +121,106 @@ class TestBaseData(TestCase):
              -1, 6, 7, -1, 8, 9, 10, 11, -1, 12])
 
 
+class TestIdMap(TestCase):
+
+    def test_lookup(self):
+        from kamrecsys.data import IdMap
+
+        eid = np.tile(None, 3)
+        eid[0] = np.array([1, 3, 4, 7, 8], dtype=int)
+        eid[1] = np.array([5, 100000, 3, 70000], dtype=int)
+        eid[2] = np.array(['a', 'ab', 'b', 'c'])
+        id_map = IdMap(eid)
+
+        # dense table
+        assert_array_equal(
+            id_map.lookup(0, [8, 1, 2, 9, 0, -5, 4]),
+            [4, 0, -1, -1, -1, -1, 2])
+        assert_array_equal(
+            id_map.lookup(0, [[8, 1], [2, 4]], missing_value=5),
+            [[4, 0], [5, 2]])
+        assert_array_equal(id_map.lookup(0, 3.0), 1)
+
+        # binary search over unsorted external ids
+        assert_array_equal(
+            id_map.lookup(1, [3, 5, 4, 70000, 100000, 100001]),
+            [2, 0, -1, 3, 1, -1])
+
+        # string ids
+        assert_array_equal(
+            id_map.lookup(2, ['c', 'a', 'x', 'ab']), [3, 0, -1, 1])
+        assert_array_equal(id_map.lookup(2, [1, 2]), [-1, -1])
+
+        # tables are re-generated if external ids are replaced
+        eid[0] = np.array([2, 9], dtype=int)
+        assert_array_equal(id_map.lookup(0, [9, 1, 2]), [1, -1, 0])
+
+    def test_dict(self):
+        from kamrecsys.data import IdMap
+
+        eid = np.tile(None, 2)
+        eid[0] = np.array([1, 3, 4], dtype=int)
+        id_map = IdMap(eid)
+
+        self.assertEqual(len(id_map), 2)
+        self.assertDictEqual(id_map[0], {1: 0, 3: 1, 4: 2})
+        self.assertIsNone(id_map[1])
+        self.assertIs(id_map[0], id_map[0])
+
+        eid[0] = np.array([5, 2], dtype=int)
+        self.assertDictEqual(id_map[0], {5: 0, 2: 1})
+
+    def test_update(self):
+        from kamrecsys.data import IdMap
+
+        eid = np.tile(None, 3)
+        eid[0] = np.array([3, 4, 6], dtype=int)
+        eid[1] = np.array([500, 10, 70000], dtype=int)
+        eid[2] = np.array(['b', 'a'])
+        id_map = IdMap(eid)
+        for otype in xrange(3):
+            id_map.lookup(otype, eid[otype])
+        base_map = IdMap(eid.copy(), base=id_map)
+
+        # dense tables are extended to both directions
+        for new_eid in [[5], [8], [1], [-2, 12, 13]]:
+            eid[0] = np.r_[eid[0], new_eid]
+            id_map.update(0)
+            self.assertEqual(id_map._get_table(0)[0], 'dense')
+            assert_array_equal(
+                id_map.lookup(0, eid[0]), np.arange(eid[0].shape[0]))
+        assert_array_equal(id_map.lookup(0, [0, 2, 7, 9, 14]), -1)
+
+        # sorted runs are merged
+        for i in xrange(20):
+            eid[1] = np.r_[eid[1], [900000 - i, 20 + i]]
+            id_map.update(1)
+        runs = id_map._get_table(1)[1]
+        assert_array_less(len(runs), 5)
+        assert_array_equal(
+            id_map.lookup(1, eid[1]), np.arange(eid[1].shape[0]))
+        assert_array_equal(id_map.lookup(1, [11, 899980, 41]), -1)
+
+        # string ids
+        eid[2] = np.r_[eid[2], ['c', 'aa']]
+        id_map.update(2)
+        assert_array_equal(id_map.lookup(2, ['aa', 'c', 'a', 'x']),
+                           [3, 2, 1, -1])
+
+        # too sparse ids are looked up by a binary search
+        eid[0] = np.r_[eid[0], 1000]
+        id_map.update(0)
+        self.assertEqual(id_map._get_table(0)[0], 'sorted')
+        assert_array_equal(
+            id_map.lookup(0, eid[0]), np.arange(eid[0].shape[0]))
+
+        # tables shared with another map are not modified
+        assert_array_equal(base_map.lookup(0, [3, 4, 6, 5, 1]),
+                           [0, 1, 2, -1, -1])
+        assert_array_equal(base_map.lookup(1, [500, 10, 70000, 20]),
+                           [0, 1, 2, -1])
+
+
 # =============================================================================
 # Main Routines
 # =============================================================================
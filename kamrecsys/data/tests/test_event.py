@@ -142,6 +142,154 @@ class TestEventData(TestCase):
         assert_array_equal(
             filtered_data.event, [[0, 0], [2, 2], [3, 3], [1, 1], [2, 2]])
 
+    def test_event_index(self):
+        from kamrecsys.data import EventWithScoreData
+
+        data = EventWithScoreData()
+        data.set_event(
+            [[1, 10], [3, 10], [5, 20], [3, 30], [7, 20], [1, 30]],
+            [1., 2., 3., 4., 5., 1.])
+        data.append_events([[9, 10]], [4.])
+
+        indptr, indices = data.get_event_index(0)
+        assert_array_equal(indptr, [0, 2, 4, 5, 6, 7])
+        assert_array_equal(indices, [0, 5, 1, 3, 2, 4, 6])
+        assert_array_equal(data.events_of(1, 0), [0, 1, 6])
+        assert_array_equal(data.events_of(1, 2), [3, 5])
+        assert_array_equal(data.count_events(1), [3, 2, 2])
+        assert_array_equal(
+            data.reduce_events(1, data.score), [7., 8., 5.])
+        assert_array_equal(
+            data.reduce_events(1, data.score, func=np.maximum), [4., 5., 4.])
+        assert_allclose(data.mean_events(0, data.score), [1., 3., 3., 5., 4.])
+
+        # objects without events, and multiple elements of the same type
+        data = EventData(n_otypes=1, event_otypes=[0, 0])
+        data.set_event([[1, 2], [2, 3], [1, 1]])
+        data.filter_event([True, False, True])
+        assert_array_equal(data.events_of(0, 0), [0, 2, 2])
+        assert_array_equal(data.count_events(0), [3, 2, 1])
+        filtered_data = data.filter_event([False, True, False])
+        assert_array_equal(filtered_data.count_events(0), [1, 1])
+        assert_allclose(
+            data.mean_events(0, [[1., 2.], [3., 4.], [5., 6.]]),
+            [[11. / 3, 14. / 3], [2., 3.], [3., 4.]])
+        data.n_objects[0] += 1
+        data.event = data.event.copy()
+        assert_array_equal(data.reduce_events(0, [1, 2, 3]), [7, 3, 2, 0])
+        assert_allclose(
+            data.mean_events(0, [1, 2, 3], missing_value=-1.),
+            [7. / 3, 1.5, 2., -1.])
+
+    def test_filter_event_keep_objects(self):
+        from kamrecsys.data import EventWithScoreData
+
+        data = EventWithScoreData()
+        data.set_event(
+            [[1, 10], [3, 10], [5, 20], [3, 30], [7, 20], [1, 30]],
+            [1., 2., 3., 4., 5., 1.])
+        data.set_feature(0, [1, 3, 5, 7], np.array([10, 30, 50, 70]))
+        assert_array_equal(data.to_iid(0, [5, 7]), [2, 3])
+
+        for lazy in [False, True]:
+            filtered_data = data.filter_event(
+                [0, 2, 5], lazy=lazy, keep_objects=True)
+            assert_array_equal(filtered_data.event, data.event[[0, 2, 5]])
+            assert_array_equal(filtered_data.score, [1., 3., 1.])
+            assert_array_equal(filtered_data.n_objects, [4, 3])
+            self.assertIs(filtered_data.eid[0], data.eid[0])
+            self.assertIs(filtered_data.feature[0], data.feature[0])
+            assert_array_equal(filtered_data.to_iid(0, [5, 7]), [2, 3])
+
+        # a view of a view
+        filtered_data = data.filter_event(
+            [0, 2, 5], lazy=True, keep_objects=True)
+        filtered_data = filtered_data.filter_event(
+            filtered_data.score > 1, lazy=True, keep_objects=True)
+        assert_array_equal(filtered_data.event, [[2, 1]])
+        assert_array_equal(filtered_data.n_objects, [4, 3])
+
+        filtered_data = data.filter_event([0, 2, 5], lazy=True)
+        filtered_data = filtered_data.filter_event(
+            filtered_data.score > 0, lazy=True, keep_objects=True)
+        assert_array_equal(filtered_data.eid[0], [1, 5])
+        assert_array_equal(filtered_data.eid[1], [10, 20, 30])
+        assert_array_equal(filtered_data.event, [[0, 0], [1, 1], [0, 2]])
+
+    def test_temporal_split(self):
+        from kamrecsys.data import EventWithScoreData
+
+        data = EventWithScoreData()
+        data.set_event(
+            [[1, 10], [3, 10], [1, 20], [5, 20], [3, 30], [1, 30]],
+            [1., 2., 3., 4., 5., 1.],
+            event_feature=np.array(
+                [(50, 0), (10, 1), (30, 2), (20, 3), (40, 4), (10, 5)],
+                dtype=[('timestamp', int), ('id', int)]))
+
+        order, sorted_values = data.get_event_feature_order()
+        assert_array_equal(order, [1, 5, 3, 2, 4, 0])
+        assert_array_equal(sorted_values, [10, 10, 20, 30, 40, 50])
+        assert_array_equal(data.search_event_feature(20, 45), [3, 2, 4])
+        assert_array_equal(data.search_event_feature(high=20), [1, 5])
+        assert_array_equal(data.search_event_feature(low=45), [0])
+        assert_array_equal(
+            data.search_event_feature(3, field='id'), [3, 4, 5])
+
+        train_data, test_data = data.temporal_split(30)
+        self.assertIn('_view', test_data.__dict__)
+        assert_array_equal(train_data.score, [2., 4., 1.])
+        assert_array_equal(test_data.score, [1., 3., 5.])
+        assert_array_equal(test_data.eid[0], [1, 3])
+
+        train_data, test_data = data.leave_last_n_split(lazy=False)
+        self.assertNotIn('_view', test_data.__dict__)
+        assert_array_equal(train_data.event_feature['id'], [1, 2, 5])
+        assert_array_equal(test_data.event_feature['id'], [0, 3, 4])
+
+        with assert_raises(ValueError):
+            EventData().get_event_feature_order()
+
+    def test_filter_event_lazy(self):
+        from kamrecsys.data import EventWithScoreData
+
+        data = EventWithScoreData()
+        data.set_event(
+            [[1, 10], [3, 10], [5, 20], [3, 30], [7, 20], [1, 30]],
+            [1., 2., 3., 4., 5., 1.],
+            event_feature=np.arange(6))
+        filter_cond = np.array([True, False, True, True, False, True])
+        orig_data = data.filter_event(filter_cond)
+
+        # a view holds only indexes of events
+        filtered_data = data.filter_event(filter_cond, lazy=True)
+        self.assertNotIn('event', filtered_data.__dict__)
+        self.assertNotIn('eid', filtered_data.__dict__)
+        assert_equal(filtered_data.n_events, 4)
+
+        # attributes are computed when they are accessed
+        assert_array_equal(filtered_data.score, orig_data.score)
+        self.assertNotIn('event', filtered_data.__dict__)
+        assert_array_equal(filtered_data.event, orig_data.event)
+        assert_array_equal(
+            filtered_data.event, [[0, 0], [2, 1], [1, 2], [0, 2]])
+        assert_array_equal(filtered_data.eid[0], [1, 3, 5])
+        assert_array_equal(filtered_data.n_objects, [3, 3])
+        assert_equal(filtered_data.iid[0], {1: 0, 3: 1, 5: 2})
+        assert_array_equal(filtered_data.event_feature, [0, 2, 3, 5])
+        assert_equal(
+            sorted(filtered_data.__dict__.keys()),
+            sorted(orig_data.__dict__.keys()))
+
+        # an array of indexes, and a view of a view
+        filtered_data = data.filter_event([0, 2, 3, 5], lazy=True)
+        filtered_data = filtered_data.filter_event(
+            filtered_data.score > 1, lazy=True)
+        assert_array_equal(filtered_data.score, [3., 4.])
+        assert_array_equal(filtered_data.event, [[1, 0], [0, 1]])
+        assert_array_equal(filtered_data.eid[1], [20, 30])
+        assert_array_equal(data.eid[1], [10, 20, 30])
+
 
 # =============================================================================
 # Main Routines
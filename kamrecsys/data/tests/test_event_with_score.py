@@ -73,6 +73,178 @@ class TestEventWithScoreData(TestCase):
         assert_allclose(data.score_domain, [1.0, 5.0, 0.5])
         self.assertEqual(data.n_score_levels, 9)
 
+    def test_dtype(self):
+        from kamrecsys.data import EventWithScoreData
+
+        event = np.array([[1, 10], [3, 10], [5, 20], [3, 30]])
+        score = np.array([1., 5., 3., 2.])
+
+        data = EventWithScoreData(index_dtype=np.int32, score_dtype=np.uint8)
+        data.set_event(event, score, score_domain=(1, 5, 1))
+        assert_equal(data.event.dtype, np.int32)
+        assert_equal(data.score.dtype, np.uint8)
+        assert_array_equal(data.event, [[0, 0], [1, 0], [2, 1], [1, 2]])
+        assert_array_equal(data.score, [1, 5, 3, 2])
+
+        filtered_data = data.filter_event(data.score > 1)
+        assert_equal(filtered_data.event.dtype, np.int32)
+        assert_equal(filtered_data.score.dtype, np.uint8)
+        assert_array_equal(filtered_data.event, [[0, 0], [1, 1], [0, 2]])
+
+        data = EventWithScoreData(score_dtype=np.float32)
+        data.set_event(event, score)
+        assert_equal(data.event.dtype, int)
+        assert_equal(data.score.dtype, np.float32)
+
+        # scores that cannot be represented
+        data = EventWithScoreData(score_dtype=np.uint8)
+        with assert_raises(ValueError):
+            data.set_event(event, score + 0.5)
+
+        # too narrow dtype
+        data = EventWithScoreData(index_dtype=np.int8)
+        with assert_raises(ValueError):
+            data.set_event(np.arange(600).reshape(300, 2), np.ones(300))
+
+        # illegal dtypes
+        with assert_raises(ValueError):
+            EventWithScoreData(index_dtype=float)
+        with assert_raises(ValueError):
+            EventWithScoreData(score_dtype='U1')
+
+    def test_append_events(self):
+        from kamrecsys.data import EventWithScoreData
+
+        data = EventWithScoreData(score_dtype=np.uint8)
+        data.append_events([[3, 10], [1, 20]], [1, 2])
+        assert_array_equal(data.event, [[1, 0], [0, 1]])
+        assert_array_equal(data.eid[0], [1, 3])
+
+        # internal ids of known objects are unchanged
+        data.append_events([[5, 20], [3, 5], [2, 30], [5, 10]], [3, 4, 5, 1])
+        assert_equal(data.n_events, 6)
+        assert_array_equal(data.n_objects, [4, 4])
+        assert_array_equal(data.eid[0], [1, 3, 2, 5])
+        assert_array_equal(data.eid[1], [10, 20, 5, 30])
+        assert_array_equal(
+            data.event, [[1, 0], [0, 1], [3, 1], [1, 2], [2, 3], [3, 0]])
+        assert_array_equal(data.score, [1, 2, 3, 4, 5, 1])
+        assert_equal(data.score.dtype, np.uint8)
+        assert_equal(data.iid[0], {1: 0, 3: 1, 2: 2, 5: 3})
+        assert_array_equal(data.to_iid(1, [5, 10, 30]), [2, 0, 3])
+
+        # many appends
+        for i in xrange(100):
+            data.append_events([[i, 10]], [1])
+        assert_equal(data.n_events, 106)
+        assert_array_equal(data.n_objects, [100, 4])
+        assert_array_equal(data.to_eid(0, data.event[-3:, 0]), [97, 98, 99])
+        assert_array_equal(
+            data.to_iid_event(data.to_eid_event(data.event)), data.event)
+
+        # errors
+        with assert_raises(ValueError):
+            data.append_events([[1, 10]], [1.5])
+        with assert_raises(ValueError):
+            data.append_events([[1, 10]], [1], event_feature=[0])
+        with assert_raises(ValueError):
+            data.append_events([[1, 10], [2, 10]], [1])
+
+    def test_deduplicate(self):
+        from kamrecsys.data import EventWithScoreData
+
+        def gen_data():
+            data = EventWithScoreData()
+            data.set_event(
+                [[1, 10], [3, 10], [1, 10], [5, 20], [3, 10], [1, 10]],
+                [1., 2., 5., 3., 4., 3.], score_domain=(1, 5, 1),
+                event_feature=np.arange(6))
+            return data
+
+        data = gen_data()
+        assert_equal(data.deduplicate(), 3)
+        assert_equal(data.n_events, 3)
+        assert_array_equal(data.to_eid_event(data.event),
+                           [[5, 20], [3, 10], [1, 10]])
+        assert_array_equal(data.score, [3., 4., 3.])
+        assert_array_equal(data.event_feature, [3, 4, 5])
+        assert_array_equal(data.n_objects, [3, 2])
+        assert_equal(data.deduplicate(), 0)
+
+        data = gen_data()
+        assert_equal(data.deduplicate('first'), 3)
+        assert_array_equal(data.score, [1., 2., 3.])
+        assert_array_equal(data.event_feature, [0, 1, 3])
+
+        data = gen_data()
+        data.deduplicate('mean')
+        assert_allclose(data.score, [3., 3., 3.])
+
+        data = gen_data()
+        data.deduplicate('max')
+        assert_array_equal(data.score, [3., 4., 5.])
+
+        data = gen_data()
+        data.deduplicate('count')
+        assert_array_equal(data.score, [1, 2, 3])
+        assert_array_equal(data.score_domain, [1, 3, 1])
+        assert_equal(data.n_score_levels, 3)
+
+        with assert_raises(ValueError):
+            data.deduplicate('min')
+
+        # counts exceeding the range of an integer score_dtype
+        data = EventWithScoreData(score_dtype=np.uint8)
+        data.set_event(
+            np.tile([[1, 10]], (256, 1)), np.ones(256), score_domain=(1, 5, 1))
+        with assert_raises(ValueError):
+            data.deduplicate('count')
+        assert_equal(data.n_events, 256)
+
+        data = EventWithScoreData(score_dtype=np.uint8)
+        data.set_event(
+            np.tile([[1, 10]], (255, 1)), np.ones(255), score_domain=(1, 5, 1))
+        data.deduplicate('count')
+        assert_array_equal(data.score, [255])
+        assert_equal(data.score.dtype, np.uint8)
+
+    def test_iter_minibatches(self):
+        from kamrecsys.data import EventWithScoreData
+
+        data = EventWithScoreData()
+        event = np.c_[np.repeat(np.arange(4), [2, 4, 6, 8]), np.arange(20)]
+        data.set_event(event, np.arange(20) + 1., score_domain=(1, 20, 1))
+
+        # sequential
+        batches = list(data.iter_minibatches(batch_size=8, shuffle=False))
+        assert_equal(len(batches), 3)
+        assert_array_equal(batches[2][0], data.event[16:])
+        assert_array_equal(batches[2][1], data.score[16:])
+
+        # shuffled events are generated once in each epoch
+        batches = list(data.iter_minibatches(batch_size=8, random_state=1))
+        assert_equal([len(sc) for ev, sc in batches], [8, 8, 4])
+        sc = np.concatenate([sc for ev, sc in batches])
+        assert_array_equal(np.sort(sc), data.score)
+        ev = np.concatenate([ev for ev, sc in batches])
+        assert_array_equal(data.score[ev[:, 1]], sc)
+        self.assertFalse(np.all(sc == data.score))
+        sc2 = np.concatenate([
+            sc for ev, sc in data.iter_minibatches(8, random_state=1)])
+        assert_array_equal(sc, sc2)
+
+        # stratified by users
+        for seed in xrange(5):
+            batches = list(data.iter_minibatches(
+                batch_size=10, stratify=True, random_state=seed))
+            for ev, sc in batches:
+                assert_array_equal(np.bincount(ev[:, 0]), [1, 2, 3, 4])
+            sc = np.concatenate([sc for ev, sc in batches])
+            assert_array_equal(np.sort(sc), data.score)
+
+        with assert_raises(ValueError):
+            next(data.iter_minibatches(batch_size=0))
+
     def test_generate_score_bins(self):
         data, x = load_test_data()
 
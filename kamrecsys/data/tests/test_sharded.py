@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import (
+    print_function,
+    division,
+    absolute_import)
+from six.moves import xrange
+
+# =============================================================================
+# Imports
+# =============================================================================
+
+from numpy.testing import (
+    TestCase,
+    run_module_suite,
+    assert_,
+    assert_allclose,
+    assert_array_almost_equal_nulp,
+    assert_array_max_ulp,
+    assert_array_equal,
+    assert_array_less,
+    assert_equal,
+    assert_raises,
+    assert_raises_regex,
+    assert_warns,
+    assert_string_equal)
+import numpy as np
+
+import os
+import shutil
+import tempfile
+
+from kamrecsys.data import (
+    EventWithScoreData,
+    ShardedEventData,
+    shard_event_data)
+from kamrecsys.data.sharded import shard_of
+
+# =============================================================================
+# Module variables
+# =============================================================================
+
+# =============================================================================
+# Functions
+# =============================================================================
+
+
+def load_test_data():
+    event = np.array(
+        [[1, 10], [3, 20], [1, 30], [5, 10], [3, 30], [5, 20]], dtype=int)
+    score = np.array([1., 2., 3., 4., 5., 3.])
+    event_feature = np.array(
+        [(i * 10, ) for i in xrange(6)], dtype=[('timestamp', int)])
+    data = EventWithScoreData(n_otypes=2, event_otypes=np.array([0, 1]))
+    data.set_event(
+        event, score, score_domain=(1., 5., 1.), event_feature=event_feature)
+    data.set_feature(
+        1, np.array([10, 20, 30]),
+        np.array([('a', 1), ('b', 2), ('c', 3)],
+                 dtype=[('name', 'U1'), ('year', int)]))
+    return data
+
+
+# =============================================================================
+# Test Classes
+# =============================================================================
+
+
+class TestShardedEventData(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_shard_event_data(self):
+        orig_data = load_test_data()
+        path = os.path.join(self.tmpdir, 'sharded')
+        sharded_data = shard_event_data(orig_data, path, 2)
+
+        self.assertEqual(len(sharded_data), 2)
+        assert_array_equal(sharded_data.n_objects, [3, 3])
+        assert_array_equal(sharded_data.eid[1], [10, 20, 30])
+        self.assertEqual(np.sum(sharded_data.n_events), 6)
+
+        # re-open
+        sharded_data = ShardedEventData(path)
+        user_shard = shard_of(orig_data.eid[0], 2)
+        n_shards = 0
+        for shard, data in sharded_data.iter_shards():
+            n_shards += 1
+            self.assertIsInstance(data, EventWithScoreData)
+            self.assertIsInstance(data.event, np.memmap)
+            assert_array_equal(
+                data.eid[0], orig_data.eid[0][user_shard == shard])
+            self.assertEqual(data.n_events, sharded_data.n_events[shard])
+
+            # local and global ids
+            for otype in xrange(2):
+                global_iid = sharded_data.get_global_iid(shard, otype)
+                assert_array_equal(
+                    sharded_data.eid[otype][global_iid], data.eid[otype])
+                assert_array_equal(
+                    sharded_data.to_local_iid(shard, otype, global_iid),
+                    np.arange(data.n_objects[otype]))
+
+            # events and scores
+            mask = user_shard[orig_data.event[:, 0]] == shard
+            assert_array_equal(
+                data.to_eid_event(data.event),
+                orig_data.to_eid_event(orig_data.event[mask]))
+            assert_array_equal(data.score, orig_data.score[mask])
+            assert_array_equal(
+                data.feature[1]['name'],
+                orig_data.feature[1]['name'][
+                    sharded_data.get_global_iid(shard, 1)])
+        self.assertEqual(n_shards, 2)
+
+        # errors
+        with assert_raises(ValueError):
+            sharded_data.get_shard(2)
+        with assert_raises(ValueError):
+            shard_event_data(orig_data, path, 0)
+
+    def test_shard_of(self):
+        shard = shard_of(np.arange(1000), 4)
+        assert_array_equal(np.unique(shard), [0, 1, 2, 3])
+        assert_array_less(100, np.bincount(shard))
+        assert_array_equal(shard, shard_of(np.arange(1000), 4))
+        assert_array_equal(shard_of(np.array(['a', 'b']), 1), [0, 0])
+
+
+# =============================================================================
+# Main Routines
+# =============================================================================
+
+if __name__ == '__main__':
+    run_module_suite()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import (
+    print_function,
+    division,
+    absolute_import)
+from six.moves import xrange
+
+# =============================================================================
+# Imports
+# =============================================================================
+
+from numpy.testing import (
+    TestCase,
+    run_module_suite,
+    assert_,
+    assert_allclose,
+    assert_array_almost_equal_nulp,
+    assert_array_max_ulp,
+    assert_array_equal,
+    assert_array_less,
+    assert_equal,
+    assert_raises,
+    assert_raises_regex,
+    assert_warns,
+    assert_string_equal)
+import numpy as np
+
+import multiprocessing
+import pickle
+
+from kamrecsys.data import (
+    EventData,
+    EventWithScoreData,
+    SharedEventData,
+    attach_event_data)
+
+# =============================================================================
+# Module variables
+# =============================================================================
+
+# =============================================================================
+# Functions
+# =============================================================================
+
+
+def load_test_data():
+    event = np.array(
+        [[1, 10], [3, 20], [1, 30], [5, 10], [3, 30], [5, 20]], dtype=int)
+    score = np.array([1., 2., 3., 4., 5., 3.])
+    event_feature = np.array(
+        [(i * 10, ) for i in xrange(6)], dtype=[('timestamp', int)])
+    data = EventWithScoreData(n_otypes=2, event_otypes=np.array([0, 1]))
+    data.set_event(
+        event, score, score_domain=(1., 5., 1.), event_feature=event_feature)
+    data.set_feature(
+        1, np.array([10, 20, 30]),
+        np.array([('a', 1), ('b', 2), ('c', 3)],
+                 dtype=[('name', 'U1'), ('year', int)]))
+    return data
+
+
+def sum_score(handle):
+    data = attach_event_data(handle)
+    return float(np.sum(data.score[data.event[:, 0] == data.to_iid(0, 5)]))
+
+
+# =============================================================================
+# Test Classes
+# =============================================================================
+
+
+class TestSharedEventData(TestCase):
+
+    def test_attach(self):
+        orig_data = load_test_data()
+
+        with SharedEventData(orig_data) as shared:
+            handle = pickle.loads(pickle.dumps(shared.handle))
+            data = attach_event_data(handle)
+
+            self.assertIsInstance(data, EventWithScoreData)
+            self.assertFalse(data.event.flags.writeable)
+            assert_array_equal(data.n_objects, [3, 3])
+            self.assertEqual(data.n_events, 6)
+            assert_array_equal(data.event, orig_data.event)
+            assert_array_equal(data.eid[1], [10, 20, 30])
+            assert_array_equal(data.score, orig_data.score)
+            assert_array_equal(data.score_domain, [1, 5, 1])
+            self.assertEqual(data.n_score_levels, 5)
+            assert_array_equal(
+                data.event_feature['timestamp'], [0, 10, 20, 30, 40, 50])
+            self.assertIsNone(data.feature[0])
+            assert_array_equal(data.feature[1]['name'], ['a', 'b', 'c'])
+
+            filtered_data = data.filter_event(data.score > 3)
+            assert_array_equal(filtered_data.eid[0], [3, 5])
+            del data, filtered_data
+
+            # worker processes
+            pool = multiprocessing.Pool(2)
+            try:
+                results = pool.map(sum_score, [shared.handle] * 2)
+            finally:
+                pool.close()
+                pool.join()
+            assert_allclose(results, [7., 7.])
+
+        # errors
+        with assert_raises(TypeError):
+            SharedEventData(np.arange(3))
+        with assert_raises(ValueError):
+            SharedEventData(EventData())
+
+
+# =============================================================================
+# Main Routines
+# =============================================================================
+
+if __name__ == '__main__':
+    run_module_suite()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import (
+    print_function,
+    division,
+    absolute_import)
+from six.moves import xrange
+
+# =============================================================================
+# Imports
+# =============================================================================
+
+from numpy.testing import (
+    TestCase,
+    run_module_suite,
+    assert_,
+    assert_allclose,
+    assert_array_almost_equal_nulp,
+    assert_array_max_ulp,
+    assert_array_equal,
+    assert_array_less,
+    assert_equal,
+    assert_raises,
+    assert_raises_regex,
+    assert_warns,
+    assert_string_equal)
+import numpy as np
+
+import os
+import shutil
+import tempfile
+
+from kamrecsys.data import (
+    EventData,
+    EventWithScoreData,
+    save_event_data,
+    open_event_data)
+
+# =============================================================================
+# Module variables
+# =============================================================================
+
+# =============================================================================
+# Functions
+# =============================================================================
+
+
+def load_test_data():
+    event = np.array(
+        [[1, 10], [3, 20], [1, 30], [5, 10], [3, 30], [5, 20]], dtype=int)
+    score = np.array([1., 2., 3., 4., 5., 3.])
+    event_feature = np.array(
+        [(i * 10, ) for i in xrange(6)], dtype=[('timestamp', int)])
+    data = EventWithScoreData(n_otypes=2, event_otypes=np.array([0, 1]))
+    data.set_event(
+        event, score, score_domain=(1., 5., 1.), event_feature=event_feature)
+    data.set_feature(
+        1, np.array([10, 20, 30]),
+        np.array([('a', 1), ('b', 2), ('c', 3)],
+                 dtype=[('name', 'U1'), ('year', int)]))
+    return data
+
+
+# =============================================================================
+# Test Classes
+# =============================================================================
+
+
+class TestStorage(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_event_with_score_data(self):
+        orig_data = load_test_data()
+        path = os.path.join(self.tmpdir, 'data')
+        save_event_data(orig_data, path)
+
+        data = open_event_data(path)
+        self.assertIsInstance(data, EventWithScoreData)
+        self.assertIsInstance(data.event, np.memmap)
+        self.assertIsInstance(data.score, np.memmap)
+        self.assertIsInstance(data.eid[0], np.memmap)
+        self.assertFalse(data.event.flags.writeable)
+
+        assert_array_equal(data.event_otypes, [0, 1])
+        assert_array_equal(data.n_objects, [3, 3])
+        self.assertEqual(data.n_events, 6)
+        assert_array_equal(data.event, orig_data.event)
+        assert_array_equal(data.eid[0], [1, 3, 5])
+        assert_array_equal(data.eid[1], [10, 20, 30])
+        assert_array_equal(data.score, orig_data.score)
+        assert_array_equal(data.score_domain, [1, 5, 1])
+        self.assertEqual(data.n_score_levels, 5)
+        assert_array_equal(
+            data.event_feature['timestamp'], [0, 10, 20, 30, 40, 50])
+        self.assertIsNone(data.feature[0])
+        assert_array_equal(data.feature[1]['name'], ['a', 'b', 'c'])
+        self.assertEqual(data.to_iid(1, 30), 2)
+
+        # filtering
+        filtered_data = data.filter_event(data.score > 3)
+        assert_array_equal(filtered_data.eid[0], [3, 5])
+        assert_array_equal(filtered_data.eid[1], [10, 30])
+        assert_array_equal(filtered_data.score, [4., 5.])
+        assert_array_equal(filtered_data.feature[1]['name'], ['a', 'c'])
+
+        # load into memory
+        data = open_event_data(path, mmap_mode=None)
+        self.assertNotIsInstance(data.event, np.memmap)
+        assert_array_equal(data.event, orig_data.event)
+
+    def test_event_data(self):
+        data = EventData()
+        data.set_event(np.array([['a', 'x'], ['b', 'x'], ['a', 'y']]))
+        path = os.path.join(self.tmpdir, 'data')
+        save_event_data(data, path)
+
+        data = open_event_data(path, mmap_mode='r+')
+        self.assertNotIsInstance(data, EventWithScoreData)
+        assert_array_equal(data.eid[0], ['a', 'b'])
+        assert_array_equal(data.event, [[0, 0], [1, 0], [0, 1]])
+        self.assertIsNone(data.event_feature)
+
+        # modification is written to a file
+        data.event[0, 0] = 1
+        data.event.flush()
+        data = open_event_data(path)
+        assert_array_equal(data.event, [[1, 0], [1, 0], [0, 1]])
+
+        # errors
+        with assert_raises(TypeError):
+            save_event_data(np.arange(3), path)
+        with assert_raises(ValueError):
+            save_event_data(EventData(), path)
+        with assert_raises(IOError):
+            open_event_data(os.path.join(self.tmpdir, 'none'))
+
+
+# =============================================================================
+# Main Routines
+# =============================================================================
+
+if __name__ == '__main__':
+    run_module_suite()
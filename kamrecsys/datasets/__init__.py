@@ -21,7 +21,9 @@ from .base import (
     SAMPLE_PATH,
     event_dtype_timestamp,
     load_event,
-    load_event_with_score)
+    load_event_with_score,
+    convert_event_file,
+    convert_sharded_event_file)
 from .flixster import (
     load_flixster_rating)
 from .movielens import (
@@ -49,6 +51,8 @@ __all__ = [
     'event_dtype_timestamp',
     'load_event',
     'load_event_with_score',
+    'convert_event_file',
+    'convert_sharded_event_file',
     'load_flixster_rating',
     'MOVIELENS100K_INFO',
     'load_movielens100k',
@@ -14,14 +14,28 @@ from six.moves import xrange
 # Imports
 # =============================================================================
 
+import itertools
+import json
 import logging
 import os
 
 import numpy as np
+from six import string_types
 
 from ..data import (
     EventData,
-    EventWithScoreData)
+    EventWithScoreData,
+    save_event_data,
+    open_event_data)
+from ..data.sharded import (
+    SHARDED_INFO_FILE,
+    ShardedEventData,
+    shard_of,
+    write_sharded_info)
+from ..data.storage import (
+    STORAGE_INFO_FILE,
+    create_storage_array,
+    write_storage_info)
 
 # =============================================================================
 # Public symbols
@@ -41,6 +55,15 @@ SAMPLE_PATH = os.path.join(os.path.dirname(__file__), 'data')
 # timestamp
 event_dtype_timestamp = np.dtype([('timestamp', int)])
 
+# version of the format of event cache directories
+EVENT_CACHE_VERSION = 1
+
+# name of the file storing information to validate an event cache
+EVENT_CACHE_INFO_FILE = 'cache.json'
+
+# default number of lines read at once by a streaming loader
+DEFAULT_CHUNK_SIZE = 100000
+
 # =============================================================================
 # Module variables
 # =============================================================================
@@ -54,7 +77,130 @@ event_dtype_timestamp = np.dtype([('timestamp', int)])
 # =============================================================================
 
 
-def load_event(infile, n_otypes=2, event_otypes=None, event_dtype=None):
+def _get_cache_dir(infile, cache):
+    """
+    Path to the cache directory of an event file
+
+    Parameters
+    ----------
+    infile : file or str
+        input file
+    cache : bool or str
+        if True, a directory whose name is that of `infile` followed by
+        ``.cache`` is used.  if str, it specifies the cache directory.
+
+    Returns
+    -------
+    cache_dir : str or None
+        path to the cache directory. None if a cache is not used.
+    """
+    if not cache or not isinstance(infile, string_types):
+        return None
+    if cache is True:
+        return infile + '.cache'
+
+    return cache
+
+
+def _gen_cache_info(infile, data, **kwargs):
+    """
+    Information to validate an event cache
+
+    Parameters
+    ----------
+    infile : str
+        input file
+    data : class
+        class of the data container
+    kwargs : dict
+        arguments of a loader function
+
+    Returns
+    -------
+    info : dict
+        information to validate an event cache
+    """
+    stat = os.stat(infile)
+    info = {
+        'version': EVENT_CACHE_VERSION,
+        'class': data.__name__,
+        'source': {'size': stat.st_size, 'mtime': stat.st_mtime}}
+    for k, v in kwargs.items():
+        if k == 'event_otypes' and v is not None:
+            v = [int(i) for i in v]
+        elif k == 'event_dtype' and v is not None:
+            v = str(np.dtype(v).descr)
+        elif k == 'score_domain' and v is not None:
+            v = [float(i) for i in v]
+        elif k in ('index_dtype', 'score_dtype') and v is not None:
+            v = np.dtype(v).str
+        info[k] = v
+
+    return info
+
+
+def _load_event_cache(cache_dir, info):
+    """
+    Load event data from a cache directory.  Arrays are memory-mapped.
+
+    Parameters
+    ----------
+    cache_dir : str
+        path to the cache directory
+    info : dict
+        information to validate the cache
+
+    Returns
+    -------
+    data : :class:`kamrecsys.data.EventData` or None
+        loaded data. None if a cache is not available or outdated.
+    """
+    try:
+        with open(os.path.join(cache_dir, EVENT_CACHE_INFO_FILE), 'r') as f:
+            cache_info = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+    if cache_info != info:
+        logger.info("event cache is outdated: " + cache_dir)
+        return None
+
+    try:
+        data = open_event_data(cache_dir, mmap_mode='r')
+    except (IOError, OSError, ValueError):
+        return None
+
+    return data
+
+
+def _save_event_cache(cache_dir, info, data):
+    """
+    Save event data to a cache directory
+
+    Parameters
+    ----------
+    cache_dir : str
+        path to the cache directory
+    info : dict
+        information to validate the cache
+    data : :class:`kamrecsys.data.EventData`
+        data to save
+    """
+    try:
+        info_file = os.path.join(cache_dir, EVENT_CACHE_INFO_FILE)
+        if os.path.exists(info_file):
+            os.remove(info_file)
+        save_event_data(data, cache_dir)
+
+        # info file is written at last to mark the completion of caching
+        with open(info_file, 'w') as f:
+            json.dump(info, f)
+    except (IOError, OSError, ValueError) as e:
+        logger.warning("failed to write event cache: " + str(e))
+
+
+def load_event(
+        infile, n_otypes=2, event_otypes=None, event_dtype=None, cache=False,
+        index_dtype=int):
     """
     load event file
 
@@ -74,6 +220,14 @@ def load_event(infile, n_otypes=2, event_otypes=None, event_dtype=None):
         each event is the i-th object type.
     event_dtype : np.dtype, default=None
         dtype of extra event features
+    cache : bool or str, default=False
+        If True or a path to a directory, loaded data are cached as binary
+        arrays in the directory, and these are memory-mapped in later loads.
+        A cache is re-generated if the size or modification time of `infile`
+        is changed.  If True, the name of the directory is that of `infile`
+        followed by ``.cache`` .
+    index_dtype : np.dtype, default=int
+        dtype of internal ids in an event array
 
     Returns
     -------
@@ -83,6 +237,16 @@ def load_event(infile, n_otypes=2, event_otypes=None, event_dtype=None):
         event_dtype : np.dtype, default=None
     """
 
+    # load cached data
+    cache_dir = _get_cache_dir(infile, cache)
+    if cache_dir is not None:
+        cache_info = _gen_cache_info(
+            infile, EventData, n_otypes=n_otypes, event_otypes=event_otypes,
+            event_dtype=event_dtype, index_dtype=index_dtype)
+        data = _load_event_cache(cache_dir, cache_info)
+        if data is not None:
+            return data
+
     s_events = n_otypes if event_otypes is None else len(event_otypes)
     if event_dtype is None:
         dtype = np.dtype([('event', int, s_events)])
@@ -91,19 +255,24 @@ def load_event(infile, n_otypes=2, event_otypes=None, event_dtype=None):
                           ('event_feature', event_dtype)])
     x = np.genfromtxt(fname=infile, delimiter='\t', dtype=dtype)
 
-    data = EventData(n_otypes=n_otypes, event_otypes=event_otypes)
+    data = EventData(
+        n_otypes=n_otypes, event_otypes=event_otypes, index_dtype=index_dtype)
     if event_dtype is None:
         event_feature = None
     else:
         event_feature = x['event_feature']
     data.set_event(x['event'], event_feature=event_feature)
 
+    # save data to cache
+    if cache_dir is not None:
+        _save_event_cache(cache_dir, cache_info, data)
+
     return data
 
 
 def load_event_with_score(
         infile, n_otypes=2, event_otypes=None, score_domain=(1, 5, 1),
-        event_dtype=None):
+        event_dtype=None, cache=False, index_dtype=int, score_dtype=None):
     """
     load event file with rating score
 
@@ -126,6 +295,13 @@ def load_event_with_score(
         min and max of scores, and the interval between scores
     event_dtype : np.dtype, default=None
         dtype of extra event features
+    cache : bool or str, default=False
+        If True or a path to a directory, loaded data are cached. see
+        :func:`load_event` .
+    index_dtype : np.dtype, default=int
+        dtype of internal ids in an event array
+    score_dtype : np.dtype, default=None
+        dtype of scores. If None, scores are stored as float.
 
     Returns
     -------
@@ -135,6 +311,18 @@ def load_event_with_score(
         event_dtype : np.dtype, default=None
     """
 
+    # load cached data
+    cache_dir = _get_cache_dir(infile, cache)
+    if cache_dir is not None:
+        cache_info = _gen_cache_info(
+            infile, EventWithScoreData, n_otypes=n_otypes,
+            event_otypes=event_otypes, score_domain=score_domain,
+            event_dtype=event_dtype, index_dtype=index_dtype,
+            score_dtype=score_dtype)
+        data = _load_event_cache(cache_dir, cache_info)
+        if data is not None:
+            return data
+
     s_events = n_otypes if event_otypes is None else len(event_otypes)
     if event_dtype is None:
         dtype = np.dtype([('event', int, s_events), ('score', float)])
@@ -143,7 +331,9 @@ def load_event_with_score(
                           ('event_feature', event_dtype)])
     x = np.genfromtxt(fname=infile, delimiter='\t', dtype=dtype)
 
-    data = EventWithScoreData(n_otypes=n_otypes, event_otypes=event_otypes)
+    data = EventWithScoreData(
+        n_otypes=n_otypes, event_otypes=event_otypes, index_dtype=index_dtype,
+        score_dtype=score_dtype)
     if event_dtype is None:
         event_feature = None
     else:
@@ -152,9 +342,316 @@ def load_event_with_score(
         x['event'], x['score'], score_domain=score_domain,
         event_feature=event_feature)
 
+    # save data to cache
+    if cache_dir is not None:
+        _save_event_cache(cache_dir, cache_info, data)
+
     return data
 
 
+def _iter_event_chunks(infile, chunk_size):
+    """
+    Read lines of an event file chunk by chunk
+
+    Empty lines and comment lines starting with ``#`` are skipped.
+
+    Parameters
+    ----------
+    infile : file or str
+        input file. if a file object is given, it must be seekable.
+    chunk_size : int
+        the maximum number of lines in a chunk
+
+    Yields
+    ------
+    lines : list of str
+        data lines in a chunk
+    """
+    if isinstance(infile, string_types):
+        f = open(infile, 'r')
+    else:
+        f = infile
+        f.seek(0)
+    try:
+        lines = (
+            line for line in f
+            if line.strip() != '' and not line.lstrip().startswith('#'))
+        while True:
+            chunk = list(itertools.islice(lines, chunk_size))
+            if len(chunk) == 0:
+                break
+            yield chunk
+    finally:
+        if f is not infile:
+            f.close()
+
+
+def convert_event_file(
+        path, infile, n_otypes=2, event_otypes=None, with_score=True,
+        score_domain=(1, 5, 1), event_dtype=None, index_dtype=int,
+        score_dtype=float, chunk_size=DEFAULT_CHUNK_SIZE, mmap_mode='r'):
+    """
+    Convert an event file into a storage directory with bounded memory
+
+    An input file is read chunk by chunk, and parsed events are directly
+    written to arrays in a storage directory.  Hence, files larger than
+    memory can be converted.  Memory usage is proportional to `chunk_size`
+    and the number of objects, not to the number of events.  The format of
+    an input file is the same as that of :func:`load_event` or
+    :func:`load_event_with_score` , and the converted data are the same as
+    those loaded by these functions.
+
+    Parameters
+    ----------
+    path : str
+        path to the storage directory
+    infile : file or str
+        input file. if a file object is given, it must be seekable.
+    n_otypes : optional, int
+        see attribute n_otypes (default=2)
+    event_otypes : array_like, shape=(variable,), optional
+        see attribute event_otypes. as default, a type of the i-th element of
+        each event is the i-th object type.
+    with_score : bool, default=True
+        If True, the column following events is read as scores, and
+        :class:`kamrecsys.data.EventWithScoreData` is generated.
+    score_domain : optional, tuple or 1d-array of tuple
+        min and max of scores, and the interval between scores.
+        If None, these values are estimated from scores.
+    event_dtype : np.dtype, default=None
+        dtype of extra event features
+    index_dtype : np.dtype, default=int
+        dtype of internal ids in an event array
+    score_dtype : np.dtype, default=float
+        dtype of scores
+    chunk_size : int, default=DEFAULT_CHUNK_SIZE
+        the number of lines read at once
+    mmap_mode : {None, 'r', 'r+', 'c'}, default='r'
+        mode to open the converted data. see
+        :func:`kamrecsys.data.open_event_data` .
+
+    Returns
+    -------
+    data : :class:`kamrecsys.data.EventData`
+        converted data, whose arrays are memory-mapped
+    """
+
+    # generate an empty container
+    if with_score:
+        data = EventWithScoreData(
+            n_otypes=n_otypes, event_otypes=event_otypes,
+            index_dtype=index_dtype, score_dtype=score_dtype)
+    else:
+        data = EventData(
+            n_otypes=n_otypes, event_otypes=event_otypes,
+            index_dtype=index_dtype)
+
+    # dtype of each line
+    dtype = [('event', int, data.s_event)]
+    if with_score:
+        dtype.append(('score', float))
+    if event_dtype is not None:
+        dtype.append(('event_feature', event_dtype))
+    dtype = np.dtype(dtype)
+
+    # count events
+    n_events = sum(len(c) for c in _iter_event_chunks(infile, chunk_size))
+
+    # allocate arrays
+    info_file = os.path.join(path, STORAGE_INFO_FILE)
+    if os.path.exists(info_file):
+        os.remove(info_file)
+    raw_event = create_storage_array(
+        path, 'raw_event', int, (n_events, data.s_event))
+    if with_score:
+        score = create_storage_array(
+            path, 'score', data.score_dtype, (n_events,))
+        score_levels = np.empty(0, dtype=float)
+    if event_dtype is not None:
+        event_feature = create_storage_array(
+            path, 'event_feature', event_dtype, (n_events,))
+
+    # 1st pass: store external ids and collect unique objects
+    eid = [np.empty(0, dtype=int) for otype in xrange(n_otypes)]
+    start = 0
+    for chunk in _iter_event_chunks(infile, chunk_size):
+        x = np.atleast_1d(
+            np.genfromtxt(chunk, delimiter='\t', dtype=dtype))
+        end = start + x.shape[0]
+        raw_event[start:end, :] = x['event']
+        if with_score:
+            score[start:end] = x['score']
+            if (score.dtype.kind in 'iu' and
+                    np.any(score[start:end] != x['score'])):
+                raise ValueError("scores cannot be represented by score_dtype")
+            if score_domain is None:
+                score_levels = np.union1d(score_levels, x['score'])
+        if event_dtype is not None:
+            event_feature[start:end] = x['event_feature']
+        for otype in xrange(n_otypes):
+            eid[otype] = np.union1d(
+                eid[otype], x['event'][:, data.event_otypes == otype])
+        start = end
+
+    # 2nd pass: convert external ids to internal ids
+    for otype in xrange(n_otypes):
+        data.n_objects[otype] = eid[otype].shape[0]
+        data.eid[otype] = create_storage_array(
+            path, 'eid' + str(otype), int, eid[otype].shape)
+        data.eid[otype][:] = eid[otype]
+    if np.any(data.n_objects - 1 > np.iinfo(data.index_dtype).max):
+        raise ValueError(
+            "index_dtype is too narrow to represent ids")
+    event = create_storage_array(
+        path, 'event', data.index_dtype, (n_events, data.s_event))
+    for start in xrange(0, n_events, chunk_size):
+        end = min(start + chunk_size, n_events)
+        for e in xrange(data.s_event):
+            event[start:end, e] = np.searchsorted(
+                eid[data.event_otypes[e]], raw_event[start:end, e])
+    del raw_event
+    os.remove(os.path.join(path, 'raw_event.npy'))
+
+    # set data information
+    data.event = event
+    data.n_events = n_events
+    if event_dtype is not None:
+        data.event_feature = event_feature
+    if with_score:
+        data.score = score
+        if score_domain is None:
+            score_domain = [
+                np.min(score_levels),
+                np.max(score_levels),
+                np.min(np.diff(score_levels)) if score_levels.shape[0] > 1
+                else 1]
+        data.score_domain = np.asanyarray(score_domain)
+        data.n_score_levels = (
+            int((score_domain[1] - score_domain[0]) / score_domain[2]) + 1)
+
+    # flush arrays and write information
+    for otype in xrange(n_otypes):
+        data.eid[otype].flush()
+    data.event.flush()
+    if with_score:
+        data.score.flush()
+    if event_dtype is not None:
+        data.event_feature.flush()
+    write_storage_info(path, data)
+    del data, event
+
+    return open_event_data(path, mmap_mode=mmap_mode)
+
+
+def convert_sharded_event_file(
+        path, infile, n_shards, n_otypes=2, event_otypes=None,
+        with_score=True, score_domain=(1, 5, 1), event_dtype=None,
+        index_dtype=int, score_dtype=float, chunk_size=DEFAULT_CHUNK_SIZE,
+        mmap_mode='r'):
+    """
+    Convert an event file into user-disjoint shards with bounded memory
+
+    Lines of an input file are distributed to shards based on the hash
+    values of users, i.e., the first element of events.  Then, each shard is
+    converted by :func:`convert_event_file` .
+
+    Parameters
+    ----------
+    path : str
+        path to the sharded directory
+    infile : file or str
+        input file. if a file object is given, it must be seekable.
+    n_shards : int
+        the number of shards
+    n_otypes : optional, int
+        see attribute n_otypes (default=2)
+    event_otypes : array_like, shape=(variable,), optional
+        see attribute event_otypes. as default, a type of the i-th element of
+        each event is the i-th object type.
+    with_score : bool, default=True
+        If True, the column following events is read as scores, and
+        :class:`kamrecsys.data.EventWithScoreData` is generated.
+    score_domain : optional, tuple or 1d-array of tuple
+        min and max of scores, and the interval between scores.
+        If None, these values are estimated from scores of all shards.
+    event_dtype : np.dtype, default=None
+        dtype of extra event features
+    index_dtype : np.dtype, default=int
+        dtype of internal ids in an event array
+    score_dtype : np.dtype, default=float
+        dtype of scores
+    chunk_size : int, default=DEFAULT_CHUNK_SIZE
+        the number of lines read at once
+    mmap_mode : {None, 'r', 'r+', 'c'}, default='r'
+        mode to open shards. see :func:`kamrecsys.data.open_event_data` .
+
+    Returns
+    -------
+    data : :class:`kamrecsys.data.ShardedEventData`
+        converted data
+    """
+    if n_shards < 1:
+        raise ValueError("n_shards must be >= 1")
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    info_file = os.path.join(path, SHARDED_INFO_FILE)
+    if os.path.exists(info_file):
+        os.remove(info_file)
+
+    # distribute lines to temporary files of shards
+    shard_files = [
+        os.path.join(path, 'shard' + str(shard) + '.event')
+        for shard in xrange(n_shards)]
+    s_event = n_otypes if event_otypes is None else len(event_otypes)
+    score_levels = np.empty(0, dtype=float)
+    outfiles = [open(f, 'w') for f in shard_files]
+    try:
+        for chunk in _iter_event_chunks(infile, chunk_size):
+            user = np.atleast_1d(np.genfromtxt(
+                chunk, delimiter='\t', dtype=int, usecols=(0,)))
+            for line, shard in zip(chunk, shard_of(user, n_shards)):
+                outfiles[shard].write(line.rstrip('\n') + '\n')
+            if with_score and score_domain is None:
+                score_levels = np.union1d(score_levels, np.genfromtxt(
+                    chunk, delimiter='\t', dtype=float, usecols=(s_event,)))
+    finally:
+        for f in outfiles:
+            f.close()
+
+    if with_score and score_domain is None:
+        score_domain = [
+            np.min(score_levels),
+            np.max(score_levels),
+            np.min(np.diff(score_levels)) if score_levels.shape[0] > 1
+            else 1]
+
+    # convert each shard.  only external ids and the numbers of events are
+    # kept.
+    shard_eid = []
+    n_events = []
+    for shard in xrange(n_shards):
+        data = convert_event_file(
+            os.path.join(path, 'shard' + str(shard)), shard_files[shard],
+            n_otypes=n_otypes, event_otypes=event_otypes,
+            with_score=with_score, score_domain=score_domain,
+            event_dtype=event_dtype, index_dtype=index_dtype,
+            score_dtype=score_dtype, chunk_size=chunk_size, mmap_mode='r')
+        shard_eid.append(data.eid)
+        n_events.append(data.n_events)
+        del data
+        os.remove(shard_files[shard])
+
+    # global external ids
+    eid = np.tile(None, n_otypes)
+    for otype in xrange(n_otypes):
+        eid[otype] = np.empty(0, dtype=int)
+        for local_eid in shard_eid:
+            eid[otype] = np.union1d(eid[otype], local_eid[otype])
+    write_sharded_info(path, eid, shard_eid, n_events)
+
+    return ShardedEventData(path, mmap_mode=mmap_mode)
+
+
 # =============================================================================
 # Module initialization
 # =============================================================================
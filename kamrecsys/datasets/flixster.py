@@ -46,7 +46,7 @@ __all__ = []
 # =============================================================================
 
 
-def load_flixster_rating(infile=None, event_dtype=None):
+def load_flixster_rating(infile=None, event_dtype=None, cache=False):
     """ load the sushi3b score data set
 
     An original data set is distributed at:
@@ -58,6 +58,9 @@ def load_flixster_rating(infile=None, event_dtype=None):
         input file if specified; otherwise, read from default sample directory.
     event_dtype : np.dtype, default=None
         dtype of extra event features
+    cache : bool or str, default=False
+        If True or a path to a directory, loaded events are cached. see
+        :func:`kamrecsys.datasets.load_event` .
 
     Returns
     -------
@@ -85,7 +88,8 @@ def load_flixster_rating(infile=None, event_dtype=None):
         infile = os.path.join(SAMPLE_PATH, 'flixster.event')
     data = load_event_with_score(
         infile, n_otypes=2, event_otypes=(0, 1),
-        score_domain=(0.5, 5.0, 0.5), event_dtype=event_dtype)
+        score_domain=(0.5, 5.0, 0.5), event_dtype=event_dtype,
+        cache=cache)
 
     return data
 
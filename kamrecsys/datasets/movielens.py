@@ -79,7 +79,8 @@ MOVIELENS1M_INFO = {
 # =============================================================================
 
 
-def load_movielens100k(infile=None, event_dtype=event_dtype_timestamp):
+def load_movielens100k(
+        infile=None, event_dtype=event_dtype_timestamp, cache=False):
     """ load the MovieLens 100k data set
 
     Original file ``ml-100k.zip`` is distributed by the Grouplens Research
@@ -93,6 +94,9 @@ def load_movielens100k(infile=None, event_dtype=event_dtype_timestamp):
     event_dtype : np.dtype
         dtype of extra event features. as default, it consists of only a
         ``timestamp`` feature.
+    cache : bool or str, default=False
+        If True or a path to a directory, loaded events are cached. see
+        :func:`kamrecsys.datasets.load_event` .
 
     Returns
     -------
@@ -156,7 +160,8 @@ def load_movielens100k(infile=None, event_dtype=event_dtype_timestamp):
         infile = os.path.join(SAMPLE_PATH, 'movielens100k.event')
     data = load_event_with_score(
         infile, n_otypes=2, event_otypes=(0, 1),
-        score_domain=(1., 5., 1.), event_dtype=event_dtype)
+        score_domain=(1., 5., 1.), event_dtype=event_dtype,
+        cache=cache)
 
     # load user's feature file
     infile = os.path.join(SAMPLE_PATH, 'movielens100k.user')
@@ -206,7 +211,8 @@ def load_movielens_mini():
     return load_movielens100k(infile=infile)
 
 
-def load_movielens1m(infile=None, event_dtype=event_dtype_timestamp):
+def load_movielens1m(
+        infile=None, event_dtype=event_dtype_timestamp, cache=False):
     """ load the MovieLens 1m data set
 
     Original file ``ml-1m.zip`` is distributed by the Grouplens Research
@@ -220,6 +226,9 @@ def load_movielens1m(infile=None, event_dtype=event_dtype_timestamp):
     event_dtype : np.dtype
         dtype of extra event features. as default, it consists of only a
         ``timestamp`` feature.
+    cache : bool or str, default=False
+        If True or a path to a directory, loaded events are cached. see
+        :func:`kamrecsys.datasets.load_event` .
 
     Returns
     -------
@@ -286,7 +295,8 @@ def load_movielens1m(infile=None, event_dtype=event_dtype_timestamp):
         infile = os.path.join(SAMPLE_PATH, 'movielens1m.event')
     data = load_event_with_score(
         infile, n_otypes=2, event_otypes=(0, 1),
-        score_domain=(1., 5., 1.), event_dtype=event_dtype)
+        score_domain=(1., 5., 1.), event_dtype=event_dtype,
+        cache=cache)
 
     # load user's feature file
     infile = os.path.join(SAMPLE_PATH, 'movielens1m.user')
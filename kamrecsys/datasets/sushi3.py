@@ -86,7 +86,7 @@ SUSHI3_INFO = {
 # =============================================================================
 
 
-def load_sushi3b_score(infile=None, event_dtype=None):
+def load_sushi3b_score(infile=None, event_dtype=None, cache=False):
     """ load the sushi3b score data set
 
     An original data set is distributed at:
@@ -98,6 +98,9 @@ def load_sushi3b_score(infile=None, event_dtype=None):
         input file if specified; otherwise, read from default sample directory.
     event_dtype : np.dtype, default=None
         dtype of extra event features
+    cache : bool or str, default=False
+        If True or a path to a directory, loaded events are cached. see
+        :func:`kamrecsys.datasets.load_event` .
 
     Returns
     -------
@@ -172,7 +175,8 @@ def load_sushi3b_score(infile=None, event_dtype=None):
         infile = os.path.join(SAMPLE_PATH, 'sushi3b_score.event')
     data = load_event_with_score(
         infile, n_otypes=2, event_otypes=(0, 1),
-        score_domain=(0., 4., 1.), event_dtype=event_dtype)
+        score_domain=(0., 4., 1.), event_dtype=event_dtype,
+        cache=cache)
 
     # load user's feature file
     infile = os.path.join(SAMPLE_PATH, 'sushi3.user')
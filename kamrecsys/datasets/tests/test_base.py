@@ -12,6 +12,8 @@ from six.moves import xrange
 # =============================================================================
 
 import os
+import shutil
+import tempfile
 
 from numpy.testing import (
     TestCase,
@@ -146,6 +148,185 @@ class TestLoadEventWithScore(TestCase):
         assert_allclose(data.score_domain, [0., 4., 1.])
 
 
+class TestEventCache(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.infile = os.path.join(self.tmpdir, 'sushi3bs_test.event')
+        shutil.copy(
+            os.path.join(os.path.dirname(__file__), 'sushi3bs_test.event'),
+            self.infile)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_load_event_with_score(self):
+        from kamrecsys.datasets import load_event_with_score
+
+        orig_data = load_event_with_score(
+            self.infile, score_domain=(0.0, 4.0, 1.0))
+
+        # first load generates a cache
+        data = load_event_with_score(
+            self.infile, score_domain=(0.0, 4.0, 1.0), cache=True)
+        cache_dir = self.infile + '.cache'
+        self.assertTrue(
+            os.path.exists(os.path.join(cache_dir, 'cache.json')))
+        assert_array_equal(data.event, orig_data.event)
+
+        # second load reads memory-mapped arrays
+        data = load_event_with_score(
+            self.infile, score_domain=(0.0, 4.0, 1.0), cache=True)
+        self.assertIsInstance(data.event, np.memmap)
+        self.assertIsInstance(data.score, np.memmap)
+        assert_array_equal(data.n_objects, [20, 7])
+        self.assertEqual(data.n_events, 20)
+        assert_array_equal(data.event, orig_data.event)
+        assert_array_equal(data.score, orig_data.score)
+        assert_array_equal(data.eid[0], orig_data.eid[0])
+        assert_array_equal(data.eid[1], orig_data.eid[1])
+        assert_allclose(data.score_domain, [0., 4., 1.])
+        self.assertEqual(data.n_score_levels, 5)
+        self.assertIsNone(data.event_feature)
+        assert_array_equal(
+            data.to_iid_event(orig_data.to_eid_event(orig_data.event)),
+            orig_data.event)
+
+        # a cache is not used, if loading conditions are changed
+        data = load_event_with_score(
+            self.infile, score_domain=(0.0, 5.0, 1.0), cache=True)
+        self.assertNotIsInstance(data.score, np.memmap)
+        self.assertEqual(data.n_score_levels, 6)
+
+        # a cache is not used, if a source file is modified
+        with open(self.infile, 'a') as f:
+            f.write('20\t0\t1\n')
+        data = load_event_with_score(
+            self.infile, score_domain=(0.0, 5.0, 1.0), cache=True)
+        self.assertNotIsInstance(data.score, np.memmap)
+        self.assertEqual(data.n_events, 21)
+
+    def test_load_event(self):
+        from kamrecsys.datasets import load_event
+
+        cache_dir = os.path.join(self.tmpdir, 'cache')
+        event_dtype = np.dtype([('score', int)])
+        orig_data = load_event(self.infile, event_dtype=event_dtype)
+        load_event(self.infile, event_dtype=event_dtype, cache=cache_dir)
+        data = load_event(
+            self.infile, event_dtype=event_dtype, cache=cache_dir)
+
+        self.assertIsInstance(data.event, np.memmap)
+        assert_array_equal(data.event, orig_data.event)
+        assert_array_equal(
+            data.event_feature['score'], orig_data.event_feature['score'])
+
+
+class TestConvertEventFile(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_func(self):
+        from kamrecsys.data import EventWithScoreData
+        from kamrecsys.datasets import (
+            convert_event_file, load_event, load_event_with_score)
+
+        infile = os.path.join(
+            os.path.dirname(__file__), 'sushi3bs_test.event')
+
+        # with score
+        orig_data = load_event_with_score(infile, score_domain=None)
+        data = convert_event_file(
+            os.path.join(self.tmpdir, 'score'), infile, score_domain=None,
+            chunk_size=7)
+
+        self.assertIsInstance(data, EventWithScoreData)
+        self.assertIsInstance(data.event, np.memmap)
+        assert_array_equal(data.n_objects, [20, 7])
+        self.assertEqual(data.n_events, 20)
+        assert_array_equal(data.eid[0], orig_data.eid[0])
+        assert_array_equal(data.eid[1], orig_data.eid[1])
+        assert_array_equal(data.event, orig_data.event)
+        assert_array_equal(data.score, orig_data.score)
+        assert_allclose(data.score_domain, [0., 4., 1.])
+        self.assertEqual(data.n_score_levels, 5)
+
+        # without score
+        event_dtype = np.dtype([('score', int)])
+        orig_data = load_event(infile, event_dtype=event_dtype)
+        data = convert_event_file(
+            os.path.join(self.tmpdir, 'event'), infile, with_score=False,
+            event_dtype=event_dtype, chunk_size=3)
+
+        self.assertNotIsInstance(data, EventWithScoreData)
+        assert_array_equal(data.event, orig_data.event)
+        assert_array_equal(
+            data.event_feature['score'], orig_data.event_feature['score'])
+
+        # compact dtypes
+        orig_data = load_event_with_score(
+            infile, score_domain=None, index_dtype=np.int16,
+            score_dtype=np.uint8)
+        assert_equal(orig_data.event.dtype, np.int16)
+        assert_equal(orig_data.score.dtype, np.uint8)
+        data = convert_event_file(
+            os.path.join(self.tmpdir, 'compact'), infile, score_domain=None,
+            index_dtype=np.int16, score_dtype=np.uint8, chunk_size=7)
+        assert_equal(data.event.dtype, np.int16)
+        assert_equal(data.score.dtype, np.uint8)
+        assert_equal(data.index_dtype, np.int16)
+        assert_array_equal(data.event, orig_data.event)
+        assert_array_equal(data.score, orig_data.score)
+        self.assertFalse(os.path.exists(
+            os.path.join(self.tmpdir, 'compact', 'raw_event.npy')))
+
+    def test_single_score_level(self):
+        from kamrecsys.datasets import convert_event_file
+
+        infile = os.path.join(self.tmpdir, 'single.event')
+        with open(infile, 'w') as f:
+            f.write("1\t10\t3\n2\t10\t3\n2\t20\t3\n")
+
+        data = convert_event_file(
+            os.path.join(self.tmpdir, 'single'), infile, score_domain=None)
+        assert_array_equal(data.score, [3., 3., 3.])
+        assert_allclose(data.score_domain, [3., 3., 1.])
+        self.assertEqual(data.n_score_levels, 1)
+
+    def test_sharded(self):
+        from kamrecsys.datasets import (
+            convert_sharded_event_file, load_event_with_score)
+        from kamrecsys.data import shard_event_data
+
+        infile = os.path.join(
+            os.path.dirname(__file__), 'sushi3bs_test.event')
+        orig_data = load_event_with_score(infile, score_domain=None)
+        orig_sharded_data = shard_event_data(
+            orig_data, os.path.join(self.tmpdir, 'orig'), 3)
+
+        sharded_data = convert_sharded_event_file(
+            os.path.join(self.tmpdir, 'sharded'), infile, 3,
+            score_domain=None, chunk_size=7)
+        assert_array_equal(sharded_data.n_events, orig_sharded_data.n_events)
+        assert_array_equal(sharded_data.eid[0], orig_data.eid[0])
+        assert_array_equal(sharded_data.eid[1], orig_data.eid[1])
+        for shard, data in sharded_data.iter_shards():
+            orig_shard_data = orig_sharded_data.get_shard(shard)
+            assert_array_equal(data.event, orig_shard_data.event)
+            assert_array_equal(data.eid[0], orig_shard_data.eid[0])
+            assert_array_equal(data.score, orig_shard_data.score)
+            assert_allclose(data.score_domain, [0., 4., 1.])
+            assert_array_equal(
+                sharded_data.get_global_iid(shard, 1),
+                orig_sharded_data.get_global_iid(shard, 1))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.tmpdir, 'sharded', 'shard0.event')))
+
+
 # =============================================================================
 # Main Routine
 # =============================================================================
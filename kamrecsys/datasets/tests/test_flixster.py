@@ -50,7 +50,8 @@ class TestFlixsterClass(TestCase):
             sorted(data.__dict__.keys()),
             sorted(['event_otypes', 'n_otypes', 'n_events', 'n_score_levels',
                     'feature', 'event', 'iid', 'event_feature',
-                    'score', 'eid', 'n_objects', 's_event', 'score_domain']))
+                    'score', 'eid', 'n_objects', 's_event', 'score_domain',
+                    'index_dtype', 'score_dtype']))
         assert_array_equal(data.event_otypes, [0, 1])
         assert_equal(data.n_otypes, 2)
         assert_equal(data.n_events, 8196077)
@@ -51,7 +51,7 @@ class TestSushi3Class(TestCase):
             sorted(['event_otypes', 'n_otypes', 'n_events', 'n_score_levels',
                     'feature', 'event', 'iid', 'event_feature',
                     'score', 'eid', 'n_objects', 's_event',
-                    'score_domain']))
+                    'score_domain', 'index_dtype', 'score_dtype']))
         assert_array_equal(data.event_otypes, [0, 1])
         assert_equal(data.n_otypes, 2)
         assert_equal(data.n_events, 50000)
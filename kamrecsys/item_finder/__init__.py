@@ -21,7 +21,8 @@ from six.moves import xrange
 import logging
 
 from .base import BaseImplicitItemFinder, BaseExplicitItemFinder
-from .matrix_factorization import LogisticPMF, ImplicitLogisticPMF
+from .matrix_factorization import (
+    LogisticPMF, ImplicitLogisticPMF, ImplicitALS, ImplicitBPR)
 
 # =============================================================================
 # Metadata variables
@@ -35,7 +36,9 @@ __all__ = [
     'BaseExplicitItemFinder',
     'BaseImplicitItemFinder',
     'LogisticPMF',
-    'ImplicitLogisticPMF']
+    'ImplicitLogisticPMF',
+    'ImplicitALS',
+    'ImplicitBPR']
 
 # =============================================================================
 # Constants
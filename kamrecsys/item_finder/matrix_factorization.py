@@ -1,7 +1,9 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 """
-Matrix Factorization: logistic probabilistic matrix factorization model
+Matrix Factorization: logistic probabilistic matrix factorization model,
+and weighted matrix factorization and Bayesian personalized ranking models
+for implicit feedback
 """
 
 from __future__ import (
@@ -21,11 +23,18 @@ from six.moves import xrange
 import logging
 import sys
 import numpy as np
-from scipy.optimize import minimize
+from scipy import sparse
+from scipy.optimize import minimize, OptimizeResult
 from sklearn.utils import check_random_state
 
 from . import BaseExplicitItemFinder, BaseImplicitItemFinder
 from ..utils import safe_sigmoid as sigmoid
+from ..utils import (
+    get_fit_status_message, minimize_stochastic)
+from ..utils.optimize import STOCHASTIC_METHODS
+from ..score_predictor.matrix_factorization import (
+    ALS_BLOCK_ELEMENTS, _add_gram_block, _ridge_block_costs, _sparse_mf_grad,
+    _sparse_reg_weights, _split_blocks)
 
 # =============================================================================
 # Public symbols
@@ -37,6 +46,10 @@ __all__ = []
 # Constants
 # =============================================================================
 
+# the default number of pairs of users and items processed at once in
+# ImplicitLogisticPMF
+IMPLICIT_BLOCK_ELEMENTS = 1048576
+
 # =============================================================================
 # Module variables
 # =============================================================================
@@ -63,7 +76,8 @@ class LogisticPMF(BaseExplicitItemFinder):
         the number of latent factors (= sizes of :math:`\mathbf{p}_u` or
         :math:`\mathbf{q}_i`), default=1
     optimizer_kwargs : keyword arguments, optional
-        keyword arguments passed to optimizer
+        keyword arguments passed to optimizer.  Keyword arguments of
+        stochastic methods are described in Notes.
 
     Attributes
     ----------
@@ -109,6 +123,18 @@ class LogisticPMF(BaseExplicitItemFinder):
     events, and a regularization term is scaled by the number of model
     parameters.
 
+    If `method` is one of 'sgd', 'momentum', 'adagrad', or 'adam', the loss
+    is minimized by a minibatch stochastic gradient method.  A gradient for a
+    minibatch is computed by :meth:`sparse_grad_loss` , and only parameters
+    of users and items in the minibatch are updated.  The regularization term
+    of each user or item is weighted by the number of all events divided by
+    the number of its events, so that a minibatch gradient is an unbiased
+    estimate of a full gradient, and rarely seen users and items are
+    regularized as strongly as by the other methods.  The loss of all events
+    is reported at the end of each epoch.  see
+    :func:`kamrecsys.utils.minimize_stochastic` for the options of these
+    methods.
+
     References
     ----------
     .. [1] R. Salakhutdinov and A. Mnih. "Probabilistic matrix factorization"
@@ -150,6 +176,9 @@ class LogisticPMF(BaseExplicitItemFinder):
         self._coef = None
         self._dt = None
         self._reg = 1.0
+        self._reg_weights = None
+        self._scratch = None
+        self._incidence = None
 
     def _init_coef(self, ev, sc, n_objects):
         """
@@ -190,27 +219,29 @@ class LogisticPMF(BaseExplicitItemFinder):
         self.p_ = self._coef.view(self._dt)['p'][0]
         self.q_ = self._coef.view(self._dt)['q'][0]
 
-        # set bias term
+        # set bias term by mean residuals of each user or item
         self.mu_[0] = np.sum(sc) / n_events
-        for i in xrange(n_users):
-            j = np.nonzero(ev[:, 0] == i)[0]
-            if len(j) > 0:
-                self.bu_[i] = np.sum(sc[j] - self.mu_[0]) / len(j)
-        for i in xrange(n_items):
-            j = np.nonzero(ev[:, 1] == i)[0]
-            if len(j) > 0:
-                self.bi_[i] = (
-                    np.sum(sc[j] - (self.mu_[0] + self.bu_[ev[j, 0]])) /
-                    len(j))
+        n_user_events = np.bincount(ev[:, 0], minlength=n_users)
+        mask = n_user_events.nonzero()[0]
+        self.bu_[mask] = (
+            np.bincount(ev[:, 0], weights=sc - self.mu_[0],
+                        minlength=n_users)[mask] / n_user_events[mask])
+        n_item_events = np.bincount(ev[:, 1], minlength=n_items)
+        mask = n_item_events.nonzero()[0]
+        self.bi_[mask] = (
+            np.bincount(ev[:, 1],
+                        weights=sc - (self.mu_[0] + self.bu_[ev[:, 0]]),
+                        minlength=n_items)[mask] / n_item_events[mask])
 
         # fill cross terms by normal randoms
-        mask = np.bincount(ev[:, 0], minlength=n_users).nonzero()[0]
+        mask = n_user_events.nonzero()[0]
         self.p_[mask, :] = self._rng.normal(0.0, 1.0, (len(mask), k))
-        mask = np.bincount(ev[:, 1], minlength=n_items).nonzero()[0]
+        mask = n_item_events.nonzero()[0]
         self.q_[mask, :] = self._rng.normal(0.0, 1.0, (len(mask), k))
 
         # scale a regularization term by the number of parameters
         self._reg = self.C / (coef_size - 1)
+        self._reg_weights = _sparse_reg_weights(ev, n_objects)
 
     def loss(self, coef, ev, sc, n_objects):
         """
@@ -275,8 +306,6 @@ class LogisticPMF(BaseExplicitItemFinder):
         """
         # constants
         n_events = ev.shape[0]
-        n_users = n_objects[0]
-        n_items = n_objects[1]
 
         # set input array's view
         mu = coef.view(self._dt)['mu'][0]
@@ -299,19 +328,14 @@ class LogisticPMF(BaseExplicitItemFinder):
             np.sum(p[ev[:, 0], :] * q[ev[:, 1], :], axis=1))
         common_term = esc - sc
 
+        users, items = self._get_incidence(ev, n_objects)
         grad_mu[0] = np.sum(common_term)
-        grad_bu[:] = np.bincount(
-            ev[:, 0], weights=common_term, minlength=n_users)
-        grad_bi[:] = np.bincount(
-            ev[:, 1], weights=common_term, minlength=n_items)
-        weights = common_term[:, np.newaxis] * q[ev[:, 1], :]
-        for i in xrange(self.k):
-            grad_p[:, i] = np.bincount(
-                ev[:, 0], weights=weights[:, i], minlength=n_users)
-        weights = common_term[:, np.newaxis] * p[ev[:, 0], :]
-        for i in xrange(self.k):
-            grad_q[:, i] = np.bincount(
-                ev[:, 1], weights=weights[:, i], minlength=n_items)
+        grad_bu[:] = users.dot(common_term)
+        grad_bi[:] = items.dot(common_term)
+        grad_p[:, :] = users.dot(
+            common_term[:, np.newaxis] * q[ev[:, 1], :])
+        grad_q[:, :] = items.dot(
+            common_term[:, np.newaxis] * p[ev[:, 0], :])
 
         # re-scale gradients
         grad[:] = grad[:] / n_events
@@ -324,6 +348,194 @@ class LogisticPMF(BaseExplicitItemFinder):
 
         return grad
 
+    def sparse_grad_loss(self, coef, ev, sc, n_objects):
+        """
+        gradient of loss function at parameters of users and items in events
+
+        This is used by stochastic optimizers, and the cost does not depend
+        on the numbers of users and items.  The regularization term is
+        applied only to the parameters of users and items in `ev` , but it is
+        weighted so that the gradient of a minibatch is an unbiased estimate
+        of :meth:`grad_loss` of all events given to :meth:`_init_coef` .
+
+        Parameters
+        ----------
+        coef : array_like, shape=(variable,)
+            coefficients of this model
+        ev : array_like, shape(n_events, 2), dtype=int
+            user and item indexes
+        sc : array_like, shape(n_events,), dtype=float
+            target scores
+        n_objects : array_like, shape(2,), dtype=int
+            numbers of users and items
+
+        Returns
+        -------
+        index : array, dtype=int
+            unique indexes of parameters in `coef`
+        grad : array, dtype=float
+            the first gradient of loss function at these parameters
+        """
+        # set input array's view
+        mu = coef.view(self._dt)['mu'][0]
+        bu = coef.view(self._dt)['bu'][0]
+        bi = coef.view(self._dt)['bi'][0]
+        p = coef.view(self._dt)['p'][0]
+        q = coef.view(self._dt)['q'][0]
+
+        esc = sigmoid(
+            mu[0] + bu[ev[:, 0]] + bi[ev[:, 1]] +
+            np.sum(p[ev[:, 0], :] * q[ev[:, 1], :], axis=1))
+
+        return _sparse_mf_grad(
+            coef, self._dt, ev, esc - sc, self._reg, self._reg_weights)
+
+    def _get_incidence(self, ev, n_objects):
+        """
+        Incidence matrices between objects and events
+
+        A gradient is aggregated over events of each user or item by a
+        product of an incidence matrix and a dense matrix.  Matrices are
+        cached while the same event array is given, and are built once per
+        fitting.
+
+        Parameters
+        ----------
+        ev : array_like, shape(n_events, 2), dtype=int
+            user and item indexes
+        n_objects : array_like, shape(2,), dtype=int
+            numbers of users and items
+
+        Returns
+        -------
+        users : :class:`scipy.sparse.csr_matrix`, shape=(n_users, n_events)
+            the (x, j) element is one if the j-th event is of the user x
+        items : :class:`scipy.sparse.csr_matrix`, shape=(n_items, n_events)
+            the (y, j) element is one if the j-th event is of the item y
+        """
+        if self._incidence is None or self._incidence[0] is not ev:
+            n_events = ev.shape[0]
+            index = np.arange(n_events)
+            ones = np.ones(n_events, dtype=float)
+            self._incidence = (ev,) + tuple(
+                sparse.csr_matrix(
+                    (ones, (ev[:, col], index)),
+                    shape=(n_objects[col], n_events))
+                for col in xrange(2))
+
+        return self._incidence[1:]
+
+    def _get_scratch(self, n_events):
+        """
+        Scratch buffers for :meth:`loss_and_grad`
+
+        Buffers are allocated at the first call, and reused while the number
+        of events is unchanged.
+
+        Parameters
+        ----------
+        n_events : int
+            the number of events
+
+        Returns
+        -------
+        scratch : dict
+            `res` and `tmp` are arrays whose shapes are (n_events,) , and
+            `pu` and `qi` are arrays whose shapes are (n_events, k)
+        """
+        if (self._scratch is None or
+                self._scratch['res'].shape[0] != n_events):
+            self._scratch = {
+                'res': np.empty(n_events, dtype=float),
+                'tmp': np.empty(n_events, dtype=float),
+                'pu': np.empty((n_events, self.k), dtype=float),
+                'qi': np.empty((n_events, self.k), dtype=float)}
+
+        return self._scratch
+
+    def loss_and_grad(self, coef, ev, sc, n_objects):
+        """
+        loss function and its gradient
+
+        Predicted scores are computed once and shared between a loss and its
+        gradient.  Intermediate arrays are stored in scratch buffers, which
+        are reused over iterations.  This is passed to an optimizer together
+        with ``jac=True`` .
+
+        Parameters
+        ----------
+        coef : array_like, shape=(variable,)
+            coefficients of this model
+        ev : array_like, shape(n_events, 2), dtype=int
+            user and item indexes
+        sc : array_like, shape(n_events,), dtype=float
+            target scores
+        n_objects : array_like, shape(2,), dtype=int
+            numbers of users and items
+
+        Returns
+        -------
+        loss : float
+            value of loss function
+        grad : array_like, shape=coef.shape
+            the first gradient of loss function by coef
+        """
+        # constants
+        n_events = ev.shape[0]
+
+        # set input array's view
+        mu = coef.view(self._dt)['mu'][0]
+        bu = coef.view(self._dt)['bu'][0]
+        bi = coef.view(self._dt)['bi'][0]
+        p = coef.view(self._dt)['p'][0]
+        q = coef.view(self._dt)['q'][0]
+
+        # create empty gradient
+        grad = np.empty_like(coef)
+        grad_mu = grad.view(self._dt)['mu'][0]
+        grad_bu = grad.view(self._dt)['bu'][0]
+        grad_bi = grad.view(self._dt)['bi'][0]
+        grad_p = grad.view(self._dt)['p'][0]
+        grad_q = grad.view(self._dt)['q'][0]
+
+        # predicted scores
+        scratch = self._get_scratch(n_events)
+        logit = np.take(bu, ev[:, 0], out=scratch['res'])
+        logit += mu[0]
+        logit += np.take(bi, ev[:, 1], out=scratch['tmp'])
+        pu = np.take(p, ev[:, 0], axis=0, out=scratch['pu'])
+        qi = np.take(q, ev[:, 1], axis=0, out=scratch['qi'])
+        logit += np.sum(
+            np.multiply(pu, qi, out=pu), axis=1, out=scratch['tmp'])
+        esc = sigmoid(logit)
+
+        # loss and regularization term
+        loss = - np.sum(sc * np.log(esc) + (1 - sc) * np.log(1 - esc))
+        reg = (np.sum(bu**2) + np.sum(bi**2) + np.sum(p**2) + np.sum(q**2))
+
+        # gradient of loss term
+        common_term = np.subtract(esc, sc, out=esc)
+        users, items = self._get_incidence(ev, n_objects)
+        grad_mu[0] = np.sum(common_term)
+        grad_bu[:] = users.dot(common_term)
+        grad_bi[:] = items.dot(common_term)
+        grad_p[:, :] = users.dot(
+            np.multiply(qi, common_term[:, np.newaxis], out=qi))
+        pu = np.take(p, ev[:, 0], axis=0, out=pu)
+        grad_q[:, :] = items.dot(
+            np.multiply(pu, common_term[:, np.newaxis], out=pu))
+
+        # re-scale gradients
+        grad /= n_events
+
+        # gradient of regularization term
+        grad_bu[:] += self._reg * bu
+        grad_bi[:] += self._reg * bi
+        grad_p[:, :] += self._reg * p
+        grad_q[:, :] += self._reg * q
+
+        return loss / n_events + 0.5 * self._reg * reg, grad
+
     def fit(self, data, event_index=(0, 1)):
         """
         fitting model
@@ -359,13 +571,25 @@ class LogisticPMF(BaseExplicitItemFinder):
         # optimize model
         # fmin_bfgs is slow for large data, maybe because due to the
         # computation cost for the Hessian matrices.
-        res = minimize(
-            fun=self.loss,
-            x0=self._coef,
-            args=(ev, sc, n_objects),
-            method=optimizer_method,
-            jac=self.grad_loss,
-            **optimizer_kwargs)
+        if optimizer_method in STOCHASTIC_METHODS:
+            res = minimize_stochastic(
+                fun=self.loss,
+                x0=self._coef,
+                event_args=(ev, sc),
+                args=(n_objects,),
+                method=optimizer_method,
+                jac=self.sparse_grad_loss,
+                random_state=self._rng,
+                sparse_jac=True,
+                **optimizer_kwargs)
+        else:
+            res = minimize(
+                fun=self.loss_and_grad,
+                x0=self._coef,
+                args=(ev, sc, n_objects),
+                method=optimizer_method,
+                jac=True,
+                **optimizer_kwargs)
 
         # get parameters
         self._coef[:] = res.x
@@ -393,12 +617,17 @@ class LogisticPMF(BaseExplicitItemFinder):
         self.fit_results_['grad_calls'] = res.njev
         self.fit_results_['optimizer_method'] = optimizer_method
         self.fit_results_['optimizer_kwargs'] = optimizer_kwargs
+        if 'epoch_losses' in res:
+            self.fit_results_['epoch_losses'] = res.epoch_losses
 
         # clean up temporary instance variables
         self.remove_data()
         self._coef = None
         self._dt = None
         self._reg = 1.0
+        self._reg_weights = None
+        self._scratch = None
+        self._incidence = None
 
     def raw_predict(self, ev):
         """
@@ -445,6 +674,24 @@ class ImplicitLogisticPMF(BaseImplicitItemFinder):
     k : int, optional
         the number of latent factors (= sizes of :math:`\mathbf{p}_u` or
         :math:`\mathbf{q}_i`), default=1
+    n_negatives : float, optional
+        if specified, negative events are sampled, and the ratio of the
+        number of sampled negative events to that of positive events of each
+        user is this value.  if None, all unseen events are used as negative
+        events.  default=None
+    sampling : {'uniform', 'popularity'}, optional
+        distribution of sampled items.  'uniform' draws items uniformly, and
+        'popularity' draws items proportionally to their numbers of
+        positive events.  default='uniform'
+    reweight : bool, optional
+        if True, sampled negative events are weighted so that the sampled
+        loss is an unbiased estimate of the loss of all unseen events.
+        Otherwise, all events are equally weighted.  default=True
+    block_size : int, optional
+        the number of users processed at once to compute the loss of all
+        events.  Memory of about ``2 * block_size * n_items`` floats is used.
+        if None, it is determined so that a block contains about
+        `IMPLICIT_BLOCK_ELEMENTS` pairs.  default=None
     optimizer_kwargs : keyword arguments, optional
         keyword arguments passed to optimizer
 
@@ -492,6 +739,16 @@ class ImplicitLogisticPMF(BaseImplicitItemFinder):
     events, and a regularization term is scaled by the number of model
     parameters.
 
+    The above loss needs the predictions of all pairs of users and items.
+    These are computed for each block of users by a product of latent factor
+    matrices, and the peak memory is bounded by `block_size` .
+    If `n_negatives` is specified, negative events of each user are
+    instead sampled from unseen events once before optimization, and the
+    loss is a weighted cross-entropy over positive and sampled events.  The
+    cost is proportional to the number of positive events.  The loss term is
+    scaled by the sum of weights, which equals to the number of all pairs in
+    expectation if `reweight` is True.
+
     References
     ----------
     .. [1] R. Salakhutdinov and A. Mnih. "Probabilistic matrix factorization"
@@ -500,13 +757,28 @@ class ImplicitLogisticPMF(BaseImplicitItemFinder):
         Collaborative Filtering Model", KDD2008
     """
 
-    def __init__(self, C=1.0, k=1, random_state=None, **optimizer_kwargs):
+    def __init__(
+            self, C=1.0, k=1, random_state=None, n_negatives=None,
+            sampling='uniform', reweight=True, block_size=None,
+            **optimizer_kwargs):
         super(ImplicitLogisticPMF, self).__init__(random_state=random_state)
 
         # model parameter
         self.C = float(C)
         self.k = int(k)
 
+        # negative sampling parameter
+        if n_negatives is not None and n_negatives <= 0:
+            raise ValueError("n_negatives must be positive")
+        if sampling not in ['uniform', 'popularity']:
+            raise ValueError("Unknown sampling method: " + str(sampling))
+        self.n_negatives = n_negatives
+        self.sampling = sampling
+        self.reweight = bool(reweight)
+        if block_size is not None and block_size < 1:
+            raise ValueError("block_size must be >= 1")
+        self.block_size = block_size
+
         # optimizer parameter
         self.optimizer_kwargs = optimizer_kwargs
         self.optimizer_kwargs['options'] = (
@@ -532,6 +804,7 @@ class ImplicitLogisticPMF(BaseImplicitItemFinder):
         self._coef = None
         self._dt = None
         self._reg = 1.0
+        self._incidence = None
 
     def _init_coef(self, ev, n_objects):
         """
@@ -582,49 +855,145 @@ class ImplicitLogisticPMF(BaseImplicitItemFinder):
         # scale a regularization term by the number of parameters
         self._reg = self.C / (coef_size - 1)
 
-    def loss(self, coef, ev, n_objects):
+    def _get_block_size(self, n_items):
         """
-        loss function to optimize
+        The number of users in a block
+
+        Parameters
+        ----------
+        n_items : int
+            the number of items
+
+        Returns
+        -------
+        block_size : int
+            `block_size` if specified, otherwise the size whose score matrix
+            contains about `IMPLICIT_BLOCK_ELEMENTS` elements
+        """
+        if self.block_size is not None:
+            return self.block_size
+
+        return max(IMPLICIT_BLOCK_ELEMENTS // max(n_items, 1), 1)
+
+    def _blocked_loss_and_grad(self, coef, ev, n_objects, compute_grad):
+        """
+        loss function of all events and its gradient
+
+        Users are split into blocks.  Scores of all pairs of users in a block
+        and items are computed by one matrix product, and positive events
+        are corrected sparsely.  The peak memory is proportional to the
+        number of users in a block times the number of items.
 
         Parameters
         ----------
         coef : array_like, shape=(variable,)
             coefficients of this model
-        ev : array_like, shape(n_events, 2), dtype=int
-            user and item indexes
+        ev : array, shape(n_users, n_items)
+            sparse rating matrix of positive events in CSR format
         n_objects : array_like, shape(2,), dtype=int
             numbers of users and items
+        compute_grad : bool
+            gradient is computed if True
 
         Returns
         -------
         loss : float
             value of loss function
+        grad : array_like, shape=coef.shape
+            the first gradient of loss function by coef.  None if
+            `compute_grad` is False.
         """
         # constants
         n_users = n_objects[0]
         n_events = n_objects[0] * n_objects[1]
+        block_size = self._get_block_size(n_objects[1])
+        ev = sparse.csr_matrix(ev)
 
-        # set array's view
+        # set input array's view
         mu = coef.view(self._dt)['mu'][0]
         bu = coef.view(self._dt)['bu'][0]
         bi = coef.view(self._dt)['bi'][0]
         p = coef.view(self._dt)['p'][0]
         q = coef.view(self._dt)['q'][0]
 
-        # loss term
+        # create empty gradient
+        if compute_grad:
+            grad = np.zeros_like(coef)
+            grad_mu = grad.view(self._dt)['mu'][0]
+            grad_bu = grad.view(self._dt)['bu'][0]
+            grad_bi = grad.view(self._dt)['bi'][0]
+            grad_p = grad.view(self._dt)['p'][0]
+            grad_q = grad.view(self._dt)['q'][0]
+        else:
+            grad = None
+
+        # loss term and its gradient
         loss = 0.0
-        for i in xrange(n_users):
-            evi = ev.getrow(i).toarray().reshape(-1)
-            esc = sigmoid(
-                mu[0] + bu[i] + bi[:] +
-                np.sum(p[i, :][np.newaxis, :] * q, axis=1))
-            loss = loss - np.sum(
-                evi * np.log(esc) + (1 - evi) * np.log(1. - esc))
+        for start in xrange(0, n_users, block_size):
+            end = min(start + block_size, n_users)
+
+            # scores of all pairs
+            esc = np.dot(p[start:end, :], q.T)
+            esc += bi[np.newaxis, :]
+            esc += (mu[0] + bu[start:end])[:, np.newaxis]
+            esc = sigmoid(esc)
+
+            # positive events in a block
+            evb = ev[start:end]
+            rows = np.repeat(np.arange(end - start), np.diff(evb.indptr))
+            cols = evb.indices
+            pos_esc = esc[rows, cols]
+
+            # cross entropy as if all events were negative, and corrections
+            # for positive events
+            loss -= np.sum(np.log(1.0 - esc))
+            loss -= np.sum(
+                evb.data * (np.log(pos_esc) - np.log(1.0 - pos_esc)))
+
+            if compute_grad:
+                common_term = esc
+                np.subtract.at(common_term, (rows, cols), evb.data)
+                grad_mu[0] += np.sum(common_term)
+                grad_bu[start:end] = np.sum(common_term, axis=1)
+                grad_bi[:] += np.sum(common_term, axis=0)
+                grad_p[start:end, :] = np.dot(common_term, q)
+                grad_q[:, :] += np.dot(common_term.T, p[start:end, :])
 
         # regularization term
         reg = (np.sum(bu**2) + np.sum(bi**2) + np.sum(p**2) + np.sum(q**2))
+        loss = loss / n_events + 0.5 * self._reg * reg
 
-        return loss / n_events + 0.5 * self._reg * reg
+        # gradient of regularization term
+        if compute_grad:
+            grad /= n_events
+            grad_bu[:] += self._reg * bu
+            grad_bi[:] += self._reg * bi
+            grad_p[:, :] += self._reg * p
+            grad_q[:, :] += self._reg * q
+
+        return loss, grad
+
+    def loss(self, coef, ev, n_objects):
+        """
+        loss function to optimize
+
+        Parameters
+        ----------
+        coef : array_like, shape=(variable,)
+            coefficients of this model
+        ev : array_like, shape(n_users, n_items)
+            sparse rating matrix of positive events
+        n_objects : array_like, shape(2,), dtype=int
+            numbers of users and items
+
+        Returns
+        -------
+        loss : float
+            value of loss function
+        """
+
+        return self._blocked_loss_and_grad(
+            coef, ev, n_objects, compute_grad=False)[0]
 
     def grad_loss(self, coef, ev, n_objects):
         """
@@ -634,19 +1003,181 @@ class ImplicitLogisticPMF(BaseImplicitItemFinder):
         ----------
         coef : array_like, shape=(variable,)
             coefficients of this model
-        ev : array_like, shape(n_events, 2), dtype=int
+        ev : array_like, shape(n_users, n_items)
+            sparse rating matrix of positive events
+        n_objects : array_like, shape(2,), dtype=int
+            numbers of users and items
+
+        Returns
+        -------
+        grad : array_like, shape=coef.shape
+            the first gradient of loss function by coef
+        """
+
+        return self._blocked_loss_and_grad(
+            coef, ev, n_objects, compute_grad=True)[1]
+
+    def loss_and_grad(self, coef, ev, n_objects):
+        """
+        loss function and its gradient
+
+        Predicted scores of each block of users are computed once and shared
+        between a loss and its gradient.  This is passed to an optimizer
+        together with ``jac=True`` .
+
+        Parameters
+        ----------
+        coef : array_like, shape=(variable,)
+            coefficients of this model
+        ev : array_like, shape(n_users, n_items)
+            sparse rating matrix of positive events
+        n_objects : array_like, shape(2,), dtype=int
+            numbers of users and items
+
+        Returns
+        -------
+        loss : float
+            value of loss function
+        grad : array_like, shape=coef.shape
+            the first gradient of loss function by coef
+        """
+
+        return self._blocked_loss_and_grad(
+            coef, ev, n_objects, compute_grad=True)
+
+    def _get_incidence(self, ev, n_objects):
+        """
+        Incidence matrices between objects and sampled events
+
+        see :meth:`LogisticPMF._get_incidence`
+        """
+        if self._incidence is None or self._incidence[0] is not ev:
+            n_events = ev.shape[0]
+            index = np.arange(n_events)
+            ones = np.ones(n_events, dtype=float)
+            self._incidence = (ev,) + tuple(
+                sparse.csr_matrix(
+                    (ones, (ev[:, col], index)),
+                    shape=(n_objects[col], n_events))
+                for col in xrange(2))
+
+        return self._incidence[1:]
+
+    def _sample_negatives(self, ev, n_objects, max_trials=10):
+        """
+        Sample negative events
+
+        Items are drawn for each user, and items already consumed by the
+        user are re-drawn.  Collisions remaining after `max_trials` draws,
+        which occur only for users who consumed almost all items, are
+        dropped.
+
+        Parameters
+        ----------
+        ev : array, shape(n_users, n_items)
+            sparse rating matrix of positive events
+        n_objects : array_like, shape(2,), dtype=int
+            numbers of users and items
+        max_trials : int, optional
+            the maximum number of draws, default=10
+
+        Returns
+        -------
+        sev : array, shape(n_sampled_events, 2), dtype=int
+            user and item indexes of positive and sampled negative events
+        ssc : array, shape(n_sampled_events,), dtype=float
+            1 for positive events, and 0 for negative events
+        weight : array, shape(n_sampled_events,), dtype=float
+            weights of events
+        """
+        n_users = n_objects[0]
+        n_items = n_objects[1]
+
+        # positive events
+        pos_users, pos_items = ev.nonzero()
+        pos_keys = np.unique(pos_users * n_items + pos_items)
+        pos_users = pos_keys // n_items
+        pos_items = pos_keys % n_items
+        n_user_pos = np.bincount(pos_users, minlength=n_users)
+
+        # sampling distribution of items
+        if self.sampling == 'popularity':
+            prob = np.bincount(pos_items, minlength=n_items).astype(float)
+        else:
+            prob = np.ones(n_items, dtype=float)
+        prob /= np.sum(prob)
+        cum_prob = np.cumsum(prob)
+        cum_prob[-1] = 1.0
+
+        # the numbers of samples of users.  no samples are drawn for users
+        # who consumed all items with positive probabilities.
+        pos_prob = np.bincount(
+            pos_users, weights=prob[pos_items], minlength=n_users)
+        neg_prob = np.clip(1.0 - pos_prob, 0.0, 1.0)
+        n_user_neg = np.rint(self.n_negatives * n_user_pos).astype(int)
+        n_user_neg[neg_prob <= 1e-10] = 0
+
+        # draw items and re-draw collisions with positive events
+        neg_users = np.repeat(np.arange(n_users), n_user_neg)
+        neg_items = np.empty_like(neg_users)
+        redraw = np.arange(neg_users.shape[0])
+        for trial in xrange(max_trials):
+            neg_items[redraw] = np.searchsorted(
+                cum_prob, self._rng.random_sample(redraw.shape[0]),
+                side='right')
+            keys = neg_users[redraw] * n_items + neg_items[redraw]
+            pos = np.searchsorted(pos_keys, keys)
+            pos[pos >= pos_keys.shape[0]] = 0
+            redraw = redraw[pos_keys[pos] == keys]
+            if redraw.shape[0] == 0:
+                break
+        if redraw.shape[0] > 0:
+            valid = np.ones(neg_users.shape[0], dtype=bool)
+            valid[redraw] = False
+            neg_users = neg_users[valid]
+            neg_items = neg_items[valid]
+
+        # weights of negative events: the inverse of the probabilities that
+        # items are drawn among unseen items of each user
+        if self.reweight:
+            neg_weight = (
+                neg_prob[neg_users] /
+                (n_user_neg[neg_users] * prob[neg_items]))
+        else:
+            neg_weight = np.ones(neg_users.shape[0], dtype=float)
+
+        sev = np.r_[np.c_[pos_users, pos_items], np.c_[neg_users, neg_items]]
+        ssc = np.r_[np.ones(pos_keys.shape[0]), np.zeros(neg_users.shape[0])]
+        weight = np.r_[np.ones(pos_keys.shape[0]), neg_weight]
+
+        return sev, ssc, weight
+
+    def sampled_loss_and_grad(self, coef, ev, sc, weight, n_objects):
+        """
+        loss function of sampled events and its gradient
+
+        Parameters
+        ----------
+        coef : array_like, shape=(variable,)
+            coefficients of this model
+        ev : array_like, shape(n_sampled_events, 2), dtype=int
             user and item indexes
+        sc : array_like, shape(n_sampled_events,), dtype=float
+            1 for positive events, and 0 for negative events
+        weight : array_like, shape(n_sampled_events,), dtype=float
+            weights of events
         n_objects : array_like, shape(2,), dtype=int
             numbers of users and items
 
         Returns
         -------
+        loss : float
+            value of loss function
         grad : array_like, shape=coef.shape
             the first gradient of loss function by coef
         """
         # constants
-        n_users = n_objects[0]
-        n_events = n_objects[0] * n_objects[1]
+        total_weight = np.sum(weight)
 
         # set input array's view
         mu = coef.view(self._dt)['mu'][0]
@@ -656,28 +1187,34 @@ class ImplicitLogisticPMF(BaseImplicitItemFinder):
         q = coef.view(self._dt)['q'][0]
 
         # create empty gradient
-        grad = np.zeros_like(coef)
+        grad = np.empty_like(coef)
         grad_mu = grad.view(self._dt)['mu'][0]
         grad_bu = grad.view(self._dt)['bu'][0]
         grad_bi = grad.view(self._dt)['bi'][0]
         grad_p = grad.view(self._dt)['p'][0]
         grad_q = grad.view(self._dt)['q'][0]
 
-        # gradient of loss term
-        for i in xrange(n_users):
-            evi = ev.getrow(i).toarray().reshape(-1)
-            esc = sigmoid(
-                mu[0] + bu[i] + bi[:] +
-                np.sum(p[i, :][np.newaxis, :] * q, axis=1))
-            common_term = esc - evi
-
-            grad_mu[0] += np.sum(common_term)
-            grad_bu[i] = np.sum(common_term)
-            grad_bi[:] += common_term
-            grad_p[i, :] = np.sum(common_term[:, np.newaxis] * q, axis=0)
-            grad_q[:, :] += common_term[:, np.newaxis] * p[i, :][np.newaxis, :]
+        # loss term
+        esc = sigmoid(
+            mu[0] + bu[ev[:, 0]] + bi[ev[:, 1]] +
+            np.sum(p[ev[:, 0], :] * q[ev[:, 1], :], axis=1))
+        loss = - np.sum(
+            weight * (sc * np.log(esc) + (1 - sc) * np.log(1 - esc)))
 
-        grad[:] = grad[:] / n_events
+        # regularization term
+        reg = (np.sum(bu**2) + np.sum(bi**2) + np.sum(p**2) + np.sum(q**2))
+
+        # gradient of loss term
+        users, items = self._get_incidence(ev, n_objects)
+        common_term = weight * (esc - sc)
+        grad_mu[0] = np.sum(common_term)
+        grad_bu[:] = users.dot(common_term)
+        grad_bi[:] = items.dot(common_term)
+        grad_p[:, :] = users.dot(
+            common_term[:, np.newaxis] * q[ev[:, 1], :])
+        grad_q[:, :] = items.dot(
+            common_term[:, np.newaxis] * p[ev[:, 0], :])
+        grad /= total_weight
 
         # gradient of regularization term
         grad_bu[:] += self._reg * bu
@@ -685,7 +1222,7 @@ class ImplicitLogisticPMF(BaseImplicitItemFinder):
         grad_p[:, :] += self._reg * p
         grad_q[:, :] += self._reg * q
 
-        return grad
+        return loss / total_weight + 0.5 * self._reg * reg, grad
 
     def fit(self, data, event_index=(0, 1)):
         """
@@ -714,19 +1251,27 @@ class ImplicitLogisticPMF(BaseImplicitItemFinder):
         optimizer_kwargs = self.optimizer_kwargs.copy()
         optimizer_method = optimizer_kwargs.pop('method', 'CG')
 
+        # loss of all events, or sampled events
+        if self.n_negatives is None:
+            fun = self.loss_and_grad
+            args = (ev, n_objects)
+        else:
+            fun = self.sampled_loss_and_grad
+            args = self._sample_negatives(ev, n_objects) + (n_objects,)
+            self.fit_results_['n_sampled_events'] = args[0].shape[0]
+
         # get initial loss
-        self.fit_results_['initial_loss'] = self.loss(
-            self._coef, ev, n_objects)
+        self.fit_results_['initial_loss'] = fun(self._coef, *args)[0]
 
         # optimize model
         # fmin_bfgs is slow for large data, maybe because due to the
         # computation cost for the Hessian matrices.
         res = minimize(
-            fun=self.loss,
+            fun=fun,
             x0=self._coef,
-            args=(ev, n_objects),
+            args=args,
             method=optimizer_method,
-            jac=self.grad_loss,
+            jac=True,
             **optimizer_kwargs)
 
         # get parameters
@@ -761,6 +1306,7 @@ class ImplicitLogisticPMF(BaseImplicitItemFinder):
         self._coef = None
         self._dt = None
         self._reg = 1.0
+        self._incidence = None
 
     def raw_predict(self, ev):
         """
@@ -790,9 +1336,1010 @@ class ImplicitLogisticPMF(BaseImplicitItemFinder):
         return sc
 
 
-# =============================================================================
-# Functions
-# =============================================================================
+class ImplicitALS(BaseImplicitItemFinder):
+    """
+    A weighted matrix factorization model for implicit feedback proposed in
+    [1]_ , which is fitted by alternating least squares.
+    A method of handling bias terms is defined by equation (5) in [2]_.
+    Like :class:`kamrecsys.item_finder.ImplicitLogisticPMF` , this class
+    accepts a dataset containing only positive events, and all the other
+    unseen events are treated as negative ones.
+
+    Parameters
+    ----------
+    C : float, optional
+        regularization parameter (= :math:`\lambda`), default=1.0
+    k : int, optional
+        the number of latent factors (= sizes of :math:`\mathbf{p}_u` or
+        :math:`\mathbf{q}_i`), default=1
+    alpha : float, optional
+        confidence weight of positive events (= :math:`\alpha`), default=1.0
+    solver : {'direct', 'cg'}, optional
+        solver of linear systems of each user or item.  'direct' exactly
+        solves systems by LU decompositions, and 'cg' approximately solves
+        them by a few steps of conjugate gradient methods without forming
+        coefficient matrices, which is faster if `k` is large.
+        default='direct'
+    cg_steps : int, optional
+        the number of conjugate gradient steps per update, default=3
+    optimizer_kwargs : keyword arguments, optional
+        keyword arguments passed to optimizer.  `tol` is a threshold of a
+        relative decrease of the loss, default=1e-5.  `maxiter` is the
+        maximum number of sweeps, default=100.
+
+    Attributes
+    ----------
+    mu_ : array_like
+        global bias
+    bu_ : array_like
+        users' biases
+    bi_ : array_like
+        items' biases
+    p_ : array_like
+        latent factors of users
+    q_ : array_like
+        latent factors of items
+
+    Notes
+    -----
+    Preferences are modeled by the sum of bias terms and the cross
+    product of users' and items' latent factors.
+
+    .. math::
+
+        \hat{r}_{xy} =
+        \mu + b_x + c_y + \mathbf{p}_x^\top \mathbf{q}_y
+
+    Parameters of this model is estimated by optimizing a squared loss
+    function weighted by confidences with L2 regularizer
+
+    .. math::
+
+        \sum_{(x,y)}
+        \frac{1}{N_x N_y}
+        (1 + \alpha r_{xy}) \big( \mathbb{1}[r_{xy} > 0] - \hat{r}_{xy} \big)^2
+        + \lambda \Big(
+        \|\mathbf{b}\|_2^2 + \|\mathbf{c}\|_2^2 +
+        \|\mathbf{P}\|_2^2 + \|\mathbf{Q}\|_2^2
+        \Big)
+
+    where :math:`r_{xy}` is the number of events of a pair.  For
+    computational reasons, a loss term is scaled by the number of pairs, and
+    a regularization term is scaled by the number of model parameters.  A
+    global bias is fixed to the ratio of positive pairs, because it is
+    redundant with biases of users.
+
+    Biases and latent factors of users and those of items are alternately
+    updated.  Terms of all pairs are aggregated by a Gram matrix of factors
+    shared by all users or items, and terms of positive events are added
+    to it.  Hence, the cost of a sweep is
+    :math:`O(N k^2 + (N_x + N_y) k^3)` , where :math:`N` is the number of
+    positive pairs, if `solver` is 'direct' .
+
+    References
+    ----------
+    .. [1] Y. Hu, Y. Koren, and C. Volinsky. "Collaborative Filtering for
+        Implicit Feedback Datasets" ICDM2008
+    .. [2] Y. Koren, "Factorization Meets the Neighborhood: A Multifaceted
+        Collaborative Filtering Model", KDD2008
+    """
+
+    def __init__(
+            self, C=1.0, k=1, alpha=1.0, solver='direct', cg_steps=3,
+            random_state=None, **optimizer_kwargs):
+        super(ImplicitALS, self).__init__(random_state=random_state)
+
+        # model parameter
+        self.C = float(C)
+        self.k = int(k)
+        self.alpha = float(alpha)
+
+        # solver parameter
+        if solver not in ['direct', 'cg']:
+            raise ValueError("Unknown solver: " + str(solver))
+        if cg_steps < 1:
+            raise ValueError("cg_steps must be >= 1")
+        self.solver = solver
+        self.cg_steps = int(cg_steps)
+
+        # optimizer parameter
+        self.optimizer_kwargs = optimizer_kwargs
+        self.optimizer_kwargs['options'] = (
+            self.optimizer_kwargs.get('options', {}))
+        opt_maxiter = self.optimizer_kwargs.pop('maxiter', None)
+        if opt_maxiter is not None:
+            self.optimizer_kwargs['options']['maxiter'] = opt_maxiter
+
+        # learned parameter
+        self.mu_ = None
+        self.bu_ = None
+        self.bi_ = None
+        self.p_ = None
+        self.q_ = None
+        self.fit_results_ = {
+            'initial_loss': np.inf,
+            'final_loss': np.inf,
+        }
+
+        # private instance variables
+        self._coef = None
+        self._dt = None
+        self._reg = 1.0
+
+    def _init_coef(self, ev, n_objects):
+        """
+        Initialize model parameters
+
+        Parameters
+        ----------
+        ev : array, shape(n_users, n_items)
+            sparse rating matrix of positive events in CSR format
+        n_objects : array, shape(2,)
+            vector of numbers of objects
+        """
+        # constants
+        n_positives = ev.count_nonzero()
+        n_users = n_objects[0]
+        n_items = n_objects[1]
+        k = self.k
+
+        # define dtype for parameters
+        self._dt = np.dtype([
+            ('mu', float, (1,)),
+            ('bu', float, n_users),
+            ('bi', float, n_items),
+            ('p', float, (n_users, k)),
+            ('q', float, (n_items, k))
+        ])
+
+        # memory allocation
+        coef_size = 1 + n_users + n_items + n_users * k + n_items * k
+        self._coef = np.zeros(coef_size, dtype=float)
+
+        # set array's view
+        self.mu_ = self._coef.view(self._dt)['mu'][0]
+        self.bu_ = self._coef.view(self._dt)['bu'][0]
+        self.bi_ = self._coef.view(self._dt)['bi'][0]
+        self.p_ = self._coef.view(self._dt)['p'][0]
+        self.q_ = self._coef.view(self._dt)['q'][0]
+
+        # set bias term
+        self.mu_[0] = n_positives / (n_users * n_items)
+
+        # fill cross terms by normal randoms
+        self.p_[0:n_users, :] = (self._rng.normal(0.0, 1.0, (n_users, k)))
+        self.q_[0:n_items, :] = (self._rng.normal(0.0, 1.0, (n_items, k)))
+
+        # scale a regularization term by the number of parameters
+        self._reg = self.C / (coef_size - 1)
+
+    def loss(self, coef, ev, n_objects):
+        """
+        loss function to optimize
+
+        Squared errors of all pairs are computed from Gram matrices of
+        factors, and are corrected for positive events.
+
+        Parameters
+        ----------
+        coef : array_like, shape=(variable,)
+            coefficients of this model
+        ev : array_like, shape(n_users, n_items)
+            sparse rating matrix of positive events in CSR format
+        n_objects : array_like, shape(2,), dtype=int
+            numbers of users and items
+
+        Returns
+        -------
+        loss : float
+            value of loss function
+        """
+        # constants
+        n_users = n_objects[0]
+        n_items = n_objects[1]
+        ev = sparse.csr_matrix(ev)
+
+        # set input array's view
+        mu = coef.view(self._dt)['mu'][0]
+        bu = coef.view(self._dt)['bu'][0]
+        bi = coef.view(self._dt)['bi'][0]
+        p = coef.view(self._dt)['p'][0]
+        q = coef.view(self._dt)['q'][0]
+
+        # a score is mu + x_u^T y_i, where x_u = (b_u, 1, p_u) and
+        # y_i = (1, c_i, q_i)
+        x = np.c_[bu, np.ones(n_users), p]
+        y = np.c_[np.ones(n_items), bi, q]
+
+        # squared scores of all pairs
+        loss = (n_users * n_items * mu[0] ** 2 +
+                2.0 * mu[0] * np.dot(np.sum(x, axis=0), np.sum(y, axis=0)) +
+                np.sum(np.dot(x.T, x) * np.dot(y.T, y)))
+
+        # corrections for positive events
+        users = np.repeat(np.arange(n_users), np.diff(ev.indptr))
+        items = ev.indices
+        esc = mu[0] + np.sum(x[users, :] * y[items, :], axis=1)
+        conf = 1.0 + self.alpha * ev.data
+        loss += np.sum(conf * (1.0 - esc) ** 2 - esc ** 2)
+
+        # regularization term
+        reg = (np.sum(bu**2) + np.sum(bi**2) + np.sum(p**2) + np.sum(q**2))
+
+        return loss / (n_users * n_items) + 0.5 * self._reg * reg
+
+    def _als_half_sweep(self, ev, x, target, out):
+        """
+        Update a bias and latent factors of each user or item
+
+        Parameters
+        ----------
+        ev : array, shape(n_objects, n_counterparts)
+            sparse rating matrix of positive events in CSR format, whose rows
+            are objects to update
+        x : array, shape(n_counterparts, k + 1)
+            explanatory variables of counterparts, i.e., one and latent
+            factors
+        target : array, shape(n_counterparts,)
+            offsets of scores subtracted from preferences, i.e., global and
+            counterparts' biases
+        out : array, shape(n_objects, k + 1)
+            current biases and latent factors.  updated ones are stored.
+        """
+        # constants
+        lam = 0.5 * ev.shape[0] * ev.shape[1] * self._reg
+        cg_steps = self.cg_steps if self.solver == 'cg' else None
+
+        # terms of all pairs, as if all of them were negative
+        gram = np.dot(x.T, x)
+        base = - np.dot(target, x)
+
+        # terms of positive events
+        conf = 1.0 + self.alpha * ev.data
+        wx = x[ev.indices, :]
+        wy = conf * (1.0 - target[ev.indices]) + target[ev.indices]
+
+        blocks = _split_blocks(
+            _ridge_block_costs(ev.indptr, x.shape[1]), ALS_BLOCK_ELEMENTS)
+        for start, end in blocks:
+            first, last = ev.indptr[start], ev.indptr[end]
+            _solve_implicit_block(
+                wx[first:last], conf[first:last] - 1.0, wy[first:last],
+                ev.indptr[start:end + 1] - first, gram, base, lam,
+                out[start:end], cg_steps=cg_steps)
+
+    def _fit_als(self, ev, n_objects, tol=1e-5, options=None):
+        """
+        Fit model parameters by alternating least squares
+
+        Parameters
+        ----------
+        ev : array, shape(n_users, n_items)
+            sparse rating matrix of positive events in CSR format
+        n_objects : array, shape(2,)
+            vector of numbers of objects
+        tol : float, optional
+            sweeps are stopped if a relative decrease of the loss is less
+            than this value, default=1e-5
+        options : dict, optional
+            `maxiter` is the maximum number of sweeps, default=100
+
+        Returns
+        -------
+        res : :class:`scipy.optimize.OptimizeResult`
+            results in the same format as :func:`scipy.optimize.minimize`
+
+        Raises
+        ------
+        ValueError
+            if a regularization parameter is not positive
+        """
+        if self.C <= 0.0:
+            raise ValueError("C must be positive for the ALS optimizer")
+        maxiter = 100 if options is None else options.get('maxiter', 100)
+
+        # rating matrices whose rows are users and items
+        evt = ev.T.tocsr()
+
+        # views of parameters
+        mu = self._coef.view(self._dt)['mu'][0]
+        bu = self._coef.view(self._dt)['bu'][0]
+        bi = self._coef.view(self._dt)['bi'][0]
+        p = self._coef.view(self._dt)['p'][0]
+        q = self._coef.view(self._dt)['q'][0]
+
+        # work spaces
+        wu = np.empty((n_objects[0], self.k + 1), dtype=float)
+        wi = np.empty((n_objects[1], self.k + 1), dtype=float)
+
+        loss = self.loss(self._coef, ev, n_objects)
+        n_loss_calls = 1
+        success = False
+        n_sweeps = 0
+        while n_sweeps < maxiter:
+            n_sweeps += 1
+
+            # users
+            wu[:, 0] = bu
+            wu[:, 1:] = p
+            self._als_half_sweep(ev, np.c_[np.ones(n_objects[1]), q],
+                                 mu[0] + bi, wu)
+            bu[:] = wu[:, 0]
+            p[:, :] = wu[:, 1:]
+
+            # items
+            wi[:, 0] = bi
+            wi[:, 1:] = q
+            self._als_half_sweep(evt, np.c_[np.ones(n_objects[0]), p],
+                                 mu[0] + bu, wi)
+            bi[:] = wi[:, 0]
+            q[:, :] = wi[:, 1:]
+
+            # check convergence
+            prev_loss = loss
+            loss = self.loss(self._coef, ev, n_objects)
+            n_loss_calls += 1
+            logger.debug("ALS sweep %d: loss = %f", n_sweeps, loss)
+            if prev_loss - loss <= tol * max(abs(prev_loss), abs(loss), 1.0):
+                success = True
+                break
+
+        status = 0 if success else 2
+        return OptimizeResult(
+            x=self._coef.copy(), fun=loss, success=success, status=status,
+            message=get_fit_status_message(status),
+            nit=n_sweeps, nfev=n_loss_calls, njev=0)
+
+    def fit(self, data, event_index=(0, 1)):
+        """
+        fitting model
+
+        Parameters
+        ----------
+        data : :class:`kamrecsys.data.EventData`
+            data to fit
+        event_index : optional, array-like, shape=(2,), dtype=int 
+            Index to specify the column numbers specifing a user and an item
+            in an event array 
+            (default=(0, 1))
+        """
+
+        # call super class
+        super(ImplicitALS, self).fit(data, event_index)
+
+        # get input data
+        ev, n_objects = self.get_event_array('csr')
+
+        # initialize coefficients
+        self._init_coef(ev, n_objects)
+
+        # check optimization parameters
+        optimizer_kwargs = self.optimizer_kwargs.copy()
+
+        # get initial loss
+        self.fit_results_['initial_loss'] = self.loss(
+            self._coef, ev, n_objects)
+
+        # optimize model
+        res = self._fit_als(ev, n_objects, **optimizer_kwargs)
+
+        # get parameters
+        self._coef[:] = res.x
+
+        # add parameters for unknown users and items
+        self.mu_ = self._coef.view(self._dt)['mu'][0].copy()
+        self.bu_ = np.r_[self._coef.view(self._dt)['bu'][0], 0.0]
+        self.bi_ = np.r_[self._coef.view(self._dt)['bi'][0], 0.0]
+        self.p_ = np.r_[self._coef.view(self._dt)['p'][0],
+                        np.zeros((1, self.k), dtype=float)]
+        self.q_ = np.r_[self._coef.view(self._dt)['q'][0],
+                        np.zeros((1, self.k), dtype=float)]
+
+        # store fitting results
+        self.fit_results_['n_users'] = n_objects[0]
+        self.fit_results_['n_items'] = n_objects[1]
+        self.fit_results_['n_events'] = self.n_events
+        self.fit_results_['n_parameters'] = self._coef.size
+        self.fit_results_['success'] = res.success
+        self.fit_results_['status'] = res.status
+        self.fit_results_['message'] = res.message
+        self.fit_results_['final_loss'] = res.fun
+        self.fit_results_['n_iterations'] = res.nit
+        self.fit_results_['func_calls'] = res.nfev
+        self.fit_results_['grad_calls'] = res.njev
+        self.fit_results_['optimizer_method'] = 'als'
+        self.fit_results_['optimizer_kwargs'] = optimizer_kwargs
+
+        # clean up temporary instance variables
+        self.remove_data()
+        self._coef = None
+        self._dt = None
+        self._reg = 1.0
+
+    def raw_predict(self, ev):
+        """
+        predict score of given one event represented by internal ids
+
+        Parameters
+        ----------
+        (user, item) : array_like
+            a target user's and item's ids. unknown objects assumed to be
+            represented by n_object[event_otype]
+
+        Returns
+        -------
+        sc : float
+            score for a target pair of user and item
+
+        Raises
+        ------
+        TypeError
+            shape of an input array is illegal
+        """
+
+        sc = (self.mu_[0] + self.bu_[ev[:, 0]] + self.bi_[ev[:, 1]] +
+              np.sum(self.p_[ev[:, 0], :] * self.q_[ev[:, 1], :], axis=1))
+
+        return sc
+
+
+class ImplicitBPR(BaseImplicitItemFinder):
+    """
+    A matrix factorization model trained by Bayesian personalized ranking
+    proposed in [1]_.
+    A method of handling bias terms is defined by equation (5) in [2]_.
+    Like :class:`kamrecsys.item_finder.ImplicitLogisticPMF` , this class
+    accepts a dataset containing only positive events, but only pairs of
+    consumed and unseen items of each user are compared.
+
+    Parameters
+    ----------
+    C : float, optional
+        regularization parameter (= :math:`\lambda`), default=1.0
+    k : int, optional
+        the number of latent factors (= sizes of :math:`\mathbf{p}_u` or
+        :math:`\mathbf{q}_i`), default=1
+    optimizer_kwargs : keyword arguments, optional
+        keyword arguments passed to optimizer, see
+        :func:`kamrecsys.utils.minimize_stochastic` .  `method` is one of
+        'sgd', 'momentum', 'adagrad', or 'adam', default='sgd'.
+        `batch_size` is the number of triplets in a minibatch, default=1000.
+        `maxiter` is the number of epochs, default=100.  If `method` is
+        'sgd', the default `learning_rate` is 0.05 times `batch_size` , i.e.,
+        a step of 0.05 per triplet.
+
+    Attributes
+    ----------
+    mu_ : array_like
+        global bias
+    bu_ : array_like
+        users' biases
+    bi_ : array_like
+        items' biases
+    p_ : array_like
+        latent factors of users
+    q_ : array_like
+        latent factors of items
+
+    Notes
+    -----
+    Rating scores are modeled by the sum of bias terms and the cross
+    product of users' and items' latent factors in the same way as
+    :class:`kamrecsys.item_finder.ImplicitLogisticPMF` .
+
+    .. math::
+
+        \hat{r}_{xy} =  \sigma(
+        \mu + b_x + c_y + \mathbf{p}_x^\top \mathbf{q}_y
+        )
+
+    Parameters of this model is estimated by optimizing a pairwise ranking
+    loss function with L2 regularizer
+
+    .. math::
+
+        \sum_{(x,y,z)}
+        -\frac{1}{N}
+        \log \sigma \big( c_y - c_z +
+        \mathbf{p}_x^\top (\mathbf{q}_y - \mathbf{q}_z) \big)
+        + \lambda \Big(
+        \|\mathbf{c}\|_2^2 + \|\mathbf{P}\|_2^2 + \|\mathbf{Q}\|_2^2
+        \Big)
+
+    where an item :math:`y` is consumed by a user :math:`x` and an item
+    :math:`z` is not.  A global bias and users' biases cancel out in this
+    loss, and these are fixed to zero.  A loss term is scaled by the number
+    of triplets, and a regularization term is scaled by the number of model
+    parameters.
+
+    Parameters are updated by stochastic gradient descent as in [1]_ , or
+    by the other methods of :func:`kamrecsys.utils.minimize_stochastic` ,
+    but a gradient is computed for a minibatch of triplets at once by
+    :meth:`sparse_grad_loss` .  Triplets of each minibatch are drawn by
+    :meth:`_sample_triplets` , which picks positive events uniformly, and
+    unseen items of their users uniformly.  Like [1]_ , only parameters of
+    users and items in a minibatch are updated, and the regularization term
+    is applied only to them.  An epoch consists of as many triplets as
+    positive events, and its cost does not depend on the numbers of users
+    and items.  A loss is monitored on triplets drawn once before
+    optimization.
+
+    References
+    ----------
+    .. [1] S. Rendle, C. Freudenthaler, Z. Gantner, and L. Schmidt-Thieme.
+        "BPR: Bayesian Personalized Ranking from Implicit Feedback" UAI2009
+    .. [2] Y. Koren, "Factorization Meets the Neighborhood: A Multifaceted
+        Collaborative Filtering Model", KDD2008
+    """
+
+    def __init__(self, C=1.0, k=1, random_state=None, **optimizer_kwargs):
+        super(ImplicitBPR, self).__init__(random_state=random_state)
+
+        # model parameter
+        self.C = float(C)
+        self.k = int(k)
+
+        # optimizer parameter
+        self.optimizer_kwargs = optimizer_kwargs
+        self.optimizer_kwargs['options'] = (
+            self.optimizer_kwargs.get('options', {}))
+        opt_maxiter = self.optimizer_kwargs.pop('maxiter', None)
+        if opt_maxiter is not None:
+            self.optimizer_kwargs['options']['maxiter'] = opt_maxiter
+
+        # learned parameter
+        self.mu_ = None
+        self.bu_ = None
+        self.bi_ = None
+        self.p_ = None
+        self.q_ = None
+        self.fit_results_ = {
+            'initial_loss': np.inf,
+            'final_loss': np.inf,
+        }
+
+        # private instance variables
+        self._coef = None
+        self._dt = None
+        self._reg = 1.0
+
+    def _init_coef(self, ev, n_objects):
+        """
+        Initialize model parameters
+
+        Parameters
+        ----------
+        ev : array, shape(n_users, n_items)
+            sparse rating matrix of positive events in CSR format
+        n_objects : array, shape(2,)
+            vector of numbers of objects
+        """
+        # constants
+        n_users = n_objects[0]
+        n_items = n_objects[1]
+        k = self.k
+
+        # define dtype for parameters
+        self._dt = np.dtype([
+            ('mu', float, (1,)),
+            ('bu', float, n_users),
+            ('bi', float, n_items),
+            ('p', float, (n_users, k)),
+            ('q', float, (n_items, k))
+        ])
+
+        # memory allocation
+        coef_size = 1 + n_users + n_items + n_users * k + n_items * k
+        self._coef = np.zeros(coef_size, dtype=float)
+
+        # set array's view
+        self.mu_ = self._coef.view(self._dt)['mu'][0]
+        self.bu_ = self._coef.view(self._dt)['bu'][0]
+        self.bi_ = self._coef.view(self._dt)['bi'][0]
+        self.p_ = self._coef.view(self._dt)['p'][0]
+        self.q_ = self._coef.view(self._dt)['q'][0]
+
+        # set bias term of items
+        n_item_events = np.asarray(ev.sum(axis=0)).ravel()
+        self.bi_[:] = n_item_events / n_users
+
+        # fill cross terms by normal randoms
+        self.p_[0:n_users, :] = (self._rng.normal(0.0, 1.0, (n_users, k)))
+        self.q_[0:n_items, :] = (self._rng.normal(0.0, 1.0, (n_items, k)))
+
+        # scale a regularization term by the number of parameters
+        self._reg = self.C / (coef_size - 1)
+
+    def _sample_triplets(self, pos_keys, n_objects, n_triplets,
+                         max_trials=10):
+        """
+        Sample triplets of users, consumed items, and unseen items
+
+        Positive events are drawn uniformly, and unseen items of their users
+        are drawn uniformly.  Items consumed by the user are re-drawn.
+        Collisions remaining after `max_trials` draws, which occur only for
+        users who consumed almost all items, are dropped.
+
+        Parameters
+        ----------
+        pos_keys : array, shape(n_positives,), dtype=int
+            sorted keys of positive events, ``user * n_items + item``
+        n_objects : array_like, shape(2,), dtype=int
+            numbers of users and items
+        n_triplets : int
+            the number of triplets to draw
+        max_trials : int, optional
+            the maximum number of draws, default=10
+
+        Returns
+        -------
+        tev : array, shape(n_sampled_triplets, 3), dtype=int
+            indexes of users, consumed items, and unseen items
+        """
+        n_items = n_objects[1]
+
+        # positive events
+        keys = pos_keys[self._rng.randint(pos_keys.shape[0], size=n_triplets)]
+        users = keys // n_items
+        items = keys % n_items
+
+        # draw unseen items and re-draw collisions with positive events
+        neg_items = np.empty_like(items)
+        redraw = np.arange(n_triplets)
+        for trial in xrange(max_trials):
+            neg_items[redraw] = self._rng.randint(
+                n_items, size=redraw.shape[0])
+            keys = users[redraw] * n_items + neg_items[redraw]
+            pos = np.searchsorted(pos_keys, keys)
+            pos[pos >= pos_keys.shape[0]] = 0
+            redraw = redraw[pos_keys[pos] == keys]
+            if redraw.shape[0] == 0:
+                break
+        if redraw.shape[0] > 0:
+            valid = np.ones(n_triplets, dtype=bool)
+            valid[redraw] = False
+            users = users[valid]
+            items = items[valid]
+            neg_items = neg_items[valid]
+
+        return np.c_[users, items, neg_items]
+
+    def loss(self, coef, tev, n_objects):
+        """
+        loss function to optimize
+
+        Parameters
+        ----------
+        coef : array_like, shape=(variable,)
+            coefficients of this model
+        tev : array, shape(n_triplets, 3), dtype=int
+            indexes of users, consumed items, and unseen items
+        n_objects : array_like, shape(2,), dtype=int
+            numbers of users and items
+
+        Returns
+        -------
+        loss : float
+            value of loss function
+        """
+        # set input array's view
+        bu = coef.view(self._dt)['bu'][0]
+        bi = coef.view(self._dt)['bi'][0]
+        p = coef.view(self._dt)['p'][0]
+        q = coef.view(self._dt)['q'][0]
+
+        # differences of scores between consumed and unseen items
+        diff = bi[tev[:, 1]] - bi[tev[:, 2]] + np.sum(
+            p[tev[:, 0], :] * (q[tev[:, 1], :] - q[tev[:, 2], :]), axis=1)
+
+        # loss term
+        loss = np.sum(np.logaddexp(0.0, -diff))
+
+        # regularization term
+        reg = (np.sum(bu**2) + np.sum(bi**2) + np.sum(p**2) + np.sum(q**2))
+
+        return loss / tev.shape[0] + 0.5 * self._reg * reg
+
+    def grad_loss(self, coef, tev, n_objects):
+        """
+        gradient of loss function
+
+        Parameters
+        ----------
+        coef : array_like, shape=(variable,)
+            coefficients of this model
+        tev : array, shape(n_triplets, 3), dtype=int
+            indexes of users, consumed items, and unseen items
+        n_objects : array_like, shape(2,), dtype=int
+            numbers of users and items
+
+        Returns
+        -------
+        grad : array_like, shape=coef.shape
+            the first gradient of loss function by coef
+        """
+        # gradient of regularization term
+        grad = self._reg * coef
+        grad.view(self._dt)['mu'][0][:] = 0.0
+
+        # overwrite parameters of users and items in triplets
+        index, sparse_grad = self.sparse_grad_loss(coef, tev, n_objects)
+        grad[index] = sparse_grad
+
+        return grad
+
+    def sparse_grad_loss(self, coef, tev, n_objects):
+        """
+        gradient of loss function at parameters of users and items in triplets
+
+        This is used by stochastic gradient descent.  The regularization term
+        is applied only to the parameters of users and items in `tev` , and
+        the cost does not depend on the numbers of users and items.
+
+        Parameters
+        ----------
+        coef : array_like, shape=(variable,)
+            coefficients of this model
+        tev : array, shape(n_triplets, 3), dtype=int
+            indexes of users, consumed items, and unseen items
+        n_objects : array_like, shape(2,), dtype=int
+            numbers of users and items
+
+        Returns
+        -------
+        index : array, dtype=int
+            unique indexes of parameters in `coef`
+        grad : array, dtype=float
+            the first gradient of loss function at these parameters
+        """
+        # constants
+        n_triplets = tev.shape[0]
+        k = self.k
+        offset = dict((name, self._dt.fields[name][1] // coef.itemsize)
+                      for name in ('bi', 'p', 'q'))
+        users, items, neg_items = tev[:, 0], tev[:, 1], tev[:, 2]
+
+        # set input array's view
+        bi = coef.view(self._dt)['bi'][0]
+        p = coef.view(self._dt)['p'][0]
+        q = coef.view(self._dt)['q'][0]
+
+        # common term
+        q_diff = q[items, :] - q[neg_items, :]
+        diff = bi[items] - bi[neg_items] + np.sum(p[users, :] * q_diff, axis=1)
+        common_term = (sigmoid(diff) - 1.0) / n_triplets
+
+        # incidence matrices between objects of triplets and triplets.
+        # consumed items are added and unseen items are subtracted.
+        index = np.arange(n_triplets)
+        ones = np.ones(n_triplets, dtype=float)
+        uniq_users, user_index = np.unique(users, return_inverse=True)
+        uniq_items, item_index = np.unique(
+            np.r_[items, neg_items], return_inverse=True)
+        user_incidence = sparse.csr_matrix(
+            (ones, (user_index, index)),
+            shape=(uniq_users.shape[0], n_triplets))
+        item_incidence = sparse.csr_matrix(
+            (np.r_[ones, -ones], (item_index, np.r_[index, index])),
+            shape=(uniq_items.shape[0], n_triplets))
+
+        # gradient of loss term and regularization term
+        grad_bi = (item_incidence.dot(common_term) +
+                   self._reg * bi[uniq_items])
+        grad_p = (user_incidence.dot(common_term[:, np.newaxis] * q_diff) +
+                  self._reg * p[uniq_users, :])
+        grad_q = (
+            item_incidence.dot(common_term[:, np.newaxis] * p[users, :]) +
+            self._reg * q[uniq_items, :])
+
+        index = np.r_[
+            offset['bi'] + uniq_items,
+            (offset['p'] + uniq_users[:, np.newaxis] * k +
+             np.arange(k)).ravel(),
+            (offset['q'] + uniq_items[:, np.newaxis] * k +
+             np.arange(k)).ravel()]
+        grad = np.r_[grad_bi, grad_p.ravel(), grad_q.ravel()]
+
+        return index, grad
+
+    def fit(self, data, event_index=(0, 1)):
+        """
+        fitting model
+
+        Parameters
+        ----------
+        data : :class:`kamrecsys.data.EventData`
+            data to fit
+        event_index : optional, array-like, shape=(2,), dtype=int 
+            Index to specify the column numbers specifing a user and an item
+            in an event array 
+            (default=(0, 1))
+        """
+
+        # call super class
+        super(ImplicitBPR, self).fit(data, event_index)
+
+        # get input data
+        ev, n_objects = self.get_event_array('csr')
+
+        # initialize coefficients
+        self._init_coef(ev, n_objects)
+
+        # check optimization parameters
+        optimizer_kwargs = self.optimizer_kwargs.copy()
+        optimizer_method = optimizer_kwargs.pop('method', 'sgd')
+        if optimizer_method not in STOCHASTIC_METHODS:
+            raise ValueError(
+                "Unknown stochastic method: " + str(optimizer_method))
+        if optimizer_method == 'sgd':
+            optimizer_kwargs.setdefault(
+                'learning_rate',
+                0.05 * optimizer_kwargs.get('batch_size', 1000))
+
+        # sorted keys of positive events, and triplets to monitor a loss
+        users, items = ev.nonzero()
+        pos_keys = np.unique(users * n_objects[1] + items)
+        tev = self._sample_triplets(pos_keys, n_objects, pos_keys.shape[0])
+
+        # optimize model
+        res = minimize_stochastic(
+            fun=self.loss,
+            x0=self._coef,
+            event_args=(tev,),
+            args=(n_objects,),
+            method=optimizer_method,
+            jac=self.sparse_grad_loss,
+            sparse_jac=True,
+            batch_sampler=lambda n: (
+                self._sample_triplets(pos_keys, n_objects, n),),
+            **optimizer_kwargs)
+
+        # get parameters
+        self._coef[:] = res.x
+
+        # add parameters for unknown users and items
+        self.mu_ = self._coef.view(self._dt)['mu'][0].copy()
+        self.bu_ = np.r_[self._coef.view(self._dt)['bu'][0], 0.0]
+        self.bi_ = np.r_[self._coef.view(self._dt)['bi'][0], 0.0]
+        self.p_ = np.r_[self._coef.view(self._dt)['p'][0],
+                        np.zeros((1, self.k), dtype=float)]
+        self.q_ = np.r_[self._coef.view(self._dt)['q'][0],
+                        np.zeros((1, self.k), dtype=float)]
+
+        # store fitting results
+        self.fit_results_['initial_loss'] = res.epoch_losses[0]
+        self.fit_results_['n_users'] = n_objects[0]
+        self.fit_results_['n_items'] = n_objects[1]
+        self.fit_results_['n_events'] = self.n_events
+        self.fit_results_['n_parameters'] = self._coef.size
+        self.fit_results_['success'] = res.success
+        self.fit_results_['status'] = res.status
+        self.fit_results_['message'] = res.message
+        self.fit_results_['final_loss'] = res.fun
+        self.fit_results_['n_iterations'] = res.nit
+        self.fit_results_['func_calls'] = res.nfev
+        self.fit_results_['grad_calls'] = res.njev
+        self.fit_results_['optimizer_method'] = optimizer_method
+        self.fit_results_['optimizer_kwargs'] = optimizer_kwargs
+        self.fit_results_['epoch_losses'] = res.epoch_losses
+
+        # clean up temporary instance variables
+        self.remove_data()
+        self._coef = None
+        self._dt = None
+        self._reg = 1.0
+
+    def raw_predict(self, ev):
+        """
+        predict score of given one event represented by internal ids
+
+        Parameters
+        ----------
+        (user, item) : array_like
+            a target user's and item's ids. unknown objects assumed to be
+            represented by n_object[event_otype]
+
+        Returns
+        -------
+        sc : float
+            score for a target pair of user and item
+
+        Raises
+        ------
+        TypeError
+            shape of an input array is illegal
+        """
+
+        sc = sigmoid(
+            self.mu_[0] + self.bu_[ev[:, 0]] + self.bi_[ev[:, 1]] +
+            np.sum(self.p_[ev[:, 0], :] * self.q_[ev[:, 1], :], axis=1))
+
+        return sc
+
+
+# =============================================================================
+# Functions
+# =============================================================================
+
+
+def _solve_implicit_block(x, w, y, indptr, gram, base, lam, out,
+                          cg_steps=None):
+    """
+    Solve weighted ridge regression problems of a block of objects
+
+    The coefficient matrix of the j-th object is
+    ``gram + lam * I + sum_e w[e] * x[e] x[e]^T`` and its right-hand side is
+    ``base + sum_e y[e] * x[e]`` , where ``e`` runs over events of the
+    object.
+
+    Parameters
+    ----------
+    x : array, shape(n_block_events, d)
+        explanatory variables of events sorted by objects
+    w : array, shape(n_block_events,)
+        additional weights of events
+    y : array, shape(n_block_events,)
+        weighted targets of events
+    indptr : array, shape(n_block_objects + 1,), dtype=int
+        events of the j-th object are ``x[indptr[j]:indptr[j + 1]]``
+    gram : array, shape(d, d)
+        a matrix shared by all objects
+    base : array, shape(d,)
+        a right-hand side shared by all objects
+    lam : float
+        a regularization parameter
+    out : array, shape(n_block_objects, d)
+        current solutions, which are used as initial values of conjugate
+        gradient methods.  solutions are stored.
+    cg_steps : int, optional
+        if specified, problems are approximately solved by this number of
+        steps of conjugate gradient methods.  Otherwise, exactly solved.
+    """
+    d = x.shape[1]
+    n_objects = indptr.shape[0] - 1
+    counts = np.diff(indptr)
+    nonempty = counts > 0
+    starts = indptr[:-1][nonempty]
+
+    # right-hand sides
+    b = np.tile(base, (n_objects, 1))
+    if starts.shape[0] > 0:
+        b[nonempty] += np.add.reduceat(x * y[:, np.newaxis], starts, axis=0)
+
+    if cg_steps is None:
+        a = np.tile(gram + lam * np.identity(d), (n_objects, 1, 1))
+        if starts.shape[0] > 0:
+            _add_gram_block(a, nonempty, x, starts, w)
+        out[:, :] = np.linalg.solve(a, b[:, :, np.newaxis])[:, :, 0]
+        return
+
+    # products of coefficient matrices and vectors without forming matrices
+    objects = np.repeat(np.arange(n_objects), counts)
+
+    def matvec(v):
+        av = np.dot(v, gram) + lam * v
+        if starts.shape[0] > 0:
+            wxv = w * np.sum(x * v[objects, :], axis=1)
+            av[nonempty] += np.add.reduceat(
+                x * wxv[:, np.newaxis], starts, axis=0)
+        return av
+
+    # conjugate gradient steps of all objects at once
+    r = b - matvec(out)
+    direction = r.copy()
+    rr = np.sum(r ** 2, axis=1)
+    for i in xrange(cg_steps):
+        ad = matvec(direction)
+        dad = np.sum(direction * ad, axis=1)
+        step = np.where(dad > 0.0, rr / np.where(dad > 0.0, dad, 1.0), 0.0)
+        out += step[:, np.newaxis] * direction
+        r -= step[:, np.newaxis] * ad
+        new_rr = np.sum(r ** 2, axis=1)
+        beta = np.where(rr > 0.0, new_rr / np.where(rr > 0.0, rr, 1.0), 0.0)
+        direction *= beta[:, np.newaxis]
+        direction += r
+        rr = new_rr
+
 
 # =============================================================================
 # Module initialization
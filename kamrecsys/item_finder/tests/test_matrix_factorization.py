@@ -29,10 +29,13 @@ from numpy.testing import (
 import numpy as np
 
 from scipy import sparse as sparse
+from scipy.optimize import check_grad
 from sklearn.utils import check_random_state
 
+from kamrecsys.data import EventData, EventWithScoreData
 from kamrecsys.datasets import load_movielens_mini
-from kamrecsys.item_finder import LogisticPMF, ImplicitLogisticPMF
+from kamrecsys.item_finder import (
+    LogisticPMF, ImplicitLogisticPMF, ImplicitALS, ImplicitBPR)
 
 # =============================================================================
 # Module variables
@@ -256,6 +259,105 @@ class TestLogisticPMF(TestCase):
             grad[-4:], [0.0038126227, 0.0014808065, 0.206424416, 0.0683328493],
             rtol=1e-5)
 
+    def test_init_coef(self):
+
+        rng = check_random_state(1234)
+        ev = np.c_[rng.randint(30, size=400), rng.randint(20, size=400)]
+        sc = rng.randint(2, size=400).astype(float)
+        rec = LogisticPMF(C=0.1, k=2, random_state=1234)
+        rec._rng = check_random_state(rec.random_state)
+        rec._init_coef(ev, sc, np.array([31, 20]))
+
+        mu = np.mean(sc)
+        assert_allclose(rec.mu_[0], mu)
+        assert_allclose(rec.bu_[3], np.mean(sc[ev[:, 0] == 3] - mu))
+        j = ev[:, 1] == 5
+        assert_allclose(
+            rec.bi_[5], np.mean(sc[j] - mu - rec.bu_[ev[j, 0]]))
+        assert_equal(rec.bu_[30], 0.0)
+        assert_array_equal(rec.p_[30, :], 0.0)
+
+    def test_loss_and_grad(self):
+
+        rng = check_random_state(1234)
+        ev = np.c_[rng.randint(30, size=400), rng.randint(20, size=400)]
+        sc = rng.randint(2, size=400).astype(float)
+        n_objects = np.array([30, 20])
+        rec = LogisticPMF(C=0.1, k=2, random_state=1234)
+        rec._rng = check_random_state(rec.random_state)
+        rec._init_coef(ev, sc, n_objects)
+
+        for i in xrange(3):
+            coef = rng.normal(size=rec._coef.shape)
+            loss, grad = rec.loss_and_grad(coef, ev, sc, n_objects)
+            assert_allclose(loss, rec.loss(coef, ev, sc, n_objects))
+            assert_allclose(grad, rec.grad_loss(coef, ev, sc, n_objects))
+
+        # numerical gradient by sparse incidence matrices
+        assert_(check_grad(
+            rec.loss, rec.grad_loss, coef, ev, sc, n_objects) < 1e-6)
+        users, items = rec._get_incidence(ev, n_objects)
+        assert_equal(users.shape, (30, 400))
+        assert_array_equal(
+            items.indices, np.argsort(ev[:, 1], kind='mergesort'))
+
+    def test_stochastic(self):
+
+        rng = check_random_state(1234)
+        event = np.c_[rng.randint(30, size=400), rng.randint(20, size=400)]
+        data = EventWithScoreData()
+        data.set_event(
+            event, rng.randint(2, size=400), score_domain=(0, 1, 1))
+
+        rec = LogisticPMF(
+            C=0.1, k=2, random_state=1234, method='adam', maxiter=10,
+            batch_size=50)
+        rec.fit(data)
+        losses = rec.fit_results_['epoch_losses']
+        assert_equal(len(losses), 11)
+        assert_(losses[-1] < losses[0])
+        assert_array_less(0.0, rec.predict(data.to_eid_event(event[:5])))
+
+    def test_sparse_grad_loss(self):
+
+        rng = check_random_state(1234)
+        event = np.c_[rng.randint(30, size=400), rng.randint(20, size=400)]
+        data = EventWithScoreData()
+        data.set_event(
+            event, rng.randint(2, size=400), score_domain=(0, 1, 1))
+        ev = data.event[:50]
+        sc = data.score[:50]
+
+        rec = LogisticPMF(C=0.1, k=2, random_state=1234)
+        rec._rng = check_random_state(rec.random_state)
+        rec._init_coef(data.event, data.score, data.n_objects)
+        coef = rng.normal(size=rec._coef.shape)
+
+        # equal to a dense gradient of a loss term at objects in events
+        rec._reg = 0.0
+        index, grad = rec.sparse_grad_loss(coef, ev, sc, data.n_objects)
+        assert_allclose(
+            grad, rec.grad_loss(coef, ev, sc, data.n_objects)[index])
+        rec._reg = 0.1 / (rec._coef.shape[0] - 1)
+
+        # the mean of gradients of minibatches partitioning all events is a
+        # full gradient, though only objects in minibatches are regularized
+        mean_grad = np.zeros_like(coef)
+        for batch in np.split(rng.permutation(data.n_events), 8):
+            batch_index, batch_grad = rec.sparse_grad_loss(
+                coef, data.event[batch], data.score[batch], data.n_objects)
+            mean_grad[batch_index] += batch_grad / 8
+        assert_allclose(
+            mean_grad,
+            rec.grad_loss(coef, data.event, data.score, data.n_objects))
+
+        # the size of a gradient does not depend on the numbers of objects
+        n_objects = data.n_objects + [1000, 2000]
+        rec._init_coef(data.event, data.score, n_objects)
+        large_index, large_grad = rec.sparse_grad_loss(
+            rec._coef, ev, sc, n_objects)
+        assert_equal(large_index.shape, index.shape)
+
     def test_class(self):
 
         data = load_movielens_mini()
@@ -519,6 +621,123 @@ class TestImplicitLogisticPMF(TestCase):
             [0.1678131716, 0.0514809763, 0.2142578479, 0.0641662329],
             rtol=1e-5)
 
+    def test_loss_and_grad(self):
+
+        rng = check_random_state(1234)
+        ev = sparse.csr_matrix(
+            (rng.rand(30, 20) < 0.2).astype(float))
+        n_objects = np.array([30, 20])
+        rec = ImplicitLogisticPMF(C=0.1, k=2, random_state=1234)
+        rec._rng = check_random_state(rec.random_state)
+        rec._init_coef(ev, n_objects)
+
+        for i in xrange(3):
+            coef = rng.normal(size=rec._coef.shape)
+            loss, grad = rec.loss_and_grad(coef, ev, n_objects)
+            assert_allclose(loss, rec.loss(coef, ev, n_objects))
+            assert_allclose(grad, rec.grad_loss(coef, ev, n_objects))
+
+    def test_block_size(self):
+
+        rng = check_random_state(1234)
+        ev = sparse.csr_matrix(
+            (rng.rand(30, 20) < 0.2).astype(float))
+        n_objects = np.array([30, 20])
+        rec = ImplicitLogisticPMF(C=0.1, k=2, random_state=1234)
+        rec._rng = check_random_state(rec.random_state)
+        rec._init_coef(ev, n_objects)
+        coef = rng.normal(size=rec._coef.shape)
+
+        # loss of all pairs computed densely
+        mu = coef.view(rec._dt)['mu'][0]
+        bu = coef.view(rec._dt)['bu'][0]
+        bi = coef.view(rec._dt)['bi'][0]
+        p = coef.view(rec._dt)['p'][0]
+        q = coef.view(rec._dt)['q'][0]
+        esc = 1.0 / (1.0 + np.exp(
+            -(mu[0] + bu[:, np.newaxis] + bi[np.newaxis, :] + p.dot(q.T))))
+        sc = ev.toarray()
+        loss = -np.mean(sc * np.log(esc) + (1.0 - sc) * np.log(1.0 - esc))
+        loss += 0.5 * rec._reg * (
+            np.sum(bu ** 2) + np.sum(bi ** 2) +
+            np.sum(p ** 2) + np.sum(q ** 2))
+
+        grad = None
+        for block_size in [1, 7, 30, 100, None]:
+            rec.block_size = block_size
+            block_loss, block_grad = rec.loss_and_grad(coef, ev, n_objects)
+            assert_allclose(block_loss, loss)
+            assert_allclose(rec.loss(coef, ev, n_objects), loss)
+            if grad is None:
+                grad = block_grad
+            assert_allclose(block_grad, grad)
+        assert_(check_grad(
+            lambda x: rec.loss(x, ev, n_objects),
+            lambda x: rec.grad_loss(x, ev, n_objects),
+            coef) < 1e-6)
+
+        with assert_raises(ValueError):
+            ImplicitLogisticPMF(block_size=0)
+
+    def test_negative_sampling(self):
+
+        rng = check_random_state(1234)
+        ev = rng.rand(30, 20) < 0.2
+        ev[np.arange(30), np.arange(30) % 20] = True
+        ev = sparse.csr_matrix(ev.astype(float))
+        n_objects = np.array([30, 20])
+        n_positives = ev.count_nonzero()
+
+        rec = ImplicitLogisticPMF(C=0.1, k=2, random_state=1234, n_negatives=2)
+        rec._rng = check_random_state(rec.random_state)
+        rec._init_coef(ev, n_objects)
+        sev, ssc, weight = rec._sample_negatives(ev, n_objects)
+        assert_equal(np.sum(ssc), n_positives)
+        assert_equal(sev.shape[0], 3 * n_positives)
+        assert_array_equal(
+            np.asarray(ev[sev[:, 0], sev[:, 1]]).ravel(), ssc)
+        assert_allclose(np.sum(weight), 30 * 20)
+
+        # the expectation of the sampled loss is the loss of all events
+        coef = rng.normal(scale=0.5, size=rec._coef.shape)
+        loss = np.mean([
+            rec.sampled_loss_and_grad(
+                coef, *(rec._sample_negatives(ev, n_objects) +
+                        (n_objects,)))[0]
+            for i in xrange(100)])
+        assert_allclose(loss, rec.loss(coef, ev, n_objects), rtol=1e-2)
+
+        # gradient
+        sev, ssc, weight = rec._sample_negatives(ev, n_objects)
+        assert_(check_grad(
+            lambda x: rec.sampled_loss_and_grad(
+                x, sev, ssc, weight, n_objects)[0],
+            lambda x: rec.sampled_loss_and_grad(
+                x, sev, ssc, weight, n_objects)[1],
+            coef) < 1e-6)
+
+        # popularity sampling
+        rec.sampling = 'popularity'
+        sev, ssc, weight = rec._sample_negatives(ev, n_objects)
+        assert_array_equal(
+            np.asarray(ev[sev[:, 0], sev[:, 1]]).ravel(), ssc)
+        assert_(np.all(np.asarray(ev.sum(axis=0)).ravel()[sev[:, 1]] > 0))
+
+        # fit
+        data = EventData()
+        data.set_event(np.c_[ev.nonzero()])
+        rec = ImplicitLogisticPMF(
+            C=0.1, k=2, random_state=1234, n_negatives=2, maxiter=20)
+        rec.fit(data)
+        assert_equal(rec.fit_results_['n_sampled_events'], 3 * n_positives)
+        assert_(rec.fit_results_['final_loss'] <
+                rec.fit_results_['initial_loss'])
+
+        with assert_raises(ValueError):
+            ImplicitLogisticPMF(n_negatives=0)
+        with assert_raises(ValueError):
+            ImplicitLogisticPMF(n_negatives=1, sampling='adaptive')
+
     def test_class(self):
 
         # setup
@@ -567,6 +786,254 @@ class TestImplicitLogisticPMF(TestCase):
             rtol=1e-5)
 
 
+class TestImplicitALS(TestCase):
+
+    def test_loss(self):
+
+        rng = check_random_state(1234)
+        sc = (rng.rand(30, 20) < 0.2).astype(float)
+        sc[0, 0] = 3.0
+        ev = sparse.csr_matrix(sc)
+        n_objects = np.array([30, 20])
+        rec = ImplicitALS(C=0.1, k=2, alpha=2.0, random_state=1234)
+        rec._rng = check_random_state(rec.random_state)
+        rec._init_coef(ev, n_objects)
+        coef = rng.normal(size=rec._coef.shape)
+
+        # loss of all pairs computed densely
+        mu = coef.view(rec._dt)['mu'][0]
+        bu = coef.view(rec._dt)['bu'][0]
+        bi = coef.view(rec._dt)['bi'][0]
+        p = coef.view(rec._dt)['p'][0]
+        q = coef.view(rec._dt)['q'][0]
+        esc = mu[0] + bu[:, np.newaxis] + bi[np.newaxis, :] + p.dot(q.T)
+        loss = np.mean((1.0 + 2.0 * sc) * ((sc > 0) - esc) ** 2)
+        loss += 0.5 * rec._reg * (
+            np.sum(bu ** 2) + np.sum(bi ** 2) +
+            np.sum(p ** 2) + np.sum(q ** 2))
+        assert_allclose(rec.loss(coef, ev, n_objects), loss)
+
+    def test_solve_implicit_block(self):
+        from kamrecsys.item_finder.matrix_factorization import (
+            _solve_implicit_block)
+
+        # objects having many or few events
+        rng = check_random_state(1234)
+        indptr = np.r_[0, np.cumsum([0, 1, 3, 4, 10, 2, 0, 7])]
+        x = rng.randn(indptr[-1], 4)
+        w = rng.rand(indptr[-1])
+        y = rng.randn(indptr[-1])
+        gram = np.dot(x.T, x)
+        base = rng.randn(4)
+
+        expected = np.empty((indptr.shape[0] - 1, 4))
+        for j in xrange(indptr.shape[0] - 1):
+            xj = x[indptr[j]:indptr[j + 1]]
+            wj = w[indptr[j]:indptr[j + 1]]
+            yj = y[indptr[j]:indptr[j + 1]]
+            expected[j] = np.linalg.solve(
+                gram + 0.5 * np.identity(4) + np.dot(xj.T * wj, xj),
+                base + np.dot(yj, xj))
+
+        out = np.zeros((indptr.shape[0] - 1, 4))
+        _solve_implicit_block(x, w, y, indptr, gram, base, 0.5, out)
+        assert_allclose(out, expected)
+
+        # conjugate gradient methods converge in d steps
+        out = np.zeros((indptr.shape[0] - 1, 4))
+        _solve_implicit_block(
+            x, w, y, indptr, gram, base, 0.5, out, cg_steps=4)
+        assert_allclose(out, expected, rtol=1e-6, atol=1e-8)
+
+    def test_als_half_sweep(self):
+
+        rng = check_random_state(1234)
+        ev = sparse.csr_matrix((rng.rand(30, 20) < 0.2).astype(float))
+        n_objects = np.array([30, 20])
+
+        for solver in ['direct', 'cg']:
+            rec = ImplicitALS(
+                C=0.1, k=2, alpha=2.0, solver=solver, cg_steps=10,
+                random_state=1234)
+            rec._rng = check_random_state(rec.random_state)
+            rec._init_coef(ev, n_objects)
+            mu = rec._coef.view(rec._dt)['mu'][0]
+            bu = rec._coef.view(rec._dt)['bu'][0]
+            bi = rec._coef.view(rec._dt)['bi'][0]
+            p = rec._coef.view(rec._dt)['p'][0]
+            q = rec._coef.view(rec._dt)['q'][0]
+
+            # updated parameters of users minimize the loss
+            wu = np.c_[bu, p]
+            rec._als_half_sweep(
+                ev, np.c_[np.ones(n_objects[1]), q], mu[0] + bi, wu)
+            bu[:] = wu[:, 0]
+            p[:, :] = wu[:, 1:]
+            loss = rec.loss(rec._coef, ev, n_objects)
+            for i in xrange(5):
+                coef = rec._coef.copy()
+                coef[1:1 + n_objects[0]] += rng.normal(
+                    scale=0.01, size=n_objects[0])
+                assert_array_less(loss, rec.loss(coef, ev, n_objects))
+
+        with assert_raises(ValueError):
+            ImplicitALS(solver='cholesky')
+        with assert_raises(ValueError):
+            ImplicitALS(solver='cg', cg_steps=0)
+
+    def test_fit(self):
+
+        rng = check_random_state(1234)
+        data = EventData()
+        data.set_event(np.c_[(rng.rand(30, 20) < 0.2).nonzero()])
+
+        results = {}
+        for solver in ['direct', 'cg']:
+            rec = ImplicitALS(
+                C=0.1, k=2, solver=solver, random_state=1234, maxiter=20)
+            rec.fit(data)
+            assert_(rec.fit_results_['final_loss'] <
+                    rec.fit_results_['initial_loss'])
+            assert_equal(rec.fit_results_['optimizer_method'], 'als')
+            assert_equal(rec.p_.shape, (data.n_objects[0] + 1, 2))
+            assert_equal(rec.q_.shape, (data.n_objects[1] + 1, 2))
+            results[solver] = rec.fit_results_['final_loss']
+        assert_allclose(results['cg'], results['direct'], rtol=1e-2)
+
+        # positive events are preferred to random pairs
+        x = np.c_[data.event[:, 0], rng.randint(20, size=data.n_events)]
+        assert_(np.mean(rec.raw_predict(data.event)) >
+                np.mean(rec.raw_predict(x)))
+
+
+class TestImplicitBPR(TestCase):
+
+    def test_sample_triplets(self):
+
+        rng = check_random_state(1234)
+        sc = rng.rand(30, 20) < 0.2
+        sc[0, :-1] = True
+        ev = sparse.csr_matrix(sc.astype(float))
+        n_objects = np.array([30, 20])
+        users, items = ev.nonzero()
+        pos_keys = np.unique(users * n_objects[1] + items)
+
+        rec = ImplicitBPR(C=0.1, k=2, random_state=1234)
+        rec._rng = check_random_state(rec.random_state)
+        tev = rec._sample_triplets(pos_keys, n_objects, 1000)
+
+        # collisions of a user who consumed almost all items are dropped
+        assert_array_less(800, tev.shape[0])
+        assert_array_less(tev.shape[0], 1000)
+        assert_(np.all(sc[tev[:, 0], tev[:, 1]]))
+        assert_(not np.any(sc[tev[:, 0], tev[:, 2]]))
+        assert_array_equal(tev[tev[:, 0] == 0, 2], 19)
+
+    def test_loss(self):
+
+        rng = check_random_state(1234)
+        ev = sparse.csr_matrix((rng.rand(30, 20) < 0.2).astype(float))
+        n_objects = np.array([30, 20])
+        users, items = ev.nonzero()
+        pos_keys = np.unique(users * n_objects[1] + items)
+
+        rec = ImplicitBPR(C=0.1, k=2, random_state=1234)
+        rec._rng = check_random_state(rec.random_state)
+        rec._init_coef(ev, n_objects)
+        tev = rec._sample_triplets(pos_keys, n_objects, 100)
+        coef = rng.normal(size=rec._coef.shape)
+
+        # loss of triplets computed one by one
+        bu = coef.view(rec._dt)['bu'][0]
+        bi = coef.view(rec._dt)['bi'][0]
+        p = coef.view(rec._dt)['p'][0]
+        q = coef.view(rec._dt)['q'][0]
+        loss = 0.0
+        for u, i, j in tev:
+            loss -= np.log(1.0 / (1.0 + np.exp(
+                -(bi[i] - bi[j] + np.dot(p[u], q[i] - q[j])))))
+        loss /= tev.shape[0]
+        loss += 0.5 * rec._reg * (
+            np.sum(bu ** 2) + np.sum(bi ** 2) +
+            np.sum(p ** 2) + np.sum(q ** 2))
+        assert_allclose(rec.loss(coef, tev, n_objects), loss)
+
+        # gradient
+        assert_(check_grad(
+            lambda x: rec.loss(x, tev, n_objects),
+            lambda x: rec.grad_loss(x, tev, n_objects),
+            coef) < 1e-6)
+
+    def test_sparse_grad_loss(self):
+
+        rng = check_random_state(1234)
+        ev = sparse.csr_matrix((rng.rand(30, 20) < 0.2).astype(float))
+        n_objects = np.array([30, 20])
+        users, items = ev.nonzero()
+        pos_keys = np.unique(users * n_objects[1] + items)
+
+        rec = ImplicitBPR(C=0.1, k=2, random_state=1234)
+        rec._rng = check_random_state(rec.random_state)
+        rec._init_coef(ev, n_objects)
+        tev = rec._sample_triplets(pos_keys, n_objects, 10)
+        coef = rng.normal(size=rec._coef.shape)
+
+        # equal to a dense gradient at parameters of objects in triplets
+        index, grad = rec.sparse_grad_loss(coef, tev, n_objects)
+        assert_equal(np.unique(index).shape, index.shape)
+        assert_allclose(grad, rec.grad_loss(coef, tev, n_objects)[index])
+
+        # the size of a gradient does not depend on the numbers of objects
+        large_n_objects = n_objects + [1000, 2000]
+        large_ev = ev.copy()
+        large_ev.resize(tuple(large_n_objects))
+        rec._init_coef(large_ev, large_n_objects)
+        large_index, large_grad = rec.sparse_grad_loss(
+            rec._coef, tev, large_n_objects)
+        assert_equal(large_index.shape, index.shape)
+
+    def test_fit(self):
+
+        rng = check_random_state(1234)
+        data = EventData()
+        data.set_event(np.c_[(rng.rand(30, 20) < 0.2).nonzero()])
+
+        rec = ImplicitBPR(C=0.1, k=2, random_state=1234, maxiter=20,
+                          batch_size=50)
+        rec.fit(data)
+        assert_(rec.fit_results_['final_loss'] <
+                rec.fit_results_['initial_loss'])
+        assert_equal(len(rec.fit_results_['epoch_losses']), 21)
+        assert_equal(rec.fit_results_['n_iterations'], 20)
+        assert_equal(rec.mu_, [0.0])
+        assert_array_equal(rec.bu_, 0.0)
+        assert_equal(rec.p_.shape, (data.n_objects[0] + 1, 2))
+        assert_equal(rec.q_.shape, (data.n_objects[1] + 1, 2))
+        assert_array_equal(rec.p_[-1, :], 0.0)
+
+        # positive events are ranked above random pairs
+        x = np.c_[data.event[:, 0], rng.randint(20, size=data.n_events)]
+        assert_(np.mean(rec.raw_predict(data.event)) >
+                np.mean(rec.raw_predict(x)))
+
+        # other stochastic methods
+        for method in ['momentum', 'adagrad', 'adam']:
+            rec = ImplicitBPR(C=0.1, k=2, random_state=1234, maxiter=20,
+                              batch_size=50, method=method)
+            rec.fit(data)
+            assert_equal(rec.fit_results_['optimizer_method'], method)
+            assert_(rec.fit_results_['final_loss'] <
+                    rec.fit_results_['initial_loss'])
+
+        with assert_raises(ValueError):
+            ImplicitBPR(method='CG').fit(data)
+        assert_array_less(0.0, rec.raw_predict(x))
+        assert_array_less(rec.raw_predict(x), 1.0)
+
+        with assert_raises(ValueError):
+            ImplicitBPR(batch_size=0).fit(data)
+
+
 # =============================================================================
 # Main Routines
 # =============================================================================
@@ -18,6 +18,9 @@ from six.moves import xrange
 import logging
 
 from .group import interlace_group
+from .temporal import (
+    temporal_split_index,
+    leave_last_n_index)
 
 # =============================================================================
 # Metadata variables
@@ -28,7 +31,9 @@ from .group import interlace_group
 # =============================================================================
 
 __all__ = [
-    'interlace_group']
+    'interlace_group',
+    'temporal_split_index',
+    'leave_last_n_index']
 
 # =============================================================================
 # Constants
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Temporal splits of events
+
+Events are split based on an event feature, such as ``timestamp`` .  These
+functions return indexes of events, which can be passed to
+:meth:`kamrecsys.data.EventData.filter_event` .
+"""
+
+from __future__ import (
+    print_function,
+    division,
+    absolute_import,
+    unicode_literals)
+from six.moves import xrange
+
+# =============================================================================
+# Imports
+# =============================================================================
+
+import logging
+
+import numpy as np
+
+# =============================================================================
+# Metadata variables
+# =============================================================================
+
+# =============================================================================
+# Public symbols
+# =============================================================================
+
+__all__ = []
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+# =============================================================================
+# Variables
+# =============================================================================
+
+# =============================================================================
+# Functions
+# =============================================================================
+
+
+def temporal_split_index(data, cutoff, field='timestamp'):
+    """
+    Split events into the ones before and after a cutoff
+
+    Parameters
+    ----------
+    data : :class:`kamrecsys.data.EventData`
+        data whose events have features
+    cutoff : scalar
+        events whose feature values are smaller than this are assigned to a
+        training set, and the others are assigned to a test set.
+    field : str or None
+        the name of a field of event features (default='timestamp')
+
+    Returns
+    -------
+    train_index : array, dtype=int
+        sorted indexes of training events
+    test_index : array, dtype=int
+        sorted indexes of test events
+    """
+    order, sorted_values = data.get_event_feature_order(field)
+    pos = np.searchsorted(sorted_values, cutoff, side='left')
+
+    return np.sort(order[:pos]), np.sort(order[pos:])
+
+
+def leave_last_n_index(data, n=1, field='timestamp'):
+    """
+    Split events so that the last `n` events of each user are tested
+
+    Users are the objects of the first element of events.  If a user has
+    `n` or fewer events, all of them are assigned to a test set.
+
+    Parameters
+    ----------
+    data : :class:`kamrecsys.data.EventData`
+        data whose events have features
+    n : optional, int
+        the number of test events of each user (default=1)
+    field : str or None
+        the name of a field of event features (default='timestamp')
+
+    Returns
+    -------
+    train_index : array, dtype=int
+        sorted indexes of training events
+    test_index : array, dtype=int
+        sorted indexes of test events
+    """
+    n = int(n)
+    if n < 1:
+        raise ValueError('n must be larger or equal than 1.')
+
+    # sort events by users, and then by feature values
+    order, sorted_values = data.get_event_feature_order(field)
+    user = data.event[:, 0]
+    order = order[np.argsort(user[order], kind='mergesort')]
+
+    # events whose ranks counted from the last of each user are less than n
+    sorted_user = user[order]
+    is_end = np.empty(order.shape[0], dtype=bool)
+    is_end[-1:] = True
+    np.not_equal(sorted_user[1:], sorted_user[:-1], out=is_end[:-1])
+    ends = np.flatnonzero(is_end) + 1
+    counts = np.diff(np.r_[0, ends])
+    rank = np.repeat(ends, counts) - np.arange(order.shape[0]) - 1
+    is_test = np.zeros(order.shape[0], dtype=bool)
+    is_test[order] = rank < n
+
+    return np.flatnonzero(~is_test), np.flatnonzero(is_test)
+
+
+# =============================================================================
+# Classes
+# =============================================================================
+
+# =============================================================================
+# Module initialization
+# =============================================================================
+
+# init logging system
+logger = logging.getLogger('kamrecsys')
+if not logger.handlers:
+    logger.addHandler(logging.NullHandler())
+
+# =============================================================================
+# Test routine
+# =============================================================================
+
+
+def _test():
+    """ test function for this module
+    """
+
+    # perform doctest
+    import sys
+    import doctest
+
+    doctest.testmod()
+
+    sys.exit(0)
+
+
+# Check if this is call as command script
+
+if __name__ == '__main__':
+    _test()
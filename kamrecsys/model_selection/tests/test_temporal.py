@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import (
+    print_function,
+    division,
+    absolute_import,
+    unicode_literals)
+from six.moves import xrange
+
+# =============================================================================
+# Imports
+# =============================================================================
+
+from numpy.testing import (
+    TestCase,
+    run_module_suite,
+    assert_,
+    assert_allclose,
+    assert_array_almost_equal_nulp,
+    assert_array_max_ulp,
+    assert_array_equal,
+    assert_array_less,
+    assert_equal,
+    assert_raises,
+    assert_raises_regex,
+    assert_warns,
+    assert_string_equal)
+import numpy as np
+
+from kamrecsys.data import EventWithScoreData
+from kamrecsys.model_selection import leave_last_n_index, temporal_split_index
+
+# =============================================================================
+# Variables
+# =============================================================================
+
+# =============================================================================
+# Functions
+# =============================================================================
+
+
+def load_test_data():
+    data = EventWithScoreData()
+    data.set_event(
+        [[1, 10], [3, 10], [1, 20], [5, 20], [3, 30], [1, 30], [3, 20]],
+        [1., 2., 3., 4., 5., 1., 2.],
+        event_feature=np.array(
+            [(50,), (10,), (30,), (20,), (40,), (10,), (70,)],
+            dtype=[('timestamp', int)]))
+    return data
+
+
+# =============================================================================
+# Test Classes
+# =============================================================================
+
+
+class TestTemporalSplitIndex(TestCase):
+
+    def test_function(self):
+        data = load_test_data()
+
+        train_i, test_i = temporal_split_index(data, 30)
+        assert_array_equal(train_i, [1, 3, 5])
+        assert_array_equal(test_i, [0, 2, 4, 6])
+
+        train_i, test_i = temporal_split_index(data, 0)
+        assert_array_equal(train_i, [])
+        assert_array_equal(test_i, np.arange(7))
+
+
+class TestLeaveLastNIndex(TestCase):
+
+    def test_function(self):
+        data = load_test_data()
+
+        train_i, test_i = leave_last_n_index(data)
+        assert_array_equal(train_i, [1, 2, 4, 5])
+        assert_array_equal(test_i, [0, 3, 6])
+
+        train_i, test_i = leave_last_n_index(data, n=2)
+        assert_array_equal(train_i, [1, 5])
+        assert_array_equal(test_i, [0, 2, 3, 4, 6])
+
+        with assert_raises(ValueError):
+            leave_last_n_index(data, n=0)
+
+
+# =============================================================================
+# Main Routine
+# =============================================================================
+
+if __name__ == '__main__':
+    run_module_suite()
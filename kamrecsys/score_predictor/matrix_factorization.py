@@ -19,12 +19,18 @@ from six.moves import xrange
 # =============================================================================
 
 import logging
+import multiprocessing
 import sys
+from multiprocessing.pool import ThreadPool
+
 import numpy as np
-from scipy.optimize import minimize
+from scipy import sparse
+from scipy.optimize import minimize, OptimizeResult
 from sklearn.utils import check_random_state
 
 from . import BaseScorePredictor
+from ..utils import get_fit_status_message, minimize_stochastic
+from ..utils.optimize import STOCHASTIC_METHODS
 
 # =============================================================================
 # Public symbols
@@ -36,6 +42,10 @@ __all__ = []
 # Constants
 # =============================================================================
 
+# the maximum number of floats in work spaces of a block of objects in an
+# ALS half-sweep
+ALS_BLOCK_ELEMENTS = 4194304
+
 # =============================================================================
 # Module variables
 # =============================================================================
@@ -57,8 +67,21 @@ class PMF(BaseScorePredictor):
     k : int, optional
         the number of latent factors (= sizes of :math:`\mathbf{p}_u` or
         :math:`\mathbf{q}_i`), default=1
+    n_jobs : int, optional
+        the number of threads used by the 'als' optimizer.  Ridge
+        regression problems of blocks of users or items are solved
+        concurrently, and results are the same as those of a single thread.
+        Work spaces of all threads are bounded by `ALS_BLOCK_ELEMENTS` in
+        total.  Whether this is faster depends on the number of processors
+        and on how long numpy releases the GIL.  As in scikit-learn,
+        negative values are counted back from the number of processors;
+        -1 means using all processors, and -2 all but one.  default=1
     optimizer_kwargs : keyword arguments, optional
-        keyword arguments passed to optimizer
+        keyword arguments passed to optimizer.  If `method` is 'als',
+        parameters are fitted by alternating least squares, and `tol` and
+        `maxiter` are used to stop its sweeps.  Otherwise, these are passed
+        to :func:`scipy.optimize.minimize` .  Keyword arguments of
+        stochastic methods are described in Notes.
 
     Attributes
     ----------
@@ -99,6 +122,25 @@ class PMF(BaseScorePredictor):
     events, and a regularization term is scaled by the number of model
     parameters.
 
+    If `method` is 'als', the above loss is minimized by alternating least
+    squares.  While fixing the item parameters, the pair of a bias and latent
+    factors of each user, :math:`(b_x, \mathbf{p}_x)` , is the solution of
+    a :math:`(k + 1)`-dimensional ridge regression problem, which is solved in
+    a closed form.  Items are updated in the same way, and the global bias is
+    set to the mean residual.  One sweep updates all of these once.
+
+    If `method` is one of 'sgd', 'momentum', 'adagrad', or 'adam', the loss
+    is minimized by a minibatch stochastic gradient method.  A gradient for a
+    minibatch is computed by :meth:`sparse_grad_loss` , and only parameters
+    of users and items in the minibatch are updated.  The regularization term
+    of each user or item is weighted by the number of all events divided by
+    the number of its events, so that a minibatch gradient is an unbiased
+    estimate of a full gradient, and rarely seen users and items are
+    regularized as strongly as by the other methods.  The loss of all events
+    is reported at the end of each epoch.  see
+    :func:`kamrecsys.utils.minimize_stochastic` for the options of these
+    methods.
+
     References
     ----------
     .. [1] R. Salakhutdinov and A. Mnih. "Probabilistic matrix factorization"
@@ -107,13 +149,26 @@ class PMF(BaseScorePredictor):
         Collaborative Filtering Model", KDD2008
     """
 
-    def __init__(self, C=1.0, k=1, random_state=None, **optimizer_kwargs):
+    def __init__(
+            self, C=1.0, k=1, random_state=None, n_jobs=1,
+            **optimizer_kwargs):
         super(PMF, self).__init__(random_state=random_state)
 
         # model hyper-parameter
         self.C = float(C)
         self.k = int(k)
 
+        # the number of threads
+        n_jobs = int(n_jobs)
+        if n_jobs == 0:
+            raise ValueError("n_jobs must not be zero")
+        if n_jobs < 0:
+            n_jobs += multiprocessing.cpu_count() + 1
+            if n_jobs < 1:
+                raise ValueError(
+                    "n_jobs must be >= -(the number of processors)")
+        self.n_jobs = n_jobs
+
         # optimizer parameter
         self.optimizer_kwargs = optimizer_kwargs
         self.optimizer_kwargs['options'] = (
@@ -139,6 +194,9 @@ class PMF(BaseScorePredictor):
         self._coef = None
         self._dt = None
         self._reg = 1.0
+        self._reg_weights = None
+        self._scratch = None
+        self._incidence = None
 
     def _init_coef(self, ev, sc, n_objects):
         """
@@ -179,36 +237,35 @@ class PMF(BaseScorePredictor):
         self.p_ = self._coef.view(self._dt)['p'][0]
         self.q_ = self._coef.view(self._dt)['q'][0]
 
-        # set bias term
+        # set bias term by mean residuals of each user or item
         self.mu_[0] = np.sum(sc) / n_events
-        for i in xrange(n_users):
-            j = np.nonzero(ev[:, 0] == i)[0]
-            if len(j) > 0:
-                self.bu_[i] = np.sum(sc[j] - self.mu_[0]) / len(j)
-        for i in xrange(n_items):
-            j = np.nonzero(ev[:, 1] == i)[0]
-            if len(j) > 0:
-                self.bi_[i] = (
-                    np.sum(sc[j] - (self.mu_[0] + self.bu_[ev[j, 0]])) /
-                    len(j))
+        n_user_events = np.bincount(ev[:, 0], minlength=n_users)
+        mask = n_user_events.nonzero()[0]
+        self.bu_[mask] = (
+            np.bincount(ev[:, 0], weights=sc - self.mu_[0],
+                        minlength=n_users)[mask] / n_user_events[mask])
+        n_item_events = np.bincount(ev[:, 1], minlength=n_items)
+        mask = n_item_events.nonzero()[0]
+        self.bi_[mask] = (
+            np.bincount(ev[:, 1],
+                        weights=sc - (self.mu_[0] + self.bu_[ev[:, 0]]),
+                        minlength=n_items)[mask] / n_item_events[mask])
 
         # fill cross terms by normal randoms whose s.d.'s are mean residuals
-        var = 0.0
-        for i in xrange(n_events):
-            var += (
-                (sc[i] -
-                 (self.mu_[0] + self.bu_[ev[i, 0]] + self.bi_[ev[i, 1]])) ** 2)
-        var /= n_events
-
-        mask = np.bincount(ev[:, 0], minlength=n_users).nonzero()[0]
+        var = np.sum(
+            (sc - (self.mu_[0] + self.bu_[ev[:, 0]] +
+                   self.bi_[ev[:, 1]])) ** 2) / n_events
+
+        mask = n_user_events.nonzero()[0]
         self.p_[mask, :] = (
             self._rng.normal(0.0, np.sqrt(var), (len(mask), k)))
-        mask = np.bincount(ev[:, 1], minlength=n_items).nonzero()[0]
+        mask = n_item_events.nonzero()[0]
         self.q_[mask, :] = (
             self._rng.normal(0.0, np.sqrt(var), (len(mask), k)))
 
         # scale a regularization term by the number of parameters
         self._reg = self.C / (coef_size - 1)
+        self._reg_weights = _sparse_reg_weights(ev, n_objects)
 
     def loss(self, coef, ev, sc, n_objects):
         """
@@ -272,8 +329,6 @@ class PMF(BaseScorePredictor):
         """
         # constants
         n_events = ev.shape[0]
-        n_users = n_objects[0]
-        n_items = n_objects[1]
 
         # set input array's view
         mu = coef.view(self._dt)['mu'][0]
@@ -293,19 +348,14 @@ class PMF(BaseScorePredictor):
         # gradient of loss term
         neg_res = -(sc - (mu[0] + bu[ev[:, 0]] + bi[ev[:, 1]] +
                           np.sum(p[ev[:, 0], :] * q[ev[:, 1], :], axis=1)))
+        users, items = self._get_incidence(ev, n_objects)
         grad_mu[0] = np.sum(neg_res)
-        grad_bu[:] = np.bincount(ev[:, 0], weights=neg_res,
-                                 minlength=n_users)
-        grad_bi[:] = np.bincount(ev[:, 1], weights=neg_res,
-                                 minlength=n_items)
-        weights = neg_res[:, np.newaxis] * q[ev[:, 1], :]
-        for i in xrange(self.k):
-            grad_p[:, i] = np.bincount(ev[:, 0], weights=weights[:, i],
-                                       minlength=n_users)
-        weights = neg_res[:, np.newaxis] * p[ev[:, 0], :]
-        for i in xrange(self.k):
-            grad_q[:, i] = np.bincount(ev[:, 1], weights=weights[:, i],
-                                       minlength=n_items)
+        grad_bu[:] = users.dot(neg_res)
+        grad_bi[:] = items.dot(neg_res)
+        grad_p[:, :] = users.dot(
+            neg_res[:, np.newaxis] * q[ev[:, 1], :])
+        grad_q[:, :] = items.dot(
+            neg_res[:, np.newaxis] * p[ev[:, 0], :])
 
         # re-scale gradients
         grad[:] = grad[:] / n_events
@@ -318,6 +368,364 @@ class PMF(BaseScorePredictor):
 
         return grad
 
+    def sparse_grad_loss(self, coef, ev, sc, n_objects):
+        """
+        gradient of loss function at parameters of users and items in events
+
+        This is used by stochastic optimizers, and the cost does not depend
+        on the numbers of users and items.  The regularization term is
+        applied only to the parameters of users and items in `ev` , but it is
+        weighted so that the gradient of a minibatch is an unbiased estimate
+        of :meth:`grad_loss` of all events given to :meth:`_init_coef` .
+
+        Parameters
+        ----------
+        coef : array_like, shape=(variable,)
+            coefficients of this model
+        ev : array_like, shape(n_events, 2), dtype=int
+            user and item indexes
+        sc : array_like, shape(n_events,), dtype=float
+            target scores
+        n_objects : array_like, shape(2,), dtype=int
+            numbers of users and items
+
+        Returns
+        -------
+        index : array, dtype=int
+            unique indexes of parameters in `coef`
+        grad : array, dtype=float
+            the first gradient of loss function at these parameters
+        """
+        # set input array's view
+        mu = coef.view(self._dt)['mu'][0]
+        bu = coef.view(self._dt)['bu'][0]
+        bi = coef.view(self._dt)['bi'][0]
+        p = coef.view(self._dt)['p'][0]
+        q = coef.view(self._dt)['q'][0]
+
+        neg_res = -(sc - (mu[0] + bu[ev[:, 0]] + bi[ev[:, 1]] +
+                          np.sum(p[ev[:, 0], :] * q[ev[:, 1], :], axis=1)))
+
+        return _sparse_mf_grad(
+            coef, self._dt, ev, neg_res, self._reg, self._reg_weights)
+
+    def _get_incidence(self, ev, n_objects):
+        """
+        Incidence matrices between objects and events
+
+        A gradient is aggregated over events of each user or item by a
+        product of an incidence matrix and a dense matrix.  Matrices are
+        cached while the same event array is given, and are built once per
+        fitting.
+
+        Parameters
+        ----------
+        ev : array_like, shape(n_events, 2), dtype=int
+            user and item indexes
+        n_objects : array_like, shape(2,), dtype=int
+            numbers of users and items
+
+        Returns
+        -------
+        users : :class:`scipy.sparse.csr_matrix`, shape=(n_users, n_events)
+            the (x, j) element is one if the j-th event is of the user x
+        items : :class:`scipy.sparse.csr_matrix`, shape=(n_items, n_events)
+            the (y, j) element is one if the j-th event is of the item y
+        """
+        if self._incidence is None or self._incidence[0] is not ev:
+            n_events = ev.shape[0]
+            index = np.arange(n_events)
+            ones = np.ones(n_events, dtype=float)
+            self._incidence = (ev,) + tuple(
+                sparse.csr_matrix(
+                    (ones, (ev[:, col], index)),
+                    shape=(n_objects[col], n_events))
+                for col in xrange(2))
+
+        return self._incidence[1:]
+
+    def _get_scratch(self, n_events):
+        """
+        Scratch buffers for :meth:`loss_and_grad`
+
+        Buffers are allocated at the first call, and reused while the number
+        of events is unchanged.
+
+        Parameters
+        ----------
+        n_events : int
+            the number of events
+
+        Returns
+        -------
+        scratch : dict
+            `res` and `tmp` are arrays whose shapes are (n_events,) , and
+            `pu` and `qi` are arrays whose shapes are (n_events, k)
+        """
+        if (self._scratch is None or
+                self._scratch['res'].shape[0] != n_events):
+            self._scratch = {
+                'res': np.empty(n_events, dtype=float),
+                'tmp': np.empty(n_events, dtype=float),
+                'pu': np.empty((n_events, self.k), dtype=float),
+                'qi': np.empty((n_events, self.k), dtype=float)}
+
+        return self._scratch
+
+    def loss_and_grad(self, coef, ev, sc, n_objects):
+        """
+        loss function and its gradient
+
+        Predicted scores and residuals are computed once and shared between
+        a loss and its gradient.  Intermediate arrays are stored in scratch
+        buffers, which are reused over iterations.  This is passed to an
+        optimizer together with ``jac=True`` .
+
+        Parameters
+        ----------
+        coef : array_like, shape=(variable,)
+            coefficients of this model
+        ev : array_like, shape(n_events, 2), dtype=int
+            user and item indexes
+        sc : array_like, shape(n_events,), dtype=float
+            target scores
+        n_objects : array_like, shape(2,), dtype=int
+            numbers of users and items
+
+        Returns
+        -------
+        loss : float
+            value of loss function
+        grad : array_like, shape=coef.shape
+            the first gradient of loss function by coef
+        """
+        # constants
+        n_events = ev.shape[0]
+
+        # set input array's view
+        mu = coef.view(self._dt)['mu'][0]
+        bu = coef.view(self._dt)['bu'][0]
+        bi = coef.view(self._dt)['bi'][0]
+        p = coef.view(self._dt)['p'][0]
+        q = coef.view(self._dt)['q'][0]
+
+        # create empty gradient
+        grad = np.empty_like(coef)
+        grad_mu = grad.view(self._dt)['mu'][0]
+        grad_bu = grad.view(self._dt)['bu'][0]
+        grad_bi = grad.view(self._dt)['bi'][0]
+        grad_p = grad.view(self._dt)['p'][0]
+        grad_q = grad.view(self._dt)['q'][0]
+
+        # negative residuals
+        scratch = self._get_scratch(n_events)
+        neg_res = np.take(bu, ev[:, 0], out=scratch['res'])
+        neg_res += mu[0]
+        neg_res += np.take(bi, ev[:, 1], out=scratch['tmp'])
+        pu = np.take(p, ev[:, 0], axis=0, out=scratch['pu'])
+        qi = np.take(q, ev[:, 1], axis=0, out=scratch['qi'])
+        neg_res += np.sum(
+            np.multiply(pu, qi, out=pu), axis=1, out=scratch['tmp'])
+        neg_res -= sc
+
+        # loss and regularization term
+        loss = np.sum(neg_res ** 2)
+        reg = (np.sum(bu**2) + np.sum(bi**2) + np.sum(p**2) + np.sum(q**2))
+
+        # gradient of loss term
+        users, items = self._get_incidence(ev, n_objects)
+        grad_mu[0] = np.sum(neg_res)
+        grad_bu[:] = users.dot(neg_res)
+        grad_bi[:] = items.dot(neg_res)
+        grad_p[:, :] = users.dot(
+            np.multiply(qi, neg_res[:, np.newaxis], out=qi))
+        pu = np.take(p, ev[:, 0], axis=0, out=pu)
+        grad_q[:, :] = items.dot(
+            np.multiply(pu, neg_res[:, np.newaxis], out=pu))
+
+        # re-scale gradients
+        grad /= n_events
+
+        # gradient of regularization term
+        grad_bu[:] += self._reg * bu
+        grad_bi[:] += self._reg * bi
+        grad_p[:, :] += self._reg * p
+        grad_q[:, :] += self._reg * q
+
+        return loss / n_events + 0.5 * self._reg * reg, grad
+
+    def _als_half_sweep(self, indptr, blocks, x, y, out, lam, pool=None):
+        """
+        Update a bias and latent factors of each user or item
+
+        Parameters
+        ----------
+        indptr : array, shape(n_objects + 1,), dtype=int
+            events of the j-th object are
+            ``index[indptr[j]:indptr[j + 1]]``
+        blocks : list of tuple
+            blocks of objects generated by :func:`_split_blocks`
+        x : array, shape(n_events, k + 1)
+            explanatory variables of events, i.e., one and latent factors of
+            counterparts.  events are sorted by objects.
+        y : array, shape(n_events,)
+            residual scores of events sorted by objects
+        out : array, shape(n_objects, k + 1)
+            updated biases and latent factors are stored
+        lam : float
+            a regularization parameter of ridge regression problems
+        pool : :class:`multiprocessing.pool.ThreadPool`, optional
+            if specified, blocks are processed by threads in this pool.
+            Each thread writes a disjoint range of rows of `out` , and at
+            most one block per thread is processed at once.
+        """
+        def solve_block(block):
+            start, end = block
+            _solve_ridge_block(
+                x[indptr[start]:indptr[end]], y[indptr[start]:indptr[end]],
+                indptr[start:end + 1] - indptr[start], lam, out[start:end])
+
+        if pool is None:
+            for block in blocks:
+                solve_block(block)
+        else:
+            pool.map(solve_block, blocks, chunksize=1)
+
+    def _fit_als(self, ev, sc, n_objects, tol=1e-5, options=None):
+        """
+        Fit model parameters by alternating least squares
+
+        Parameters
+        ----------
+        ev : array, shape(n_events, 2)
+            event data
+        sc : array, shape(n_events,)
+            scores attached to events
+        n_objects : array, shape(2,)
+            vector of numbers of objects
+        tol : float, optional
+            sweeps are stopped if a relative decrease of the loss is less
+            than this value, default=1e-5
+        options : dict, optional
+            `maxiter` is the maximum number of sweeps, default=100
+
+        Returns
+        -------
+        res : :class:`scipy.optimize.OptimizeResult`
+            results in the same format as :func:`scipy.optimize.minimize`
+
+        Raises
+        ------
+        ValueError
+            if a regularization parameter is not positive
+        """
+        if self.C <= 0.0:
+            raise ValueError("C must be positive for the ALS optimizer")
+        maxiter = 100 if options is None else options.get('maxiter', 100)
+
+        # constants
+        n_events = ev.shape[0]
+        k = self.k
+        lam = 0.5 * n_events * self._reg
+        sc = np.asarray(sc, dtype=float)
+        n_jobs = self.n_jobs
+
+        # events sorted by users and items, and blocks of objects.
+        # in parallel, blocks are split finely to keep all threads busy,
+        # and the total size of work spaces of threads is bounded.
+        orders = []
+        for col in xrange(2):
+            index = np.argsort(ev[:, col], kind='mergesort')
+            indptr = np.zeros(n_objects[col] + 1, dtype=int)
+            np.cumsum(
+                np.bincount(ev[:, col], minlength=n_objects[col]),
+                out=indptr[1:])
+            costs = _ridge_block_costs(indptr, k + 1)
+            max_cost = max(ALS_BLOCK_ELEMENTS // n_jobs, 1)
+            if n_jobs > 1:
+                max_cost = max(min(-(-costs[-1] // (4 * n_jobs)), max_cost), 1)
+            orders.append((index, indptr, _split_blocks(costs, max_cost)))
+
+        # work spaces
+        x = np.empty((n_events, k + 1), dtype=float)
+        x[:, 0] = 1.0
+        wu = np.empty((n_objects[0], k + 1), dtype=float)
+        wi = np.empty((n_objects[1], k + 1), dtype=float)
+
+        # thread pool
+        pool = ThreadPool(n_jobs) if n_jobs > 1 else None
+
+        try:
+            res = self._als_sweeps(
+                ev, sc, n_objects, orders, x, wu, wi, lam, tol, maxiter, pool)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        return res
+
+    def _als_sweeps(
+            self, ev, sc, n_objects, orders, x, wu, wi, lam, tol, maxiter,
+            pool):
+        """
+        Repeat ALS sweeps until convergence
+
+        Parameters are prepared by :meth:`_fit_als` .
+        """
+
+        # views of parameters
+        mu = self._coef.view(self._dt)['mu'][0]
+        bu = self._coef.view(self._dt)['bu'][0]
+        bi = self._coef.view(self._dt)['bi'][0]
+        p = self._coef.view(self._dt)['p'][0]
+        q = self._coef.view(self._dt)['q'][0]
+
+        loss = self.loss(self._coef, ev, sc, n_objects)
+        n_loss_calls = 1
+        success = False
+        n_sweeps = 0
+        while n_sweeps < maxiter:
+            n_sweeps += 1
+
+            # global bias
+            mu[0] = np.mean(
+                sc - (bu[ev[:, 0]] + bi[ev[:, 1]] +
+                      np.sum(p[ev[:, 0], :] * q[ev[:, 1], :], axis=1)))
+
+            # users
+            index, indptr, blocks = orders[0]
+            x[:, 1:] = q[ev[index, 1], :]
+            self._als_half_sweep(
+                indptr, blocks, x, sc[index] - mu[0] - bi[ev[index, 1]],
+                wu, lam, pool)
+            bu[:] = wu[:, 0]
+            p[:, :] = wu[:, 1:]
+
+            # items
+            index, indptr, blocks = orders[1]
+            x[:, 1:] = p[ev[index, 0], :]
+            self._als_half_sweep(
+                indptr, blocks, x, sc[index] - mu[0] - bu[ev[index, 0]],
+                wi, lam, pool)
+            bi[:] = wi[:, 0]
+            q[:, :] = wi[:, 1:]
+
+            # check convergence
+            prev_loss = loss
+            loss = self.loss(self._coef, ev, sc, n_objects)
+            n_loss_calls += 1
+            logger.debug("ALS sweep %d: loss = %f", n_sweeps, loss)
+            if prev_loss - loss <= tol * max(abs(prev_loss), abs(loss), 1.0):
+                success = True
+                break
+
+        status = 0 if success else 2
+        return OptimizeResult(
+            x=self._coef.copy(), fun=loss, success=success, status=status,
+            message=get_fit_status_message(status),
+            nit=n_sweeps, nfev=n_loss_calls, njev=0)
+
     def fit(self, data, event_index=(0, 1)):
         """
         fitting model
@@ -353,13 +761,27 @@ class PMF(BaseScorePredictor):
         # optimize model
         # fmin_bfgs is slow for large data, maybe because due to the
         # computation cost for the Hessian matrices.
-        res = minimize(
-            fun=self.loss,
-            x0=self._coef,
-            args=(ev, sc, n_objects),
-            method=optimizer_method,
-            jac=self.grad_loss,
-            **optimizer_kwargs)
+        if optimizer_method == 'als':
+            res = self._fit_als(ev, sc, n_objects, **optimizer_kwargs)
+        elif optimizer_method in STOCHASTIC_METHODS:
+            res = minimize_stochastic(
+                fun=self.loss,
+                x0=self._coef,
+                event_args=(ev, sc),
+                args=(n_objects,),
+                method=optimizer_method,
+                jac=self.sparse_grad_loss,
+                random_state=self._rng,
+                sparse_jac=True,
+                **optimizer_kwargs)
+        else:
+            res = minimize(
+                fun=self.loss_and_grad,
+                x0=self._coef,
+                args=(ev, sc, n_objects),
+                method=optimizer_method,
+                jac=True,
+                **optimizer_kwargs)
 
         # get parameters
         self._coef[:] = res.x
@@ -387,12 +809,17 @@ class PMF(BaseScorePredictor):
         self.fit_results_['grad_calls'] = res.njev
         self.fit_results_['optimizer_method'] = optimizer_method
         self.fit_results_['optimizer_kwargs'] = optimizer_kwargs
+        if 'epoch_losses' in res:
+            self.fit_results_['epoch_losses'] = res.epoch_losses
 
         # clean up temporary instance variables
         self.remove_data()
         self._coef = None
         self._dt = None
         self._reg = 1.0
+        self._reg_weights = None
+        self._scratch = None
+        self._incidence = None
 
     def raw_predict(self, ev):
         """
@@ -424,6 +851,257 @@ class PMF(BaseScorePredictor):
 # Functions
 # =============================================================================
 
+
+def _sparse_mf_grad(coef, dt, ev, common_term, reg, reg_weights=None):
+    """
+    Gradient of a matrix factorization model restricted to objects of events
+
+    Only parameters of users and items appearing in events are computed,
+    and the cost does not depend on the numbers of users and items.  The
+    regularization term is applied to these parameters.
+
+    If `reg_weights` is given, the regularization term of each object is
+    multiplied by its weight and by the fraction of its events in `ev` .
+    If weights are the numbers of all events divided by the numbers of
+    events of objects, this is an unbiased estimate of the regularization
+    term of all parameters when `ev` is a minibatch drawn from all events.
+
+    Parameters
+    ----------
+    coef : array_like, shape=(variable,)
+        coefficients of a model
+    dt : np.dtype
+        structured dtype of `coef` having `mu`, `bu`, `bi`, `p`, and `q`
+    ev : array_like, shape(n_events, 2), dtype=int
+        user and item indexes
+    common_term : array_like, shape(n_events,)
+        derivatives of a loss of events by their predicted scores
+    reg : float
+        a regularization parameter
+    reg_weights : tuple of array, optional
+        weights of regularization terms of users and items, shape(n_users,)
+        and shape(n_items,)
+
+    Returns
+    -------
+    index : array, dtype=int
+        unique indexes of parameters in `coef`
+    grad : array, dtype=float
+        the first gradient of a loss function at these parameters
+    """
+    n_events = ev.shape[0]
+    offset = dict((name, dt.fields[name][1] // coef.itemsize)
+                  for name in ('mu', 'bu', 'bi', 'p', 'q'))
+    bu = coef.view(dt)['bu'][0]
+    bi = coef.view(dt)['bi'][0]
+    p = coef.view(dt)['p'][0]
+    q = coef.view(dt)['q'][0]
+    k = p.shape[1]
+
+    # incidence matrices between objects of events and events
+    index = np.arange(n_events)
+    ones = np.ones(n_events, dtype=float)
+    users, user_index = np.unique(ev[:, 0], return_inverse=True)
+    items, item_index = np.unique(ev[:, 1], return_inverse=True)
+    user_incidence = sparse.csr_matrix(
+        (ones, (user_index, index)), shape=(users.shape[0], n_events))
+    item_incidence = sparse.csr_matrix(
+        (ones, (item_index, index)), shape=(items.shape[0], n_events))
+
+    # regularization parameters of objects
+    if reg_weights is None:
+        user_reg = np.full(users.shape[0], reg)
+        item_reg = np.full(items.shape[0], reg)
+    else:
+        user_reg = (reg / n_events) * (
+            np.bincount(user_index) * reg_weights[0][users])
+        item_reg = (reg / n_events) * (
+            np.bincount(item_index) * reg_weights[1][items])
+
+    # gradient of loss term and regularization term
+    grad_mu = np.sum(common_term) / n_events
+    grad_bu = user_incidence.dot(common_term) / n_events + user_reg * bu[users]
+    grad_bi = item_incidence.dot(common_term) / n_events + item_reg * bi[items]
+    grad_p = (user_incidence.dot(common_term[:, np.newaxis] * q[ev[:, 1], :]) /
+              n_events + user_reg[:, np.newaxis] * p[users, :])
+    grad_q = (item_incidence.dot(common_term[:, np.newaxis] * p[ev[:, 0], :]) /
+              n_events + item_reg[:, np.newaxis] * q[items, :])
+
+    index = np.r_[
+        offset['mu'],
+        offset['bu'] + users,
+        offset['bi'] + items,
+        (offset['p'] + users[:, np.newaxis] * k + np.arange(k)).ravel(),
+        (offset['q'] + items[:, np.newaxis] * k + np.arange(k)).ravel()]
+    grad = np.r_[
+        grad_mu, grad_bu, grad_bi, grad_p.ravel(), grad_q.ravel()]
+
+    return index, grad
+
+
+def _sparse_reg_weights(ev, n_objects):
+    """
+    Weights of regularization terms for :func:`_sparse_mf_grad`
+
+    Parameters
+    ----------
+    ev : array_like, shape(n_events, 2), dtype=int
+        user and item indexes of all events
+    n_objects : array_like, shape(2,), dtype=int
+        numbers of users and items
+
+    Returns
+    -------
+    reg_weights : tuple of array
+        the number of all events divided by the numbers of events of users
+        and items.  weights of objects without events are 0.
+    """
+    reg_weights = []
+    for col in xrange(2):
+        counts = np.bincount(ev[:, col], minlength=n_objects[col])
+        weights = np.zeros(n_objects[col], dtype=float)
+        mask = counts.nonzero()[0]
+        weights[mask] = ev.shape[0] / counts[mask]
+        reg_weights.append(weights)
+
+    return tuple(reg_weights)
+
+
+def _split_blocks(costs, max_cost):
+    """
+    Split objects into blocks of consecutive objects
+
+    Parameters
+    ----------
+    costs : array, shape(n_objects + 1,), dtype=int
+        cumulative costs of objects.  the j-th object costs
+        ``costs[j + 1] - costs[j]`` , e.g., the number of its events if
+        `costs` is `indptr` of events sorted by objects.
+    max_cost : int
+        blocks are split so as to cost at most this value, unless a single
+        object costs more
+
+    Returns
+    -------
+    blocks : list of tuple
+        pairs of the first and the end objects of blocks
+    """
+    n_objects = costs.shape[0] - 1
+    blocks = []
+    start = 0
+    while start < n_objects:
+        end = np.searchsorted(
+            costs, costs[start] + max_cost, side='right') - 1
+        end = min(max(end, start + 1), n_objects)
+        blocks.append((start, end))
+        start = end
+
+    return blocks
+
+
+def _add_gram_block(a, nonempty, x, starts, w=None):
+    """
+    Add Gram matrices of events of each object
+
+    A Gram matrix of an object having many events is computed by a matrix
+    product.  Those of the other objects are summed row by row, and no
+    temporaries larger than `x` are created.
+
+    Parameters
+    ----------
+    a : array, shape(n_block_objects, d, d)
+        ``a[nonempty][j] += sum_e w[e] * x[e] x[e]^T`` , where ``e`` runs
+        over events of the j-th non-empty object
+    nonempty : array, shape(n_block_objects,), dtype=bool
+        objects having events
+    x : array, shape(n_block_events, d)
+        explanatory variables of events sorted by objects
+    starts : array, shape(n_nonempty_objects,), dtype=int
+        the first events of non-empty objects
+    w : array, shape(n_block_events,), optional
+        weights of events.  if None, all weights are one.
+    """
+    d = x.shape[1]
+    wx = x if w is None else x * w[:, np.newaxis]
+    ends = np.r_[starts[1:], x.shape[0]]
+    heavy = (ends - starts) >= d
+    gram = np.empty((starts.shape[0], d, d), dtype=float)
+
+    # objects having many events
+    for j in np.nonzero(heavy)[0]:
+        gram[j] = np.dot(x[starts[j]:ends[j]].T, wx[starts[j]:ends[j]])
+
+    # the other objects
+    if not np.all(heavy):
+        light = np.nonzero(~heavy)[0]
+        counts = ends[light] - starts[light]
+        light_starts = np.r_[0, np.cumsum(counts)[:-1]]
+        events = np.arange(np.sum(counts)) + np.repeat(
+            starts[light] - light_starts, counts)
+        lx = x[events]
+        lwx = wx[events]
+        for i in xrange(d):
+            gram[light, i, i:] = np.add.reduceat(
+                lx[:, i:] * lwx[:, i, np.newaxis], light_starts, axis=0)
+            gram[light, i + 1:, i] = gram[light, i, i + 1:]
+
+    a[nonempty] += gram
+
+
+def _ridge_block_costs(indptr, d):
+    """
+    Cumulative sizes of work spaces of :func:`_solve_ridge_block`
+
+    Parameters
+    ----------
+    indptr : array, shape(n_objects + 1,), dtype=int
+        events of the j-th object are the ``indptr[j]``-th to
+        ``(indptr[j + 1] - 1)``-th events
+    d : int
+        the number of explanatory variables
+
+    Returns
+    -------
+    costs : array, shape(n_objects + 1,), dtype=int
+        the number of floats used by objects preceding the j-th object,
+        i.e., ``d`` floats per event and ``d * d`` floats per object
+    """
+    return indptr * d + np.arange(indptr.shape[0]) * (d * d)
+
+
+def _solve_ridge_block(x, y, indptr, lam, out):
+    """
+    Solve ridge regression problems of a block of objects
+
+    Parameters
+    ----------
+    x : array, shape(n_block_events, d)
+        explanatory variables of events sorted by objects
+    y : array, shape(n_block_events,)
+        targets of events sorted by objects
+    indptr : array, shape(n_block_objects + 1,), dtype=int
+        events of the j-th object are ``x[indptr[j]:indptr[j + 1]]``
+    lam : float
+        a regularization parameter
+    out : array, shape(n_block_objects, d)
+        solutions are stored
+    """
+    d = x.shape[1]
+    counts = np.diff(indptr)
+    nonempty = counts > 0
+    starts = indptr[:-1][nonempty]
+
+    # normal equations.  the upper triangle of the Gram matrices is summed
+    # row by row so that temporaries are as large as `x` at most.
+    a = np.tile(lam * np.identity(d), (counts.shape[0], 1, 1))
+    b = np.zeros((counts.shape[0], d), dtype=float)
+    if starts.shape[0] > 0:
+        _add_gram_block(a, nonempty, x, starts)
+        b[nonempty] = np.add.reduceat(x * y[:, np.newaxis], starts, axis=0)
+
+    out[:, :] = np.linalg.solve(a, b[:, :, np.newaxis])[:, :, 0]
+
+
 # =============================================================================
 # Module initialization
 # =============================================================================
@@ -12,6 +12,8 @@ from six.moves import xrange
 # Imports
 # =============================================================================
 
+import multiprocessing
+
 from numpy.testing import (
     TestCase,
     run_module_suite,
@@ -30,6 +32,7 @@ import numpy as np
 
 from sklearn.utils import check_random_state
 
+from kamrecsys.data import EventWithScoreData
 from kamrecsys.datasets import load_movielens_mini
 from kamrecsys.score_predictor import PMF
 
@@ -41,6 +44,18 @@ from kamrecsys.score_predictor import PMF
 # Functions
 # =============================================================================
 
+
+def random_score_data(n_users=30, n_items=20, n_events=400, random_state=0):
+    rng = check_random_state(random_state)
+    event = np.c_[rng.randint(n_users, size=n_events),
+                  rng.randint(n_items, size=n_events)]
+    score = np.clip(np.round(3.0 + rng.randn(n_events)), 1.0, 5.0)
+    data = EventWithScoreData()
+    data.set_event(event, score, score_domain=(1, 5, 1))
+
+    return data
+
+
 # =============================================================================
 # Test Classes
 # =============================================================================
@@ -254,6 +269,188 @@ class TestPMF(TestCase):
             [3.3865753481, 1.0290548148, 2.8936547259, 0.9260666667],
             rtol=1e-5)
 
+    def test_init_coef(self):
+
+        data = random_score_data()
+        rec = PMF(C=0.1, k=2, random_state=1234)
+        rec._rng = check_random_state(rec.random_state)
+        ev = data.event
+        sc = data.score
+        n_objects = data.n_objects + 2
+        rec._init_coef(ev, sc, n_objects)
+
+        # biases are mean residuals
+        mu = np.mean(sc)
+        assert_allclose(rec.mu_[0], mu)
+        for i in xrange(n_objects[0]):
+            j = ev[:, 0] == i
+            assert_allclose(
+                rec.bu_[i], np.mean(sc[j] - mu) if np.any(j) else 0.0)
+        for i in xrange(n_objects[1]):
+            j = ev[:, 1] == i
+            assert_allclose(
+                rec.bi_[i],
+                np.mean(sc[j] - mu - rec.bu_[ev[j, 0]]) if np.any(j) else 0.0)
+
+        # factors of objects without events are zeros
+        assert_array_equal(rec.p_[-2:, :], 0.0)
+        assert_array_equal(rec.q_[-2:, :], 0.0)
+        assert_(np.all(rec.p_[:-2, :] != 0.0))
+
+    def test_loss_and_grad(self):
+
+        data = random_score_data()
+        rec = PMF(C=0.1, k=2, random_state=1234)
+        rec._rng = check_random_state(rec.random_state)
+        ev = data.event
+        sc = data.score
+        n_objects = data.n_objects
+        rec._init_coef(ev, sc, n_objects)
+
+        rng = check_random_state(1234)
+        for i in xrange(3):
+            coef = rng.normal(size=rec._coef.shape)
+            loss, grad = rec.loss_and_grad(coef, ev, sc, n_objects)
+            assert_allclose(loss, rec.loss(coef, ev, sc, n_objects))
+            assert_allclose(grad, rec.grad_loss(coef, ev, sc, n_objects))
+
+        # scratch buffers are reused
+        scratch = rec._scratch['pu']
+        rec.loss_and_grad(coef, ev, sc, n_objects)
+        assert_(rec._scratch['pu'] is scratch)
+
+        # incidence matrices are cached
+        users, items = rec._get_incidence(ev, n_objects)
+        assert_array_equal(users.toarray().sum(axis=1),
+                           np.bincount(ev[:, 0], minlength=n_objects[0]))
+        assert_array_equal(
+            items.indices, np.argsort(ev[:, 1], kind='mergesort'))
+        assert_(rec._get_incidence(ev, n_objects)[0] is users)
+
+    def test_als(self):
+        from kamrecsys.score_predictor.matrix_factorization import (
+            _split_blocks, _ridge_block_costs, _solve_ridge_block)
+
+        # blocks of objects
+        indptr = np.array([0, 2, 2, 7, 8, 10])
+        assert_equal(_split_blocks(indptr, 3), [(0, 2), (2, 3), (3, 5)])
+        assert_equal(_split_blocks(indptr, 100), [(0, 5)])
+        assert_array_equal(
+            _ridge_block_costs(indptr, 2), [0, 8, 12, 26, 32, 40])
+
+        # ridge regression of objects having many or few events
+        rng = check_random_state(1234)
+        indptr = np.r_[0, np.cumsum([0, 1, 3, 4, 10, 2, 0, 7])]
+        x = rng.randn(indptr[-1], 4)
+        y = rng.randn(indptr[-1])
+        out = np.empty((indptr.shape[0] - 1, 4))
+        _solve_ridge_block(x, y, indptr, 0.5, out)
+        for j in xrange(indptr.shape[0] - 1):
+            xj = x[indptr[j]:indptr[j + 1]]
+            yj = y[indptr[j]:indptr[j + 1]]
+            assert_allclose(
+                out[j],
+                np.linalg.solve(xj.T.dot(xj) + 0.5 * np.identity(4),
+                                xj.T.dot(yj)))
+
+        # optimum of ALS is a stationary point of the loss
+        data = random_score_data()
+        rec = PMF(C=0.1, k=2, random_state=1234)
+        rec._rng = check_random_state(rec.random_state)
+        ev = data.event
+        sc = data.score
+        n_objects = data.n_objects
+        rec._init_coef(ev, sc, n_objects)
+        loss = rec.loss(rec._coef, ev, sc, n_objects)
+        res = rec._fit_als(
+            ev, sc, n_objects, tol=1e-12, options={'maxiter': 1000})
+        assert_(res.fun < loss)
+        assert_allclose(res.fun, rec.loss(res.x, ev, sc, n_objects))
+        assert_allclose(
+            rec.grad_loss(res.x, ev, sc, n_objects), 0.0, atol=1e-3)
+
+        # fit
+        rec = PMF(C=0.1, k=2, random_state=1234, method='als', maxiter=5)
+        rec.fit(data)
+        assert_equal(rec.fit_results_['optimizer_method'], 'als')
+        assert_equal(rec.fit_results_['n_iterations'], 5)
+        assert_(rec.fit_results_['final_loss'] <
+                rec.fit_results_['initial_loss'])
+        assert_equal(rec.p_.shape, (data.n_objects[0] + 1, 2))
+        assert_array_equal(rec.q_[-1, :], 0.0)
+
+        with assert_raises(ValueError):
+            PMF(C=0.0, k=2, method='als').fit(data)
+
+        # parallel sweeps
+        rec2 = PMF(
+            C=0.1, k=2, random_state=1234, method='als', maxiter=5, n_jobs=3)
+        rec2.fit(data)
+        assert_allclose(
+            rec2.fit_results_['final_loss'], rec.fit_results_['final_loss'])
+        assert_allclose(rec2.p_, rec.p_)
+        assert_allclose(rec2.q_, rec.q_)
+
+        # the number of threads
+        assert_equal(
+            PMF(n_jobs=-1, method='als').n_jobs, multiprocessing.cpu_count())
+        with assert_raises(ValueError):
+            PMF(n_jobs=0, method='als')
+        with assert_raises(ValueError):
+            PMF(n_jobs=-multiprocessing.cpu_count() - 1, method='als')
+
+    def test_stochastic(self):
+
+        data = random_score_data()
+        for method in ['sgd', 'momentum', 'adagrad', 'adam']:
+            rec = PMF(
+                C=0.1, k=2, random_state=1234, method=method, maxiter=10,
+                batch_size=50)
+            rec.fit(data)
+            losses = rec.fit_results_['epoch_losses']
+            assert_equal(len(losses), 11)
+            assert_allclose(losses[0], rec.fit_results_['initial_loss'])
+            assert_allclose(losses[-1], rec.fit_results_['final_loss'])
+            assert_(losses[-1] < losses[0])
+            assert_equal(rec.fit_results_['grad_calls'], 80)
+
+    def test_sparse_grad_loss(self):
+
+        data = random_score_data()
+        ev = data.event[:50]
+        sc = data.score[:50]
+        rec = PMF(C=0.1, k=2, random_state=1234)
+        rec._rng = check_random_state(rec.random_state)
+        rec._init_coef(data.event, data.score, data.n_objects)
+        coef = rec._rng.normal(size=rec._coef.shape)
+
+        # equal to a dense gradient of a loss term at objects in events
+        rec._reg = 0.0
+        index, grad = rec.sparse_grad_loss(coef, ev, sc, data.n_objects)
+        assert_array_equal(np.unique(index), index)
+        assert_allclose(
+            grad, rec.grad_loss(coef, ev, sc, data.n_objects)[index])
+        rec._reg = 0.1 / (rec._coef.shape[0] - 1)
+
+        # the mean of gradients of minibatches partitioning all events is a
+        # full gradient, though only objects in minibatches are regularized
+        mean_grad = np.zeros_like(coef)
+        for batch in np.split(rec._rng.permutation(data.n_events), 8):
+            batch_index, batch_grad = rec.sparse_grad_loss(
+                coef, data.event[batch], data.score[batch], data.n_objects)
+            mean_grad[batch_index] += batch_grad / 8
+        assert_allclose(
+            mean_grad,
+            rec.grad_loss(coef, data.event, data.score, data.n_objects))
+
+        # the size of a gradient does not depend on the numbers of objects
+        n_objects = data.n_objects + [1000, 2000]
+        rec._init_coef(data.event, data.score, n_objects)
+        large_index, large_grad = rec.sparse_grad_loss(
+            rec._coef, ev, sc, n_objects)
+        assert_equal(large_index.shape, index.shape)
+        assert_equal(large_grad.shape, grad.shape)
+
     def test_class(self):
 
         data = load_movielens_mini()
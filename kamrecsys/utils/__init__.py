@@ -22,6 +22,9 @@ from .base import (
     get_fit_status_message,
     is_binary_score)
 from .kammath import safe_sigmoid
+from .optimize import (
+    get_learning_rate,
+    minimize_stochastic)
 from .kamexputils import (
     json_decodable,
     get_system_info,
@@ -40,6 +43,8 @@ __all__ = [
     'get_fit_status_message',
     'is_binary_score',
     'safe_sigmoid',
+    'get_learning_rate',
+    'minimize_stochastic',
     'json_decodable',
     'get_system_info',
     'get_version_info']
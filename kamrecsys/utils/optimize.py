@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Stochastic Optimizers
+
+Minimize a loss function defined as the mean over events plus a
+regularization term by minibatch stochastic gradient methods.  A loss
+function and its gradient have the same signatures as those passed to
+:func:`scipy.optimize.minimize` , and a gradient computed for a minibatch of
+events is used as an unbiased estimate of the full gradient.
+"""
+
+from __future__ import (
+    print_function,
+    division,
+    absolute_import,
+    unicode_literals)
+from six.moves import xrange
+
+# =============================================================================
+# Imports
+# =============================================================================
+
+import logging
+
+import numpy as np
+from scipy.optimize import OptimizeResult
+from sklearn.utils import check_random_state
+
+from .base import get_fit_status_message
+
+# =============================================================================
+# Metadata variables
+# =============================================================================
+
+# =============================================================================
+# Public symbols
+# =============================================================================
+
+__all__ = []
+
+# =============================================================================
+# Constants
+# =============================================================================
+
+# names of stochastic optimization methods
+STOCHASTIC_METHODS = ('sgd', 'momentum', 'adagrad', 'adam')
+
+# default learning rates of methods
+DEFAULT_LEARNING_RATE = {
+    'sgd': 1.0,
+    'momentum': 0.1,
+    'adagrad': 0.1,
+    'adam': 0.01}
+
+# =============================================================================
+# Variables
+# =============================================================================
+
+# =============================================================================
+# Functions
+# =============================================================================
+
+
+def get_learning_rate(learning_rate, epoch, lr_schedule='constant',
+                      lr_decay=0.1):
+    """
+    Learning rate at a given epoch
+
+    Parameters
+    ----------
+    learning_rate : float
+        initial learning rate
+    epoch : int
+        the number of epochs already finished
+    lr_schedule : {'constant', 'inverse', 'exponential'}, default='constant'
+        'constant' keeps an initial rate.  'inverse' divides an initial rate
+        by ``1 + lr_decay * epoch`` .  'exponential' multiplies an initial
+        rate by ``exp(- lr_decay * epoch)`` .
+    lr_decay : float, default=0.1
+        decay parameter of a schedule
+
+    Returns
+    -------
+    learning_rate : float
+        learning rate
+
+    Raises
+    ------
+    ValueError
+        if a schedule is unknown
+    """
+    if lr_schedule == 'constant':
+        return learning_rate
+    elif lr_schedule == 'inverse':
+        return learning_rate / (1.0 + lr_decay * epoch)
+    elif lr_schedule == 'exponential':
+        return learning_rate * np.exp(- lr_decay * epoch)
+    else:
+        raise ValueError("Unknown learning rate schedule: " + str(lr_schedule))
+
+
+def minimize_stochastic(
+        fun, x0, event_args, args=(), method='adam', jac=None,
+        batch_size=1000, learning_rate=None, lr_schedule='constant',
+        lr_decay=0.1, momentum=0.9, beta1=0.9, beta2=0.999, epsilon=1e-8,
+        tol=None, options=None, random_state=None, sparse_jac=False,
+        batch_sampler=None):
+    """
+    Minimize a loss function by minibatch stochastic gradient methods
+
+    Events are shuffled at every epoch, and split into minibatches.  Events in
+    each minibatch are sorted in their original order to improve the locality
+    of memory accesses.
+
+    If `batch_sampler` is specified, minibatches are drawn by this function
+    instead of splitting shuffled events, and `event_args` are used only to
+    compute losses at the end of epochs.  This is used when events of
+    minibatches are sampled, e.g., negative events of implicit feedback.
+
+    If `sparse_jac` is True, only parameters related to events in a minibatch
+    and their states of optimizers are updated at each step, i.e., lazy
+    updates.  The cost of a step then does not depend on the number of
+    parameters.
+
+    Parameters
+    ----------
+    fun : callable
+        loss function, ``fun(x, *(event_args + args))``
+    x0 : array, shape=(n_parameters,)
+        initial parameters
+    event_args : tuple of array
+        arrays whose first dimensions correspond to events.  these are
+        sliced for each minibatch.
+    args : tuple, optional
+        extra arguments passed to `fun` and `jac` as they are
+    method : {'sgd', 'momentum', 'adagrad', 'adam'}, default='adam'
+        stochastic optimization method
+    jac : callable
+        gradient of a loss function, ``jac(x, *(event_args + args))``.  If
+        `sparse_jac` is True, this returns a pair of unique indexes of
+        parameters and the gradient at these parameters.
+    batch_size : int, default=1000
+        the number of events in a minibatch
+    learning_rate : float, optional
+        initial learning rate.  default values are defined in
+        `DEFAULT_LEARNING_RATE` .
+    lr_schedule : {'constant', 'inverse', 'exponential'}, default='constant'
+        schedule of learning rates.  see :func:`get_learning_rate`
+    lr_decay : float, default=0.1
+        decay parameter of a schedule
+    momentum : float, default=0.9
+        momentum parameter of 'momentum' method
+    beta1, beta2 : float, default=0.9, 0.999
+        decay rates of the first and second moments of 'adam' method
+    epsilon : float, default=1e-8
+        a constant to avoid zero division in 'adagrad' and 'adam' methods
+    tol : float, optional
+        epochs are stopped if a relative decrease of the loss is less than
+        this value.  if None, all epochs are performed.
+    options : dict, optional
+        `maxiter` is the number of epochs, default=100.  other options are
+        ignored.
+    random_state : RandomState or an int seed, optional
+        a random number generator to shuffle events
+    sparse_jac : bool, default=False
+        whether `jac` returns a sparse gradient
+    batch_sampler : callable, optional
+        a function to draw a minibatch, ``batch_sampler(n)`` , which returns
+        a tuple of arrays of at most `n` events in the same form as
+        `event_args` .  An epoch consists of as many events as `event_args` .
+
+    Returns
+    -------
+    res : :class:`scipy.optimize.OptimizeResult`
+        results in the same format as :func:`scipy.optimize.minimize` .
+        `nit` is the number of epochs, `nfev` is the number of evaluations
+        of a full loss, and `njev` is the number of minibatch gradients.
+        `epoch_losses` is a list of full losses at the beginning of fitting
+        and at the end of each epoch.
+
+    Raises
+    ------
+    ValueError
+        if a method or a schedule is unknown, or parameters are illegal
+    """
+    if method not in STOCHASTIC_METHODS:
+        raise ValueError("Unknown stochastic method: " + str(method))
+    if jac is None:
+        raise ValueError("Gradient function must be specified")
+    if batch_size < 1:
+        raise ValueError("batch_size must be >= 1")
+    if learning_rate is None:
+        learning_rate = DEFAULT_LEARNING_RATE[method]
+    get_learning_rate(learning_rate, 0, lr_schedule, lr_decay)
+    maxiter = 100 if options is None else options.get('maxiter', 100)
+    rng = check_random_state(random_state)
+
+    # constants
+    event_args = tuple(event_args)
+    args = tuple(args)
+    n_events = event_args[0].shape[0]
+
+    # work spaces
+    x = np.array(x0, dtype=float)
+    state1 = np.zeros_like(x)
+    state2 = np.zeros_like(x) if method == 'adam' else None
+    work = np.empty_like(x)
+
+    loss = fun(x, *(event_args + args))
+    epoch_losses = [loss]
+    n_steps = 0
+    status = 2 if tol is not None else 0
+    n_epochs = 0
+    while n_epochs < maxiter:
+        lr = get_learning_rate(learning_rate, n_epochs, lr_schedule, lr_decay)
+        n_epochs += 1
+
+        if batch_sampler is None:
+            order = rng.permutation(n_events)
+        for start in xrange(0, n_events, batch_size):
+            if batch_sampler is None:
+                batch = np.sort(order[start:start + batch_size])
+                batch_args = tuple(a[batch] for a in event_args)
+            else:
+                batch_args = tuple(
+                    batch_sampler(min(batch_size, n_events - start)))
+            grad = jac(x, *(batch_args + args))
+            n_steps += 1
+
+            if sparse_jac:
+                index, grad = grad
+                if method == 'sgd':
+                    x[index] -= lr * grad
+                elif method == 'momentum':
+                    state1[index] = momentum * state1[index] - lr * grad
+                    x[index] += state1[index]
+                elif method == 'adagrad':
+                    state1[index] += grad ** 2
+                    x[index] -= lr * grad / (np.sqrt(state1[index]) + epsilon)
+                else:
+                    state1[index] = (
+                        beta1 * state1[index] + (1.0 - beta1) * grad)
+                    state2[index] = (
+                        beta2 * state2[index] + (1.0 - beta2) * grad ** 2)
+                    x[index] -= (
+                        (lr / (1.0 - beta1 ** n_steps)) * state1[index] /
+                        (np.sqrt(state2[index] / (1.0 - beta2 ** n_steps)) +
+                         epsilon))
+            elif method == 'sgd':
+                x -= lr * grad
+            elif method == 'momentum':
+                state1 *= momentum
+                state1 -= lr * grad
+                x += state1
+            elif method == 'adagrad':
+                state1 += grad ** 2
+                np.sqrt(state1, out=work)
+                work += epsilon
+                x -= lr * grad / work
+            else:
+                state1 *= beta1
+                state1 += (1.0 - beta1) * grad
+                state2 *= beta2
+                state2 += (1.0 - beta2) * grad ** 2
+                np.sqrt(state2 / (1.0 - beta2 ** n_steps), out=work)
+                work += epsilon
+                x -= (lr / (1.0 - beta1 ** n_steps)) * state1 / work
+
+        # check convergence
+        prev_loss = loss
+        loss = fun(x, *(event_args + args))
+        epoch_losses.append(loss)
+        logger.debug("epoch %d: loss = %f", n_epochs, loss)
+        if not np.isfinite(loss):
+            status = 3
+            break
+        if (tol is not None and
+                prev_loss - loss <= tol * max(abs(prev_loss), abs(loss), 1.0)):
+            status = 0
+            break
+
+    return OptimizeResult(
+        x=x, fun=loss, success=(status == 0), status=status,
+        message=get_fit_status_message(status), nit=n_epochs,
+        nfev=len(epoch_losses), njev=n_steps, epoch_losses=epoch_losses)
+
+
+# =============================================================================
+# Classes
+# =============================================================================
+
+# =============================================================================
+# Module initialization
+# =============================================================================
+
+# init logging system
+logger = logging.getLogger('kamrecsys')
+if not logger.handlers:
+    logger.addHandler(logging.NullHandler())
+
+# =============================================================================
+# Test routine
+# =============================================================================
+
+
+def _test():
+    """ test function for this module
+    """
+
+    # perform doctest
+    import sys
+    import doctest
+
+    doctest.testmod()
+
+    sys.exit(0)
+
+
+# Check if this is call as command script
+
+if __name__ == '__main__':
+    _test()
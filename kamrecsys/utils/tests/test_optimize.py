@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import (
+    print_function,
+    division,
+    absolute_import,
+    unicode_literals)
+from six.moves import xrange
+
+# =============================================================================
+# Imports
+# =============================================================================
+
+from numpy.testing import (
+    TestCase,
+    run_module_suite,
+    assert_,
+    assert_allclose,
+    assert_array_almost_equal_nulp,
+    assert_array_max_ulp,
+    assert_array_equal,
+    assert_array_less,
+    assert_equal,
+    assert_raises,
+    assert_raises_regex,
+    assert_warns,
+    assert_string_equal)
+import numpy as np
+
+# =============================================================================
+# Variables
+# =============================================================================
+
+# =============================================================================
+# Functions
+# =============================================================================
+
+
+def squared_loss(x, a, b, reg):
+    return np.mean((np.dot(a, x) - b) ** 2) + 0.5 * reg * np.sum(x ** 2)
+
+
+def grad_squared_loss(x, a, b, reg):
+    return 2.0 * np.dot(np.dot(a, x) - b, a) / a.shape[0] + reg * x
+
+
+def test_get_learning_rate():
+    from kamrecsys.utils import get_learning_rate
+
+    assert_allclose(get_learning_rate(0.1, 3), 0.1)
+    assert_allclose(
+        get_learning_rate(0.1, 3, 'inverse', lr_decay=0.5), 0.04)
+    assert_allclose(
+        get_learning_rate(0.1, 2, 'exponential', lr_decay=0.5),
+        0.1 * np.exp(-1.0))
+    with assert_raises(ValueError):
+        get_learning_rate(0.1, 0, 'linear')
+
+
+def test_minimize_stochastic():
+    from kamrecsys.utils import minimize_stochastic
+
+    rng = np.random.RandomState(1234)
+    a = rng.normal(size=(500, 3))
+    b = np.dot(a, [1.0, -2.0, 0.5]) + rng.normal(scale=0.1, size=500)
+    opt = np.linalg.solve(
+        np.dot(a.T, a) / 500 + 0.005 * np.identity(3), np.dot(b, a) / 500)
+
+    learning_rates = {
+        'sgd': 0.05, 'momentum': 0.01, 'adagrad': 0.3, 'adam': 0.05}
+    for method, learning_rate in learning_rates.items():
+        res = minimize_stochastic(
+            squared_loss, np.zeros(3), (a, b), args=(0.01,), method=method,
+            jac=grad_squared_loss, batch_size=50, learning_rate=learning_rate,
+            lr_schedule='inverse', options={'maxiter': 50},
+            random_state=1234)
+        assert_allclose(res.x, opt, atol=0.05)
+        assert_(res.success)
+        assert_equal(res.nit, 50)
+        assert_equal(res.njev, 500)
+        assert_equal(len(res.epoch_losses), 51)
+        assert_allclose(res.fun, res.epoch_losses[-1])
+
+    # convergence
+    res = minimize_stochastic(
+        squared_loss, np.zeros(3), (a, b), args=(0.01,), method='adam',
+        jac=grad_squared_loss, learning_rate=0.1, tol=1e-3,
+        options={'maxiter': 1000}, random_state=1234)
+    assert_(res.success)
+    assert_(res.nit < 1000)
+
+    with assert_raises(ValueError):
+        minimize_stochastic(
+            squared_loss, np.zeros(3), (a, b), args=(0.01,), method='rmsprop',
+            jac=grad_squared_loss)
+
+
+def test_minimize_stochastic_sparse_jac():
+    from kamrecsys.utils import minimize_stochastic
+
+    rng = np.random.RandomState(1234)
+    a = rng.normal(size=(500, 3))
+    b = np.dot(a, [1.0, -2.0, 0.5]) + rng.normal(scale=0.1, size=500)
+
+    # a sparse gradient over all parameters equals a dense gradient
+    def sparse_grad(x, a, b, reg):
+        return np.arange(3), grad_squared_loss(x, a, b, reg)
+
+    for method in ['sgd', 'momentum', 'adagrad', 'adam']:
+        kwargs = dict(
+            args=(0.01,), method=method, batch_size=50, learning_rate=0.01,
+            options={'maxiter': 3}, random_state=1234)
+        res = minimize_stochastic(
+            squared_loss, np.zeros(3), (a, b), jac=grad_squared_loss,
+            **kwargs)
+        sparse_res = minimize_stochastic(
+            squared_loss, np.zeros(3), (a, b), jac=sparse_grad,
+            sparse_jac=True, **kwargs)
+        assert_allclose(sparse_res.x, res.x)
+
+    # parameters out of a sparse gradient are not updated
+    def partial_grad(x, a, b, reg):
+        return np.array([0, 2]), grad_squared_loss(x, a, b, reg)[[0, 2]]
+
+    for method in ['sgd', 'momentum', 'adagrad', 'adam']:
+        res = minimize_stochastic(
+            squared_loss, np.ones(3), (a, b), args=(0.01,), method=method,
+            jac=partial_grad, sparse_jac=True, batch_size=50,
+            learning_rate=0.01, options={'maxiter': 3}, random_state=1234)
+        assert_equal(res.x[1], 1.0)
+        assert_(np.all(res.x[[0, 2]] != 1.0))
+
+
+def test_minimize_stochastic_batch_sampler():
+    from kamrecsys.utils import minimize_stochastic
+
+    rng = np.random.RandomState(1234)
+    a = rng.normal(size=(500, 3))
+    b = np.dot(a, [1.0, -2.0, 0.5]) + rng.normal(scale=0.1, size=500)
+
+    # minibatches drawn with replacement
+    sizes = []
+
+    def sampler(n):
+        sizes.append(n)
+        batch = rng.randint(500, size=n)
+        return a[batch], b[batch]
+
+    res = minimize_stochastic(
+        squared_loss, np.zeros(3), (a, b), args=(0.01,), method='adam',
+        jac=grad_squared_loss, batch_size=120, learning_rate=0.1,
+        options={'maxiter': 20}, batch_sampler=sampler)
+    assert_equal(sizes[:5], [120, 120, 120, 120, 20])
+    assert_equal(len(sizes), res.njev)
+    assert_equal(res.nit, 20)
+    assert_allclose(res.x, [1.0, -2.0, 0.5], atol=0.1)
+
+# =============================================================================
+# Test Classes
+# =============================================================================
+
+# =============================================================================
+# Main Routine
+# =============================================================================
+
+if __name__ == '__main__':
+    run_module_suite()